@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# Optional journal of solved requests, so a production request can be
+# replayed without writing input and output files on the request path.
+#
+# record() only puts the request on a bounded queue; a background thread
+# encodes it and appends one gzip member per record to the current file:
+#
+#   {"requestId": "...", "recordedAt": 1760000000.0,
+#    "payload": {...}, "response": {"code": 0, "result": {...}}}
+#
+# The response has the solver_worker.py frame fields `code` and `result` or
+# `errorOutput`.
+#
+# Files are named audit-<start time>-<pid>-<sequence>.jsonl.gz, so workers
+# sharing a directory never write the same file. A file is closed once it
+# would exceed max_bytes of compressed records or is max_age_seconds old at
+# the next record, and only the newest max_files in the directory are kept
+# (max_files must be at least the number of workers sharing it). A full
+# queue drops records instead of blocking; the count is kept in `dropped`.
+# Sampling is decided by a hash of the request id, so a request retried with
+# the same id is journaled again.
+
+_STOP = object()
+
+
+def sampled(request_id, sample_rate):
+    """Return whether `request_id` falls inside `sample_rate` (0 to 1)."""
+    if sample_rate >= 1.0:
+        return True
+    digest = hashlib.sha256(str(request_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 < sample_rate
+
+
+def read_journal(path):
+    """Yield the records of one journal file in the order they were written."""
+    with gzip.open(path, 'rt', encoding='utf-8') as journal_file:
+        for line in journal_file:
+            yield json.loads(line)
+
+
+class AuditJournal:
+    def __init__(
+        self,
+        directory,
+        max_bytes=64 * 1024 * 1024,
+        max_age_seconds=3600.0,
+        max_files=None,
+        sample_rate=1.0,
+        max_pending=256,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError('sample_rate must be between 0 and 1')
+        if max_bytes <= 0 or max_age_seconds <= 0:
+            raise ValueError('max_bytes and max_age_seconds must be positive')
+        if max_files is not None and max_files < 1:
+            raise ValueError('max_files must be at least 1')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_records, daemon=True)
+        self._writer.start()
+
+    def record(self, request_id, payload, response):
+        """Queue a solved request. Returns whether it was queued; `payload`
+        and `response` must not be changed afterwards."""
+        if not sampled(request_id, self.sample_rate):
+            return False
+        try:
+            self._pending.put_nowait((request_id, time.time(), payload, response))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        """Wait until every queued record is written."""
+        self._pending.join()
+
+    def close(self):
+        """Write the queued records and close the current file."""
+        self._pending.put(_STOP)
+        self._writer.join()
+
+    def _write_records(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is _STOP:
+                    self._close_file()
+                    return
+                self._write(*item)
+            except (OSError, TypeError, ValueError) as error:
+                # A full disk or an unencodable record must not take the
+                # worker down.
+                print(f'Audit journal write failed: {error}', file=sys.stderr)
+            finally:
+                self._pending.task_done()
+
+    def _write(self, request_id, recorded_at, payload, response):
+        line = json.dumps({
+            'requestId': request_id,
+            'recordedAt': recorded_at,
+            'payload': payload,
+            'response': response,
+        }) + '\n'
+        # Every record is its own gzip member, so a file cut short by a crash
+        # still decodes up to its last complete record.
+        member = gzip.compress(line.encode('utf-8'), compresslevel=6)
+        if self._file is not None and (
+            self._file_bytes + len(member) > self.max_bytes
+            or time.monotonic() - self._file_opened >= self.max_age_seconds
+        ):
+            self._close_file()
+        if self._file is None:
+            self._open_file()
+        self._file.write(member)
+        self._file.flush()
+        self._file_bytes += len(member)
+
+    def _open_file(self):
+        self._sequence += 1
+        started = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+        name = f'audit-{started}-{os.getpid()}-{self._sequence:04d}.jsonl.gz'
+        self._file = open(os.path.join(self.directory, name), 'ab')
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+        self._remove_old_files()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove_old_files(self):
+        if self.max_files is None:
+            return
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith('audit-') and name.endswith('.jsonl.gz')
+        )
+        for name in names[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,42 @@
+// batch.js
+
+// A batch is a JSON array of `/submit` payloads. Every scenario is handed to
+// the solver pool at once, so the pool keeps all workers busy, and each
+// result is written as one NDJSON line as soon as it finishes:
+//
+//   {"index": 3, "status": "ok", "result": {...}}
+//   {"index": 0, "status": "validation_error", "result": {"error": ..., "message": ...}}
+//   {"index": 7, "status": "error", "message": "An error occurred. ..."}
+//
+// Lines arrive in completion order; `index` is the scenario's position in
+// the request array.
+
+function batchError(body, maxScenarios) {
+  if (!Array.isArray(body)) {
+    return 'A batch must be a JSON array of scenarios';
+  }
+  if (body.length === 0) {
+    return 'A batch must contain at least one scenario';
+  }
+  if (body.length > maxScenarios) {
+    return `A batch may contain at most ${maxScenarios} scenarios`;
+  }
+  return null;
+}
+
+// `solve(payload, index)` resolves with the line for one scenario, without
+// its index. `writeLine` is skipped once `isClosed()` reports that the
+// client went away. The solves themselves are stopped by the caller: the
+// server passes every scenario the connection's disconnect signal, so queued
+// scenarios are dropped and running ones are cancelled, and their lines are
+// discarded here.
+async function streamBatch(payloads, solve, writeLine, isClosed = () => false) {
+  await Promise.all(payloads.map(async (payload, index) => {
+    const line = await solve(payload, index);
+    if (!isClosed()) {
+      writeLine(`${JSON.stringify({ index, ...line })}\n`);
+    }
+  }));
+}
+
+module.exports = { batchError, streamBatch };
@@ -0,0 +1,4 @@
+"""Performance benchmarks for the optimization backend.
+
+Run from the ``backend`` directory, e.g. ``python -m benchmarks.worker_overhead``.
+"""
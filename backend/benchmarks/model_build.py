@@ -0,0 +1,115 @@
+"""Per-tank model build time: expression build versus NumPy array build.
+
+The synthetic scenarios have many fuels, capacity options and planning
+periods, where building the model through Python-level ``solver.Add`` calls
+starts to rival the solve itself. Only the build is timed; nothing is solved.
+
+    python -m benchmarks.model_build
+    python -m benchmarks.model_build --fuels 6 --options 10 --periods 20 --tank-rows 4
+"""
+import argparse
+import json
+import time
+
+from model_tank_index import build_facility_location_model
+
+
+def synthetic_payload(fuel_count, option_count, period_count, tank_rows):
+    periods = [str(2025 + 5 * index) for index in range(period_count)]
+    fuels = [f'Fuel {index + 1}' for index in range(fuel_count)]
+    capacities = [500 * (index + 1) for index in range(option_count)]
+    # The smallest option covers the peak demand with exactly `tank_rows` tanks.
+    peak_demand = capacities[0] * tank_rows
+    payload = {
+        'T': periods,
+        'Fuels': fuels,
+        'Capacities': {},
+        'TankOptions': {},
+        'Demand': {},
+        'InitialState': {},
+        'planningPeriodYears': 5,
+        'discountRateAnnual': 0.07,
+        'transitionCostRate': 1.2,
+        'technologyCostAdjustmentRateAnnual': {},
+        'maintenanceRateAnnual': {},
+        'decommissioningRateAtClosure': {},
+    }
+    for fuel_index, fuel in enumerate(fuels):
+        payload['Capacities'][fuel] = capacities
+        payload['TankOptions'][fuel] = [
+            {
+                'optimizerName': fuel,
+                'capacityMgoEquivalentTonnes': capacity,
+                'baseInvestmentCostUSD': (
+                    1_000_000.0 + 1_700.0 * capacity + 10_000.0 * fuel_index
+                ),
+            }
+            for capacity in capacities
+        ]
+        # Demand ramps up to the peak over the first two thirds of the horizon.
+        payload['Demand'][fuel] = {
+            period: round(peak_demand * min(1.0, 1.5 * index / (period_count - 1)))
+            for index, period in enumerate(periods)
+        }
+        payload['InitialState'][fuel] = [[0] * option_count] * tank_rows
+        payload['technologyCostAdjustmentRateAnnual'][fuel] = -0.01
+        payload['maintenanceRateAnnual'][fuel] = 0.03
+        payload['decommissioningRateAtClosure'][fuel] = 0.1
+    return payload
+
+
+def time_build(payload, solver_options, repeats):
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model = build_facility_location_model(
+            {**payload, 'solverOptions': solver_options}
+        )
+        durations.append(time.perf_counter() - started)
+    solver = model['solver']
+    return {
+        'buildSeconds': min(durations),
+        'variableCount': solver.NumVariables(),
+        'constraintCount': solver.NumConstraints(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fuels', type=int, default=6)
+    parser.add_argument('--options', type=int, default=10)
+    parser.add_argument('--periods', type=int, default=20)
+    parser.add_argument('--tank-rows', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=3)
+    arguments = parser.parse_args(argv)
+
+    payload = synthetic_payload(
+        arguments.fuels,
+        arguments.options,
+        arguments.periods,
+        arguments.tank_rows,
+    )
+    expressions = time_build(payload, {}, arguments.repeats)
+    arrays = time_build(payload, {'modelBuild': 'arrays'}, arguments.repeats)
+    anonymous = time_build(
+        payload,
+        {'modelBuild': 'arrays', 'anonymousNames': True},
+        arguments.repeats,
+    )
+    report = {
+        'fuels': arguments.fuels,
+        'options': arguments.options,
+        'periods': arguments.periods,
+        'tankRows': arguments.tank_rows,
+        'expressions': expressions,
+        'arrays': arrays,
+        'arraysAnonymous': anonymous,
+        'speedup': expressions['buildSeconds'] / arrays['buildSeconds'],
+        'anonymousSpeedup': expressions['buildSeconds'] / anonymous['buildSeconds'],
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
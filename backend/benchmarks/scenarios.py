@@ -0,0 +1,138 @@
+"""Seeded generator of valid model_tank_index payloads.
+
+Scenarios scale the number of fuels, capacity options and planning periods,
+the demand magnitude and how much of the first period's demand is already
+covered by tanks in ``InitialState``. The same arguments always produce the
+same payload.
+
+    python -m benchmarks.scenarios --seed 3 --fuels 2 --options 4 --periods 8
+"""
+import argparse
+import json
+import random
+
+FUEL_NAMES = ('Ammonia', 'Methanol', 'Hydrogen', 'LNG', 'MGO', 'Biodiesel')
+
+
+def _demand_path(rng, period_count, demand_scale, starts_empty):
+    # A ramp towards `demand_scale` with noise; some fuels are phased out
+    # again at the end of the horizon, which exercises permanent zero-demand
+    # periods.
+    ramp_periods = rng.randint(1, max(1, period_count - 1))
+    level = 0.0 if starts_empty else demand_scale * rng.uniform(0.2, 0.6)
+    path = []
+    for period_index in range(period_count):
+        if period_index > 0:
+            target = demand_scale * min(1.0, period_index / ramp_periods)
+            level = max(level, target) * rng.uniform(0.9, 1.1)
+        path.append(round(level))
+    if period_count > 3 and rng.random() < 0.25:
+        for period_index in range(rng.randint(period_count - 2, period_count - 1), period_count):
+            path[period_index] = 0
+    return path
+
+
+def generate_scenario(
+    seed,
+    fuel_count=1,
+    option_count=3,
+    period_count=6,
+    demand_scale=2000,
+    initial_share=0.5,
+    planning_period_years=5,
+):
+    """Return a payload. `initial_share` is the probability that a fuel
+    starts with demand in the first period, covered by InitialState tanks."""
+    if not 1 <= fuel_count <= len(FUEL_NAMES):
+        raise ValueError(f'fuel_count must be between 1 and {len(FUEL_NAMES)}')
+    if option_count < 1 or period_count < 2 or demand_scale <= 0:
+        raise ValueError('option_count, period_count and demand_scale are too small')
+
+    rng = random.Random(seed)
+    periods = [
+        str(2025 + planning_period_years * index) for index in range(period_count)
+    ]
+    fuels = list(FUEL_NAMES[:fuel_count])
+    payload = {
+        'T': periods,
+        'Fuels': fuels,
+        'Capacities': {},
+        'TankOptions': {},
+        'Demand': {},
+        'InitialState': {},
+        'planningPeriodYears': planning_period_years,
+        'discountRateAnnual': round(rng.uniform(0.03, 0.10), 4),
+        'transitionCostRate': round(rng.uniform(0.8, 1.5), 3),
+        'technologyCostAdjustmentRateAnnual': {},
+        'maintenanceRateAnnual': {},
+        'decommissioningRateAtClosure': {},
+    }
+    for fuel in fuels:
+        # Options span a quarter of the demand scale up to its full size, on
+        # a grid of 50 t so capacities stay distinct and integral.
+        unit = max(50, round(demand_scale / 4 / 50) * 50)
+        capacities = sorted(rng.sample(
+            range(unit, unit * (4 * option_count + 1), unit),
+            option_count,
+        ))
+        fixed_cost = rng.uniform(0.5e6, 2.0e6)
+        per_tonne = rng.uniform(1000, 3000)
+        payload['Capacities'][fuel] = capacities
+        payload['TankOptions'][fuel] = [
+            {
+                'optimizerName': fuel,
+                'capacityMgoEquivalentTonnes': capacity,
+                'baseInvestmentCostUSD': round(
+                    (fixed_cost + per_tonne * capacity) * rng.uniform(0.9, 1.1),
+                    2,
+                ),
+            }
+            for capacity in capacities
+        ]
+
+        demand = _demand_path(
+            rng,
+            period_count,
+            demand_scale,
+            starts_empty=rng.random() >= initial_share,
+        )
+        payload['Demand'][fuel] = dict(zip(periods, demand))
+        # Cover the first period's demand with randomly sized initial tanks.
+        # Every tank holds at least the smallest option, so this never needs
+        # more rows than the model allows.
+        rows = []
+        capacity = 0
+        while capacity < demand[0]:
+            option_index = rng.randrange(option_count)
+            rows.append([int(index == option_index) for index in range(option_count)])
+            capacity += capacities[option_index]
+        payload['InitialState'][fuel] = rows
+        payload['technologyCostAdjustmentRateAnnual'][fuel] = round(rng.uniform(-0.03, 0.01), 4)
+        payload['maintenanceRateAnnual'][fuel] = round(rng.uniform(0.01, 0.05), 4)
+        payload['decommissioningRateAtClosure'][fuel] = round(rng.uniform(0.05, 0.2), 4)
+    return payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fuels', type=int, default=1)
+    parser.add_argument('--options', type=int, default=3)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--demand-scale', type=float, default=2000)
+    parser.add_argument('--initial-share', type=float, default=0.5)
+    arguments = parser.parse_args(argv)
+    payload = generate_scenario(
+        arguments.seed,
+        fuel_count=arguments.fuels,
+        option_count=arguments.options,
+        period_count=arguments.periods,
+        demand_scale=arguments.demand_scale,
+        initial_share=arguments.initial_share,
+    )
+    print(json.dumps(payload, indent=2))
+    return payload
+
+
+if __name__ == '__main__':
+    main()
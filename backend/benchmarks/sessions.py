@@ -0,0 +1,88 @@
+"""One-parameter what-if edits: cold solve versus session update.
+
+Opens a session on a synthetic scenario, then applies single edits (the
+discount rate, one fuel's maintenance rate, one demand value) both as a cold
+``solve_facility_location`` call and as a session update, and reports the
+wall time of each.
+
+    python -m benchmarks.sessions
+    python -m benchmarks.sessions --fuels 2 --periods 8 --tank-rows 5
+"""
+import argparse
+import json
+import time
+
+import model_tank_index
+from benchmarks.model_build import synthetic_payload
+from model_tank_index import solve_facility_location
+from sessions import SessionStore, merge_changes
+
+
+def one_parameter_edits(payload):
+    fuel = payload['Fuels'][0]
+    period = payload['T'][-1]
+    return {
+        'discountRateAnnual': {'discountRateAnnual': payload['discountRateAnnual'] + 0.01},
+        'maintenanceRateAnnual': {
+            'maintenanceRateAnnual': {fuel: payload['maintenanceRateAnnual'][fuel] + 0.01},
+        },
+        'Demand': {'Demand': {fuel: {period: payload['Demand'][fuel][period] * 0.95}}},
+    }
+
+
+def timed(function, *arguments):
+    started = time.perf_counter()
+    result = function(*arguments)
+    return result, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fuels', type=int, default=1)
+    parser.add_argument('--options', type=int, default=3)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--tank-rows', type=int, default=4)
+    parser.add_argument(
+        '--time-limit-ms',
+        type=int,
+        default=model_tank_index.SOLVER_TIME_LIMIT_MS,
+    )
+    arguments = parser.parse_args(argv)
+    model_tank_index.SOLVER_TIME_LIMIT_MS = arguments.time_limit_ms
+
+    payload = synthetic_payload(
+        arguments.fuels,
+        arguments.options,
+        arguments.periods,
+        arguments.tank_rows,
+    )
+    sessions = SessionStore()
+    opened, open_seconds = timed(sessions.open, payload)
+    session_id = opened['session']['id']
+
+    report = {'openSeconds': open_seconds, 'edits': {}}
+    for name, changes in one_parameter_edits(payload).items():
+        cold, cold_seconds = timed(
+            solve_facility_location,
+            merge_changes(payload, changes),
+        )
+        updated, update_seconds = timed(sessions.update, session_id, changes)
+        report['edits'][name] = {
+            'update': updated['session']['update'],
+            'coldSeconds': cold_seconds,
+            'sessionSeconds': update_seconds,
+            'coldStatus': cold['status'],
+            'sessionStatus': updated['status'],
+            'objectiveDifferenceUSD': (
+                updated['costBreakdown']['totalObjectiveUSD']
+                - cold['costBreakdown']['totalObjectiveUSD']
+            ),
+        }
+        # Return to the base scenario so every edit is a single change.
+        sessions.update(session_id, {field: payload[field] for field in changes})
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
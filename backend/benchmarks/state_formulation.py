@@ -0,0 +1,72 @@
+"""Cumulative versus recursive operational-state rows on long horizons.
+
+Annual planning over 25-50 periods makes the cumulative ``operational`` rows
+quadratic in the horizon. This reports nonzeros, build time and solve time for
+both ``stateFormulation`` values on the same synthetic scenario.
+
+    python -m benchmarks.state_formulation --periods 25 50
+"""
+import argparse
+import json
+import time
+
+import model_tank_index
+from benchmarks.model_build import synthetic_payload
+from model_tank_index import build_facility_location_model
+from ortools.linear_solver import linear_solver_pb2
+
+
+def run_case(payload, state_formulation, time_limit_ms):
+    started = time.perf_counter()
+    model = build_facility_location_model(
+        {**payload, 'solverOptions': {'stateFormulation': state_formulation}}
+    )
+    build_seconds = time.perf_counter() - started
+    solver = model['solver']
+    proto = linear_solver_pb2.MPModelProto()
+    solver.ExportModelToProto(proto)
+    solver.SetTimeLimit(time_limit_ms)
+    started = time.perf_counter()
+    status = solver.Solve()
+    return {
+        'status': status,
+        'buildSeconds': build_seconds,
+        'solveSeconds': time.perf_counter() - started,
+        'objectiveUSD': solver.Objective().Value(),
+        'constraintCount': solver.NumConstraints(),
+        'nonzeroCount': sum(len(row.var_index) for row in proto.constraint),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--periods', type=int, nargs='+', default=[25, 50])
+    parser.add_argument('--options', type=int, default=3)
+    parser.add_argument('--tank-rows', type=int, default=3)
+    parser.add_argument(
+        '--time-limit-ms',
+        type=int,
+        default=model_tank_index.SOLVER_TIME_LIMIT_MS,
+    )
+    arguments = parser.parse_args(argv)
+
+    report = []
+    for period_count in arguments.periods:
+        payload = synthetic_payload(
+            1,
+            arguments.options,
+            period_count,
+            arguments.tank_rows,
+        )
+        payload['planningPeriodYears'] = 1
+        report.append({
+            'periods': period_count,
+            'cumulative': run_case(payload, 'cumulative', arguments.time_limit_ms),
+            'recursive': run_case(payload, 'recursive', arguments.time_limit_ms),
+        })
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Benchmark suite over generated scenarios, with regression checks.
+
+Every scenario of a suite is generated by ``benchmarks.scenarios``, built and
+solved in a fresh child process, so the peak RSS reported for it is its own.
+The report records build and solve time, variable and constraint counts, peak
+RSS, status, objective and relative gap. ``--compare`` checks the run against
+a stored report and exits with status 1 when a scenario regressed.
+
+    python -m benchmarks.suite --suite smoke
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --compare baseline.json --output current.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+
+from ortools import __version__ as ortools_version
+
+from benchmarks.scenarios import generate_scenario
+from model_tank_index import (
+    SOLVER_TIME_LIMIT_MS,
+    _relative_gap,
+    build_model,
+    solve_model,
+)
+
+# Status codes from best to worst: OPTIMAL, FEASIBLE, then anything else.
+STATUS_RANK = {0: 0, 1: 1}
+
+SUITES = {
+    'smoke': [
+        {'name': 'tiny', 'seed': 1, 'fuels': 1, 'options': 2, 'periods': 4},
+        {'name': 'two-fuels', 'seed': 2, 'fuels': 2, 'options': 3, 'periods': 4},
+    ],
+    'default': [
+        {'name': 'small', 'seed': 11, 'fuels': 1, 'options': 3, 'periods': 6},
+        {'name': 'many-options', 'seed': 12, 'fuels': 1, 'options': 8, 'periods': 6},
+        {'name': 'long-horizon', 'seed': 13, 'fuels': 1, 'options': 3, 'periods': 12},
+        {'name': 'three-fuels', 'seed': 14, 'fuels': 3, 'options': 4, 'periods': 6},
+        {
+            'name': 'high-demand',
+            'seed': 15,
+            'fuels': 2,
+            'options': 4,
+            'periods': 6,
+            'demandScale': 20000,
+        },
+        {
+            'name': 'covered-start',
+            'seed': 16,
+            'fuels': 2,
+            'options': 4,
+            'periods': 6,
+            'initialShare': 1.0,
+        },
+        {
+            'name': 'aggregated',
+            'seed': 17,
+            'fuels': 3,
+            'options': 6,
+            'periods': 10,
+            'solverOptions': {'engine': 'aggregated'},
+        },
+    ],
+    'large': [
+        {'name': 'six-fuels', 'seed': 21, 'fuels': 6, 'options': 6, 'periods': 10},
+        {
+            'name': 'six-fuels-aggregated',
+            'seed': 21,
+            'fuels': 6,
+            'options': 6,
+            'periods': 10,
+            'solverOptions': {'engine': 'aggregated'},
+        },
+        {'name': 'wide', 'seed': 22, 'fuels': 2, 'options': 12, 'periods': 16},
+    ],
+}
+
+
+def scenario_payload(scenario):
+    payload = generate_scenario(
+        scenario['seed'],
+        fuel_count=scenario['fuels'],
+        option_count=scenario['options'],
+        period_count=scenario['periods'],
+        demand_scale=scenario.get('demandScale', 2000),
+        initial_share=scenario.get('initialShare', 0.5),
+    )
+    if 'solverOptions' in scenario:
+        payload['solverOptions'] = scenario['solverOptions']
+    return payload
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_scenario(scenario):
+    """Build and solve one scenario; meant to run in its own process."""
+    payload = scenario_payload(scenario)
+    started = time.perf_counter()
+    model = build_model(payload)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    result = solve_model(model, payload)
+    solve_seconds = time.perf_counter() - started
+
+    objective = None
+    gap = None
+    if result['status'] in STATUS_RANK:
+        objective = result['costBreakdown']['totalObjectiveUSD']
+        gap = _relative_gap(objective, model['solver'].Objective().BestBound())
+    return {
+        'name': scenario['name'],
+        'scenario': scenario,
+        'buildSeconds': build_seconds,
+        'solveSeconds': solve_seconds,
+        'variableCount': result['variableCount'],
+        'constraintCount': result['constraintCount'],
+        'peakRssMB': _peak_rss_mb(),
+        'status': result['status'],
+        'objectiveUSD': objective,
+        'gap': gap,
+    }
+
+
+def run_suite(scenarios):
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for scenario in scenarios:
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            results.append(pool.apply(run_scenario, (scenario,)))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'ortools': ortools_version,
+            'platform': platform.platform(),
+            'solverTimeLimitMs': SOLVER_TIME_LIMIT_MS,
+        },
+        'results': results,
+    }
+
+
+def compare_reports(baseline, current, time_tolerance=0.25, min_seconds=0.05,
+                    rss_tolerance=0.25, objective_tolerance=1e-6):
+    """Return a list of regressions of `current` against `baseline`.
+
+    Times and RSS regress when they grow by more than the tolerance (times
+    only when the growth also exceeds `min_seconds`, which keeps millisecond
+    noise out). A worse status, a higher objective, a larger gap and a
+    scenario missing from the current run are always regressions.
+    """
+    current_results = {result['name']: result for result in current['results']}
+    regressions = []
+
+    def regression(name, metric, before, after):
+        regressions.append({
+            'name': name,
+            'metric': metric,
+            'baseline': before,
+            'current': after,
+        })
+
+    for before in baseline['results']:
+        name = before['name']
+        after = current_results.get(name)
+        if after is None:
+            regression(name, 'missing', name, None)
+            continue
+        for metric in ('buildSeconds', 'solveSeconds'):
+            growth = after[metric] - before[metric]
+            if growth > min_seconds and growth > time_tolerance * before[metric]:
+                regression(name, metric, before[metric], after[metric])
+        if after['peakRssMB'] > before['peakRssMB'] * (1 + rss_tolerance):
+            regression(name, 'peakRssMB', before['peakRssMB'], after['peakRssMB'])
+        if STATUS_RANK.get(after['status'], 2) > STATUS_RANK.get(before['status'], 2):
+            regression(name, 'status', before['status'], after['status'])
+        if before['objectiveUSD'] is not None and after['objectiveUSD'] is not None:
+            allowed = objective_tolerance * max(abs(before['objectiveUSD']), 1.0)
+            if after['objectiveUSD'] > before['objectiveUSD'] + allowed:
+                regression(name, 'objectiveUSD', before['objectiveUSD'], after['objectiveUSD'])
+        if before['gap'] is not None and after['gap'] is not None:
+            if after['gap'] > before['gap'] + objective_tolerance:
+                regression(name, 'gap', before['gap'], after['gap'])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=sorted(SUITES), default='default')
+    parser.add_argument('--scenario', action='append', default=[],
+                        help='run only the named scenario (repeatable)')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='baseline report to check for regressions')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--min-seconds', type=float, default=0.05)
+    parser.add_argument('--rss-tolerance', type=float, default=0.25)
+    arguments = parser.parse_args(argv)
+
+    scenarios = SUITES[arguments.suite]
+    if arguments.scenario:
+        scenarios = [
+            scenario for scenario in scenarios if scenario['name'] in arguments.scenario
+        ]
+    report = run_suite(scenarios)
+    report['meta']['suite'] = arguments.suite
+
+    exit_code = 0
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if arguments.scenario:
+            baseline['results'] = [
+                result for result in baseline['results']
+                if result['name'] in arguments.scenario
+            ]
+        report['regressions'] = compare_reports(
+            baseline,
+            report,
+            time_tolerance=arguments.time_tolerance,
+            min_seconds=arguments.min_seconds,
+            rss_tolerance=arguments.rss_tolerance,
+        )
+        exit_code = 1 if report['regressions'] else 0
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Parameter sweep versus independent solves of every grid point.
+
+Sweeps ``discountRateAnnual`` and ``transitionCostRate`` over a grid on a
+synthetic scenario with ``sweep.run_sweep`` (one model, retargeted and warm
+started point by point) and with one ``solve_facility_location`` call per
+point, and reports wall time and the largest objective difference.
+
+    python -m benchmarks.sweep
+    python -m benchmarks.sweep --steps 5 --periods 6
+"""
+import argparse
+import json
+import time
+
+import model_tank_index
+from benchmarks.model_build import synthetic_payload
+from model_tank_index import solve_facility_location
+from sessions import merge_changes
+from sweep import run_sweep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fuels', type=int, default=1)
+    parser.add_argument('--options', type=int, default=3)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--tank-rows', type=int, default=4)
+    parser.add_argument('--steps', type=int, default=4)
+    parser.add_argument(
+        '--time-limit-ms',
+        type=int,
+        default=model_tank_index.SOLVER_TIME_LIMIT_MS,
+    )
+    arguments = parser.parse_args(argv)
+    model_tank_index.SOLVER_TIME_LIMIT_MS = arguments.time_limit_ms
+
+    payload = synthetic_payload(
+        arguments.fuels,
+        arguments.options,
+        arguments.periods,
+        arguments.tank_rows,
+    )
+    request = {
+        'payload': payload,
+        'parameters': [
+            {'field': 'discountRateAnnual', 'start': 0.03, 'stop': 0.12, 'steps': arguments.steps},
+            {'field': 'transitionCostRate', 'start': 0.5, 'stop': 2.0, 'steps': arguments.steps},
+        ],
+    }
+
+    started = time.perf_counter()
+    sweep = run_sweep(request)
+    sweep_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    objective_column = sweep['columns'].index('objectiveUSD')
+    largest_difference = 0.0
+    for row in sweep['rows']:
+        cold = solve_facility_location(merge_changes(payload, {
+            'discountRateAnnual': row[0],
+            'transitionCostRate': row[1],
+        }))
+        largest_difference = max(
+            largest_difference,
+            abs(cold['costBreakdown']['totalObjectiveUSD'] - row[objective_column]),
+        )
+    independent_seconds = time.perf_counter() - started
+
+    report = {
+        'points': len(sweep['rows']),
+        'sweepSeconds': sweep_seconds,
+        'independentSeconds': independent_seconds,
+        'modelUpdates': sweep['modelUpdates'],
+        'planCount': sweep['planCount'],
+        'largestObjectiveDifferenceUSD': largest_difference,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
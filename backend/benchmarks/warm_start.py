@@ -0,0 +1,88 @@
+"""Cold solves versus greedy and nearest-plan warm starts.
+
+A what-if session re-solves one scenario with small demand changes. This
+solves a base scenario once to seed the plan store, then each perturbed
+scenario cold, with ``warmStart='greedy'`` and with ``warmStart='nearest'``,
+and reports solve time and, on CP-SAT, the time to the first solution.
+
+    python -m benchmarks.warm_start
+    python -m benchmarks.warm_start --backend mpsolver --periods 12 --scenarios 3
+"""
+import argparse
+import copy
+import json
+import random
+
+import model_tank_index
+from benchmarks.model_build import synthetic_payload
+from model_tank_index import solve_facility_location
+from warm_start import DEFAULT_PLAN_STORE
+
+
+def perturbed(payload, rng, scale):
+    payload = copy.deepcopy(payload)
+    for fuel in payload['Fuels']:
+        payload['Demand'][fuel] = {
+            period: round(demand * (1 + rng.uniform(-scale, scale)))
+            for period, demand in payload['Demand'][fuel].items()
+        }
+    return payload
+
+
+def run_case(payload, backend, warm_start):
+    result = solve_facility_location({
+        **payload,
+        'solverOptions': {'solverBackend': backend, 'warmStart': warm_start},
+    })
+    report = result.get('warmStart') or {}
+    return {
+        'status': result['status'],
+        'solveSeconds': result['solveCpuTimeSeconds'],
+        'objectiveUSD': result['costBreakdown']['totalObjectiveUSD'],
+        'hintObjectiveUSD': report.get('hintObjectiveUSD'),
+        'firstSolutionSeconds': report.get('firstSolutionSeconds'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', choices=('cpsat', 'mpsolver'), default='cpsat')
+    parser.add_argument('--fuels', type=int, default=2)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--periods', type=int, default=6)
+    parser.add_argument('--tank-rows', type=int, default=4)
+    parser.add_argument('--scenarios', type=int, default=5)
+    parser.add_argument('--perturbation', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--time-limit-ms',
+        type=int,
+        default=model_tank_index.SOLVER_TIME_LIMIT_MS,
+    )
+    arguments = parser.parse_args(argv)
+    model_tank_index.SOLVER_TIME_LIMIT_MS = arguments.time_limit_ms
+
+    rng = random.Random(arguments.seed)
+    base = synthetic_payload(
+        arguments.fuels,
+        arguments.options,
+        arguments.periods,
+        arguments.tank_rows,
+    )
+    report = []
+    for _ in range(arguments.scenarios):
+        scenario = perturbed(base, rng, arguments.perturbation)
+        # Every solve remembers its plan, so reseed the store with the base
+        # plan alone before the nearest run.
+        DEFAULT_PLAN_STORE.clear()
+        solve_facility_location(base)
+        cases = {'nearest': run_case(scenario, arguments.backend, 'nearest')}
+        for source in ('off', 'greedy'):
+            cases[source] = run_case(scenario, arguments.backend, source)
+        report.append(cases)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
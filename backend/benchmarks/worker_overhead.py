@@ -0,0 +1,127 @@
+"""Fixed per-request overhead: one-shot script versus a warm solver worker.
+
+The one-shot path is what server.js used to do for every request: spawn
+``python model_tank_index.py``, import OR-Tools, build, solve and exit. The
+warm path sends the same payload as a frame to an already running
+``solver_worker.py``. A deliberately tiny scenario is used so the numbers are
+dominated by process and import overhead rather than by the solve itself.
+
+    python -m benchmarks.worker_overhead --requests 20
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def tiny_payload():
+    periods = ['2025', '2030', '2035', '2040']
+    return {
+        'T': periods,
+        'Fuels': ['Ammonia'],
+        'Capacities': {'Ammonia': [1000]},
+        'TankOptions': {
+            'Ammonia': [{
+                'optimizerName': 'Ammonia',
+                'capacityMgoEquivalentTonnes': 1000,
+                'baseInvestmentCostUSD': 2_500_000.0,
+            }],
+        },
+        'Demand': {'Ammonia': dict(zip(periods, [0, 1000, 1000, 1000]))},
+        'InitialState': {'Ammonia': [[0]]},
+        'planningPeriodYears': 5,
+        'discountRateAnnual': 0.07,
+        'transitionCostRate': 1.2,
+        'technologyCostAdjustmentRateAnnual': {'Ammonia': -0.01},
+        'maintenanceRateAnnual': {'Ammonia': 0.03},
+        'decommissioningRateAtClosure': {'Ammonia': 0.1},
+    }
+
+
+def time_one_shot(payload_text, requests):
+    durations = []
+    # Run from a scratch directory so the script's debug files do not touch
+    # the working tree.
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(requests):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, str(BACKEND_DIR / 'model_tank_index.py')],
+                input=payload_text,
+                capture_output=True,
+                text=True,
+                cwd=scratch,
+                check=False,
+            )
+            durations.append(time.perf_counter() - started)
+            if completed.returncode != 0:
+                raise RuntimeError(completed.stderr or completed.stdout)
+    return durations
+
+
+def time_warm_worker(payload, requests):
+    worker = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / 'solver_worker.py')],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=BACKEND_DIR,
+    )
+    try:
+        started = time.perf_counter()
+        if not json.loads(worker.stdout.readline()).get('ready'):
+            raise RuntimeError('solver worker did not report ready')
+        startup_seconds = time.perf_counter() - started
+
+        durations = []
+        for frame_id in range(requests):
+            started = time.perf_counter()
+            worker.stdin.write(json.dumps({'id': frame_id, 'payload': payload}) + '\n')
+            worker.stdin.flush()
+            response = json.loads(worker.stdout.readline())
+            durations.append(time.perf_counter() - started)
+            if response['code'] != 0:
+                raise RuntimeError(response)
+        return startup_seconds, durations
+    finally:
+        worker.stdin.close()
+        worker.wait(timeout=10)
+
+
+def _summary(durations):
+    ordered = sorted(durations)
+    return {
+        'meanMs': statistics.mean(ordered) * 1000,
+        'medianMs': statistics.median(ordered) * 1000,
+        'p95Ms': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20)
+    arguments = parser.parse_args(argv)
+
+    payload = tiny_payload()
+    one_shot = _summary(time_one_shot(json.dumps(payload), arguments.requests))
+    startup_seconds, warm_durations = time_warm_worker(payload, arguments.requests)
+    warm = _summary(warm_durations)
+    report = {
+        'requests': arguments.requests,
+        'oneShotSpawn': one_shot,
+        'warmWorker': warm,
+        'workerStartupMs': startup_seconds * 1000,
+        'medianOverheadSavedMs': one_shot['medianMs'] - warm['medianMs'],
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
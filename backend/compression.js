@@ -0,0 +1,80 @@
+// compression.js
+const zlib = require('zlib');
+const { promisify } = require('util');
+
+const brotliCompress = promisify(zlib.brotliCompress);
+const gzip = promisify(zlib.gzip);
+
+// Bodies smaller than this are sent as they are; compressing them costs more
+// than the bytes it saves.
+const MIN_COMPRESSED_BYTES = 1024;
+
+// Brotli quality 5 compresses solver responses about as fast as gzip level 6
+// while producing smaller bodies; the maximum quality is too slow per request.
+const BROTLI_QUALITY = 5;
+const GZIP_LEVEL = 6;
+
+// Pick the response encoding from an Accept-Encoding header: Brotli when the
+// client accepts it, gzip otherwise, and null for identity. A coding listed
+// with q=0 is refused; `*` accepts any coding not listed.
+function negotiateEncoding(acceptEncoding) {
+  const qualities = new Map();
+  for (const part of String(acceptEncoding || '').split(',')) {
+    const [coding, ...parameters] = part.trim().toLowerCase().split(';');
+    if (!coding) {
+      continue;
+    }
+    let quality = 1;
+    for (const parameter of parameters) {
+      const [name, value] = parameter.trim().split('=');
+      if (name === 'q') {
+        quality = Number(value);
+      }
+    }
+    qualities.set(coding, Number.isFinite(quality) ? quality : 0);
+  }
+  for (const coding of ['br', 'gzip']) {
+    const quality = qualities.has(coding) ? qualities.get(coding) : qualities.get('*');
+    if (quality > 0) {
+      return coding;
+    }
+  }
+  return null;
+}
+
+// Encode `value` as JSON and compress it for `acceptEncoding`. Resolves with
+// `{ body, encoding }`, where `encoding` is null when the body is not
+// compressed.
+async function encodeJson(value, acceptEncoding) {
+  const body = Buffer.from(JSON.stringify(value));
+  const encoding = body.length >= MIN_COMPRESSED_BYTES ? negotiateEncoding(acceptEncoding) : null;
+  if (encoding === 'br') {
+    return {
+      body: await brotliCompress(body, {
+        params: {
+          [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY,
+          [zlib.constants.BROTLI_PARAM_SIZE_HINT]: body.length,
+        },
+      }),
+      encoding,
+    };
+  }
+  if (encoding === 'gzip') {
+    return { body: await gzip(body, { level: GZIP_LEVEL }), encoding };
+  }
+  return { body, encoding: null };
+}
+
+// Send `value` as a JSON response, compressed when the client accepts it.
+async function sendJson(res, status, value) {
+  const { body, encoding } = await encodeJson(value, res.req.headers['accept-encoding']);
+  res.status(status);
+  res.set('Content-Type', 'application/json; charset=utf-8');
+  res.vary('Accept-Encoding');
+  if (encoding) {
+    res.set('Content-Encoding', encoding);
+  }
+  res.end(body);
+}
+
+module.exports = { MIN_COMPRESSED_BYTES, encodeJson, negotiateEncoding, sendJson };
@@ -2,6 +2,11 @@ import json
 import math
 import sys
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the scalar path is used instead
+    np = None
+
 
 FUEL_ANNUAL_RATE_FIELDS = (
     'technologyCostAdjustmentRateAnnual',
@@ -248,7 +253,143 @@ def _validate_financial_inputs(data, fuels):
     }
 
 
-def prepare_financial_costs_for_model(data):
+def _scalar_cost_coefficients(base_costs, rates, assumptions, discount_factors):
+    # Reference implementation: one validated scalar helper call per option,
+    # period and cost type.
+    years_per_period = assumptions['planningPeriodYears']
+    discount_rate = assumptions['discountRateAnnual']
+    transition_rate = assumptions['transitionCostRate']
+    period_count = len(discount_factors)
+    opening_coefficients = [
+        [
+            calculate_opening_cost_coefficient(
+                base_cost,
+                rates['technologyCostAdjustmentRateAnnual'],
+                discount_rate,
+                years_per_period,
+                period_index,
+            )
+            for period_index in range(period_count)
+        ]
+        for base_cost in base_costs
+    ]
+    maintenance_coefficients = [
+        [
+            calculate_maintenance_cost_coefficient(
+                base_cost,
+                rates['maintenanceRateAnnual'],
+                discount_rate,
+                years_per_period,
+                period_index,
+            )
+            for period_index in range(period_count)
+        ]
+        for base_cost in base_costs
+    ]
+    decommissioning_coefficients = [
+        [
+            calculate_decommissioning_cost_coefficient(
+                base_cost,
+                rates['decommissioningRateAtClosure'],
+                discount_rate,
+                years_per_period,
+                period_index,
+            )
+            for period_index in range(period_count)
+        ]
+        for base_cost in base_costs
+    ]
+    transition_coefficients = [
+        [
+            None if from_index == to_index else [None] + [
+                calculate_transition_cost_coefficient(
+                    base_costs[from_index],
+                    base_costs[to_index],
+                    transition_rate,
+                    rates['technologyCostAdjustmentRateAnnual'],
+                    discount_rate,
+                    years_per_period,
+                    period_index,
+                )
+                for period_index in range(1, period_count)
+            ]
+            for to_index in range(len(base_costs))
+        ]
+        for from_index in range(len(base_costs))
+    ]
+    return (
+        opening_coefficients,
+        maintenance_coefficients,
+        decommissioning_coefficients,
+        transition_coefficients,
+    )
+
+
+def cost_coefficient_arrays(base_costs, rates, assumptions, discount_factors):
+    """Return the opening, maintenance and decommissioning coefficients as
+    (K, T) arrays and the transition coefficients as a (K, K, T) array.
+
+    Inputs must already be validated. The per-period technology and discount
+    factors are computed once with Python floats and each coefficient is then
+    formed with the same operations, in the same order, as the scalar
+    helpers, so the arrays match them exactly. Transition entries on the
+    diagonal and in period 0 are NaN.
+    """
+    years_per_period = assumptions['planningPeriodYears']
+    technology_rate = rates['technologyCostAdjustmentRateAnnual']
+    base = np.asarray(base_costs, dtype=float)
+    technology_factors = np.array([
+        (1 + technology_rate) ** (years_per_period * period_index)
+        for period_index in range(len(discount_factors))
+    ])
+    discount = np.asarray(discount_factors, dtype=float)
+
+    nominal = base[:, None] * technology_factors[None, :]
+    opening = nominal * discount[None, :]
+    maintenance = (
+        (years_per_period * base * rates['maintenanceRateAnnual'])[:, None]
+        * discount[None, :]
+    )
+    decommissioning = (
+        (base * rates['decommissioningRateAtClosure'])[:, None] * discount[None, :]
+    )
+    transition = (
+        assumptions['transitionCostRate']
+        * np.abs(nominal[None, :, :] - nominal[:, None, :])
+        * discount[None, None, :]
+    )
+    option_count = len(base_costs)
+    transition[np.arange(option_count), np.arange(option_count), :] = np.nan
+    transition[:, :, 0] = np.nan
+    return opening, maintenance, decommissioning, transition
+
+
+def _vectorized_cost_coefficients(base_costs, rates, assumptions, discount_factors):
+    opening, maintenance, decommissioning, transition = cost_coefficient_arrays(
+        base_costs,
+        rates,
+        assumptions,
+        discount_factors,
+    )
+    transition_rows = transition[:, :, 1:].tolist()
+    transition_coefficients = [
+        [
+            None
+            if from_index == to_index
+            else [None] + transition_rows[from_index][to_index]
+            for to_index in range(len(base_costs))
+        ]
+        for from_index in range(len(base_costs))
+    ]
+    return (
+        opening.tolist(),
+        maintenance.tolist(),
+        decommissioning.tolist(),
+        transition_coefficients,
+    )
+
+
+def prepare_financial_costs_for_model(data, vectorized=True):
     if not isinstance(data, dict):
         raise ValueError('Optimization request must be a JSON object')
     periods = data.get('T')
@@ -314,63 +455,22 @@ def prepare_financial_costs_for_model(data):
             base_costs.append(base_cost)
 
         rates = assumptions['fuelRates'][fuel]
-        opening_coefficients = [
-            [
-                calculate_opening_cost_coefficient(
-                    base_cost,
-                    rates['technologyCostAdjustmentRateAnnual'],
-                    discount_rate,
-                    years_per_period,
-                    period_index,
-                )
-                for period_index in range(len(periods))
-            ]
-            for base_cost in base_costs
-        ]
-        maintenance_coefficients = [
-            [
-                calculate_maintenance_cost_coefficient(
-                    base_cost,
-                    rates['maintenanceRateAnnual'],
-                    discount_rate,
-                    years_per_period,
-                    period_index,
-                )
-                for period_index in range(len(periods))
-            ]
-            for base_cost in base_costs
-        ]
-        decommissioning_coefficients = [
-            [
-                calculate_decommissioning_cost_coefficient(
-                    base_cost,
-                    rates['decommissioningRateAtClosure'],
-                    discount_rate,
-                    years_per_period,
-                    period_index,
-                )
-                for period_index in range(len(periods))
-            ]
-            for base_cost in base_costs
-        ]
-        transition_coefficients = [
-            [
-                None if from_index == to_index else [None] + [
-                    calculate_transition_cost_coefficient(
-                        base_costs[from_index],
-                        base_costs[to_index],
-                        transition_rate,
-                        rates['technologyCostAdjustmentRateAnnual'],
-                        discount_rate,
-                        years_per_period,
-                        period_index,
-                    )
-                    for period_index in range(1, len(periods))
-                ]
-                for to_index in range(len(base_costs))
-            ]
-            for from_index in range(len(base_costs))
-        ]
+        build_coefficients = (
+            _scalar_cost_coefficients
+            if np is None or not vectorized
+            else _vectorized_cost_coefficients
+        )
+        (
+            opening_coefficients,
+            maintenance_coefficients,
+            decommissioning_coefficients,
+            transition_coefficients,
+        ) = build_coefficients(
+            base_costs,
+            rates,
+            assumptions,
+            discount_factors,
+        )
 
         prepared[fuel] = {
             **rates,
@@ -0,0 +1,165 @@
+// metrics.js
+// Prometheus text-format metrics (exposition format 0.0.4) without a client
+// library: cumulative histograms and counters with labels, rendered on
+// demand by GET /metrics.
+
+// Solve phases span milliseconds (parsing a small payload) to the solver
+// time limit, so the buckets are roughly logarithmic up to 60 s.
+const DEFAULT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60];
+
+// OR-Tools result status codes as reported in `result.status`.
+const SOLVER_STATUS_NAMES = {
+  0: 'OPTIMAL',
+  1: 'FEASIBLE',
+  2: 'INFEASIBLE',
+  3: 'UNBOUNDED',
+  4: 'ABNORMAL',
+  5: 'MODEL_INVALID',
+  6: 'NOT_SOLVED',
+};
+
+function labelKey(labelNames, labels) {
+  return JSON.stringify(labelNames.map((name) => String(labels[name] ?? '')));
+}
+
+function escapeLabelValue(value) {
+  return value.replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+}
+
+function formatLabels(pairs) {
+  if (pairs.length === 0) {
+    return '';
+  }
+  return `{${pairs.map(([name, value]) => `${name}="${escapeLabelValue(value)}"`).join(',')}}`;
+}
+
+function formatNumber(value) {
+  if (value === Infinity) {
+    return '+Inf';
+  }
+  return String(value);
+}
+
+class Counter {
+  constructor(name, help, labelNames = []) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.values = new Map();
+  }
+
+  inc(labels = {}, amount = 1) {
+    const key = labelKey(this.labelNames, labels);
+    this.values.set(key, (this.values.get(key) || 0) + amount);
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} counter`];
+    for (const [key, value] of this.values) {
+      const pairs = this.labelNames.map((name, index) => [name, JSON.parse(key)[index]]);
+      lines.push(`${this.name}${formatLabels(pairs)} ${formatNumber(value)}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+class Histogram {
+  constructor(name, help, labelNames = [], buckets = DEFAULT_BUCKETS) {
+    this.name = name;
+    this.help = help;
+    this.labelNames = labelNames;
+    this.buckets = [...buckets].sort((a, b) => a - b);
+    this.series = new Map();
+  }
+
+  observe(labels, value) {
+    if (!Number.isFinite(value)) {
+      return;
+    }
+    const key = labelKey(this.labelNames, labels);
+    let series = this.series.get(key);
+    if (!series) {
+      series = { counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, series);
+    }
+    const index = this.buckets.findIndex((bound) => value <= bound);
+    if (index !== -1) {
+      series.counts[index] += 1;
+    }
+    series.sum += value;
+    series.count += 1;
+  }
+
+  render() {
+    const lines = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const [key, series] of this.series) {
+      const pairs = this.labelNames.map((name, index) => [name, JSON.parse(key)[index]]);
+      let cumulative = 0;
+      this.buckets.forEach((bound, index) => {
+        cumulative += series.counts[index];
+        const labels = formatLabels([...pairs, ['le', formatNumber(bound)]]);
+        lines.push(`${this.name}_bucket${labels} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels([...pairs, ['le', '+Inf']])} ${series.count}`);
+      lines.push(`${this.name}_sum${formatLabels(pairs)} ${formatNumber(series.sum)}`);
+      lines.push(`${this.name}_count${formatLabels(pairs)} ${series.count}`);
+    }
+    return lines.join('\n');
+  }
+}
+
+// The metrics server.js exposes. `observeSolve` takes a fresh solver pool
+// response; cached responses must not be observed again.
+class SolverMetrics {
+  constructor() {
+    this.requestDuration = new Histogram(
+      'http_request_duration_seconds',
+      'HTTP request latency from arrival to the last byte of the response.',
+      ['method', 'route', 'status']
+    );
+    this.queueWait = new Histogram(
+      'solver_queue_wait_seconds',
+      'Time a solver request waited for a free worker.'
+    );
+    this.phaseDuration = new Histogram(
+      'solver_phase_duration_seconds',
+      'Time spent in each phase of a solve, as reported in result.timings.',
+      ['phase']
+    );
+    this.results = new Counter(
+      'solver_results_total',
+      'Solver responses by solver status, client error (validation_error, cancelled, session_not_found, queue_full, deadline_exceeded) or failure.',
+      ['status']
+    );
+  }
+
+  observeRequest(method, route, status, seconds) {
+    this.requestDuration.observe({ method, route, status }, seconds);
+  }
+
+  observeSolve({ code, result, queueWaitSeconds }) {
+    this.queueWait.observe({}, queueWaitSeconds);
+    if (code !== 0) {
+      const status = code === 2 ? (result && result.error) || 'validation_error' : 'error';
+      this.results.inc({ status });
+      return;
+    }
+    if (result.status !== undefined) {
+      // Sweeps report a status per grid point, not one for the response.
+      this.results.inc({ status: SOLVER_STATUS_NAMES[result.status] || String(result.status) });
+    }
+    for (const [field, seconds] of Object.entries(result.timings || {})) {
+      if (field.endsWith('Seconds') && field !== 'queueWaitSeconds') {
+        this.phaseDuration.observe({ phase: field.slice(0, -'Seconds'.length) }, seconds);
+      }
+    }
+  }
+
+  render() {
+    return `${[this.requestDuration, this.queueWait, this.phaseDuration, this.results]
+      .map((metric) => metric.render())
+      .join('\n')}\n`;
+  }
+}
+
+module.exports = { Counter, Histogram, SolverMetrics, DEFAULT_BUCKETS };
@@ -0,0 +1,346 @@
+import argparse
+import functools
+import gzip
+import json
+import math
+import sys
+from array import array
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2
+
+# Offline export of a built model, for tuning it with another solver. The
+# model is read from its MPModelProto and written one row (LP) or one column
+# (MPS) at a time, so the file text is never held in memory, and files whose
+# path ends in .gz are gzip-compressed as they are written:
+#
+#   python model_export.py payload.json --format mps --output model.mps.gz
+#
+# With names='portable' (the default), y[0,1,2,3] is written as y_0_1_2_3,
+# which CPLEX, Gurobi, HiGHS and CBC all accept; names='native' keeps the
+# builder's names, as OR-Tools' own exporters do. Unnamed variables and
+# constraints become auto_v_<index> and auto_c_<index>.
+#
+# LP files carry the objective offset as a variable `Constant` fixed at 1 and
+# split ranged rows into <name>_lhs and <name>_rhs. MPS files are free format
+# with the objective row COST, whose RHS is the negated offset. 'proto'
+# writes the binary MPModelProto.
+
+EXPORT_FORMATS = ('lp', 'mps', 'proto')
+NAME_STYLES = ('portable', 'native')
+
+_TERMS_PER_LINE = 8
+
+
+def portable_name(name):
+    """Return `name` with the index brackets and commas other solvers reject
+    replaced by underscores."""
+    return name.replace('[', '_').replace(',', '_').replace(']', '')
+
+
+def model_proto(solver):
+    """Return the MPModelProto of a pywraplp solver."""
+    if not hasattr(solver, 'ExportModelToProto'):
+        raise ValueError('Model export requires the mpsolver solver backend')
+    proto = linear_solver_pb2.MPModelProto()
+    solver.ExportModelToProto(proto)
+    return proto
+
+
+def _names(entities, prefix, names):
+    if names not in NAME_STYLES:
+        raise ValueError(f'names must be one of {", ".join(NAME_STYLES)}')
+    rename = portable_name if names == 'portable' else str
+    return [
+        rename(entity.name) if entity.name else f'auto_{prefix}_{index:09d}'
+        for index, entity in enumerate(entities)
+    ]
+
+
+@functools.lru_cache(maxsize=4096)
+def _number(value):
+    text = repr(float(value))
+    return text[:-2] if text.endswith('.0') else text
+
+
+@functools.lru_cache(maxsize=4096)
+def _signed(value):
+    text = _number(value)
+    return text if text.startswith('-') else f'+{text}'
+
+
+def _lp_bound(value):
+    if math.isinf(value):
+        return '-inf' if value < 0 else '+inf'
+    return _number(value)
+
+
+def _is_binary(variable):
+    return variable.is_integer and variable.lower_bound == 0 and variable.upper_bound == 1
+
+
+def _lp_terms(terms):
+    """Return the nonzero `terms` as LP text and their count."""
+    parts = [f' {_signed(coefficient)} {name}' for coefficient, name in terms if coefficient]
+    lines = (
+        ''.join(parts[start:start + _TERMS_PER_LINE])
+        for start in range(0, len(parts), _TERMS_PER_LINE)
+    )
+    return '\n  '.join(lines), len(parts)
+
+
+def write_lp(proto, stream, names='portable'):
+    """Write `proto` to the text stream `stream` in CPLEX LP format."""
+    variable_names = _names(proto.variable, 'v', names)
+    constraint_names = _names(proto.constraint, 'c', names)
+    # An empty expression still needs a term to be valid LP.
+    placeholder = f' 0 {variable_names[0]}' if variable_names else ''
+
+    stream.write('Maximize\n' if proto.maximize else 'Minimize\n')
+    stream.write(' obj:')
+    text, count = _lp_terms(zip(
+        (variable.objective_coefficient for variable in proto.variable),
+        variable_names,
+    ))
+    stream.write(text if count or proto.objective_offset else placeholder)
+    if proto.objective_offset:
+        stream.write(f' {_signed(proto.objective_offset)} Constant')
+    stream.write('\nSubject To\n')
+
+    for constraint, name in zip(proto.constraint, constraint_names):
+        lower = constraint.lower_bound
+        upper = constraint.upper_bound
+        if lower == upper:
+            rows = ((name, '=', lower),)
+        elif math.isinf(upper):
+            rows = () if math.isinf(lower) else ((name, '>=', lower),)
+        elif math.isinf(lower):
+            rows = ((name, '<=', upper),)
+        else:
+            rows = ((f'{name}_lhs', '>=', lower), (f'{name}_rhs', '<=', upper))
+        if rows:
+            text, count = _lp_terms(zip(
+                constraint.coefficient,
+                (variable_names[index] for index in constraint.var_index),
+            ))
+        for row_name, sense, rhs in rows:
+            stream.write(f' {row_name}:{text if count else placeholder} {sense} {_number(rhs)}\n')
+
+    stream.write('Bounds\n')
+    if proto.objective_offset:
+        stream.write(' Constant = 1\n')
+    for variable, name in zip(proto.variable, variable_names):
+        lower = variable.lower_bound
+        upper = variable.upper_bound
+        if _is_binary(variable) or (lower == 0 and math.isinf(upper)):
+            continue
+        if lower == upper:
+            stream.write(f' {name} = {_number(lower)}\n')
+        elif math.isinf(lower) and math.isinf(upper):
+            stream.write(f' {name} free\n')
+        else:
+            stream.write(f' {_lp_bound(lower)} <= {name} <= {_lp_bound(upper)}\n')
+
+    for section, selected in (
+        ('Binaries', _is_binary),
+        ('Generals', lambda variable: variable.is_integer and not _is_binary(variable)),
+    ):
+        if any(selected(variable) for variable in proto.variable):
+            stream.write(f'{section}\n')
+            for variable, name in zip(proto.variable, variable_names):
+                if selected(variable):
+                    stream.write(f' {name}\n')
+    stream.write('End\n')
+
+
+def _mps_row(constraint):
+    """Return the MPS row type, RHS and range of a constraint, or None for
+    a free row."""
+    lower = constraint.lower_bound
+    upper = constraint.upper_bound
+    if lower == upper:
+        return 'E', lower, None
+    if math.isinf(upper):
+        return None if math.isinf(lower) else ('G', lower, None)
+    if math.isinf(lower):
+        return 'L', upper, None
+    return 'G', lower, upper - lower
+
+
+def _column_entries(proto, rows):
+    """Return the nonzeros of `proto` sorted by column as (starts, rows,
+    values) arrays, skipping free rows."""
+    row_indices = array('i')
+    column_indices = array('i')
+    values = array('d')
+    for row_index, (constraint, row) in enumerate(zip(proto.constraint, rows)):
+        if row is None:
+            continue
+        column_indices.extend(constraint.var_index)
+        values.extend(constraint.coefficient)
+        row_indices.extend(array('i', [row_index]) * len(constraint.var_index))
+    columns = np.frombuffer(column_indices, dtype=np.int32)
+    order = np.argsort(columns, kind='stable')
+    starts = np.zeros(len(proto.variable) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columns, minlength=len(proto.variable)), out=starts[1:])
+    return (
+        starts,
+        np.frombuffer(row_indices, dtype=np.int32)[order],
+        np.frombuffer(values, dtype=np.float64)[order],
+    )
+
+
+def write_mps(proto, stream, names='portable'):
+    """Write `proto` to the text stream `stream` in free MPS format."""
+    variable_names = _names(proto.variable, 'v', names)
+    constraint_names = _names(proto.constraint, 'c', names)
+    rows = [_mps_row(constraint) for constraint in proto.constraint]
+
+    stream.write(f'NAME {portable_name(proto.name) or "model"}\n')
+    if proto.maximize:
+        stream.write('OBJSENSE\n    MAX\n')
+    stream.write('ROWS\n N  COST\n')
+    for row, name in zip(rows, constraint_names):
+        if row is not None:
+            stream.write(f' {row[0]}  {name}\n')
+
+    stream.write('COLUMNS\n')
+    starts, entry_rows, entry_values = _column_entries(proto, rows)
+    starts = starts.tolist()
+    integer_block = False
+    for index, (variable, name) in enumerate(zip(proto.variable, variable_names)):
+        if variable.is_integer != integer_block:
+            integer_block = variable.is_integer
+            marker = 'INTORG' if integer_block else 'INTEND'
+            stream.write(f"    MARKER  'MARKER'  '{marker}'\n")
+        start, end = starts[index], starts[index + 1]
+        lines = [
+            f'    {name}  {constraint_names[row_index]}  {_number(value)}\n'
+            for row_index, value in zip(
+                entry_rows[start:end].tolist(),
+                entry_values[start:end].tolist(),
+            )
+            if value
+        ]
+        if variable.objective_coefficient or not lines:
+            # A column must appear here to be known to the BOUNDS section.
+            lines.insert(0, f'    {name}  COST  {_number(variable.objective_coefficient)}\n')
+        stream.write(''.join(lines))
+    if integer_block:
+        stream.write("    MARKER  'MARKER'  'INTEND'\n")
+    del starts, entry_rows, entry_values
+
+    stream.write('RHS\n')
+    if proto.objective_offset:
+        stream.write(f'    RHS  COST  {_number(-proto.objective_offset)}\n')
+    for row, name in zip(rows, constraint_names):
+        if row is not None and row[1]:
+            stream.write(f'    RHS  {name}  {_number(row[1])}\n')
+
+    if any(row is not None and row[2] is not None for row in rows):
+        stream.write('RANGES\n')
+        for row, name in zip(rows, constraint_names):
+            if row is not None and row[2] is not None:
+                stream.write(f'    RNG  {name}  {_number(row[2])}\n')
+
+    stream.write('BOUNDS\n')
+    for variable, name in zip(proto.variable, variable_names):
+        lower = variable.lower_bound
+        upper = variable.upper_bound
+        if _is_binary(variable):
+            stream.write(f' BV BOUND  {name}\n')
+        elif lower == upper:
+            stream.write(f' FX BOUND  {name}  {_number(lower)}\n')
+        elif math.isinf(lower) and math.isinf(upper):
+            stream.write(f' FR BOUND  {name}\n')
+        else:
+            if math.isinf(lower):
+                stream.write(f' MI BOUND  {name}\n')
+            elif lower:
+                stream.write(f' LO BOUND  {name}  {_number(lower)}\n')
+            if not math.isinf(upper):
+                stream.write(f' UP BOUND  {name}  {_number(upper)}\n')
+            elif variable.is_integer:
+                # Some readers default integer columns to [0, 1].
+                stream.write(f' PL BOUND  {name}\n')
+    stream.write('ENDATA\n')
+
+
+def write_model(solver, path, export_format='lp', names='portable', compress=None):
+    """Write the model of a pywraplp solver, or an MPModelProto, to `path`.
+
+    `compress` defaults to whether `path` ends in .gz. Returns the proto's
+    variable and constraint counts."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'export format must be one of {", ".join(EXPORT_FORMATS)}')
+    proto = solver if isinstance(solver, linear_solver_pb2.MPModelProto) else model_proto(solver)
+    if compress is None:
+        compress = path.endswith('.gz')
+    opener = functools.partial(gzip.open, compresslevel=6) if compress else open
+
+    if export_format == 'proto':
+        if names == 'portable':
+            for entity in (*proto.variable, *proto.constraint):
+                entity.name = portable_name(entity.name)
+        elif names not in NAME_STYLES:
+            raise ValueError(f'names must be one of {", ".join(NAME_STYLES)}')
+        with opener(path, 'wb') as model_file:
+            model_file.write(proto.SerializeToString())
+    else:
+        writer = write_lp if export_format == 'lp' else write_mps
+        with opener(path, 'wt', encoding='utf-8') as model_file:
+            writer(proto, model_file, names=names)
+    return {'variables': len(proto.variable), 'constraints': len(proto.constraint)}
+
+
+def _parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        description='Build the model of an optimization request and write it to a file.',
+    )
+    parser.add_argument(
+        'payload',
+        nargs='?',
+        default='-',
+        help='request payload JSON file; stdin when omitted',
+    )
+    parser.add_argument('--output', required=True, help='model file; .gz compresses it')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='lp')
+    parser.add_argument('--names', choices=NAME_STYLES, default='portable')
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        default=None,
+        help='compress the output even when its name does not end in .gz',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    # model_tank_index imports this module for solve_facility_location's
+    # export_model, so the builder is only imported when run as a script.
+    from model_tank_index import VALIDATION_ERRORS, build_model
+
+    arguments = _parse_arguments(argv)
+    if arguments.payload == '-':
+        data = json.load(sys.stdin)
+    else:
+        with open(arguments.payload, encoding='utf-8') as payload_file:
+            data = json.load(payload_file)
+    try:
+        model = build_model(data, keep_names=True)
+        counts = write_model(
+            model['solver'],
+            arguments.output,
+            export_format=arguments.format,
+            names=arguments.names,
+            compress=arguments.gzip,
+        )
+    except VALIDATION_ERRORS as error:
+        print(json.dumps({'error': 'validation_error', 'message': str(error)}))
+        return 2
+    print(json.dumps({'output': arguments.output, 'format': arguments.format, **counts}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
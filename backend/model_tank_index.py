@@ -1,23 +1,155 @@
 import argparse
 import json
 import math
+import multiprocessing
+import os
 import sys
+import threading
 import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
 from pathlib import Path
 
-from ortools.linear_solver import pywraplp
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+from ortools.linear_solver.python import model_builder_helper
+from ortools.sat.python import cp_model
 
+from audit_journal import AuditJournal
 from financial_parameters import (
+    FUEL_ANNUAL_RATE_FIELDS,
     financial_parameters_for_response,
     prepare_financial_costs_for_model,
 )
+from model_export import write_model
+from result_format import (
+    COMPRESSIONS,
+    RESULT_FORMATS,
+    capacity_key,
+    compress,
+    format_result,
+)
+from tank_heuristics import (
+    greedy_fuel_plan,
+    plan_cost,
+    tank_plan_keys,
+    tank_row_bound,
+)
+from warm_start import DEFAULT_PLAN_STORE
 
 # This model contains only binary decision variables. CP-SAT is substantially
 # faster than CBC for the current transition formulation. Keep these settings
 # together so they can be tuned against representative production scenarios.
 SOLVER_BACKEND = 'SAT'
 SOLVER_TIME_LIMIT_MS = 30_000
-# SOLVER_RELATIVE_MIP_GAP = 0.001
+
+# Server policy for the per-request solverOptions timeLimitMs, relativeGap
+# and absoluteGapUSD. A request without timeLimitMs gets
+# SOLVER_TIME_LIMIT_MS; longer limits are cut to maxTimeLimitMs and smaller
+# gaps raised to minRelativeGap and minAbsoluteGapUSD. None leaves the value
+# unbounded. solver_worker.py sets these at startup.
+SOLVER_LIMIT_POLICY = {
+    'maxTimeLimitMs': None,
+    'minRelativeGap': None,
+    'minAbsoluteGapUSD': None,
+}
+
+# Why a solve stopped, from most to least conclusive. Combined results (one
+# solve per fuel) report the last reason any of their solves gave.
+TERMINATION_REASONS = (
+    'optimal',
+    'gapLimit',
+    'timeLimit',
+    'cancelled',
+    'infeasible',
+    'modelInvalid',
+    'abnormal',
+)
+
+# Exceptions that indicate a malformed optimization request rather than a
+# solver failure. Entry points map these to exit code 2 / HTTP 400.
+VALIDATION_ERRORS = (KeyError, TypeError, ValueError, json.JSONDecodeError)
+
+# Per-request solver options supplied as `solverOptions` in the request.
+DEFAULT_SOLVER_OPTIONS = {
+    # No constraint links different fuels, so each fuel can be solved as an
+    # independent subproblem in its own process with the full time limit.
+    'decomposeByFuel': False,
+    # Process count for the per-fuel subproblems; None uses one per core.
+    'decompositionWorkers': None,
+    # Order interchangeable tanks so the solver does not explore
+    # permutations of the same plan. Applies to the per-tank engine only.
+    'symmetryBreaking': False,
+    # 'perTank' builds binaries per tank row; 'aggregated' counts tanks per
+    # capacity option and period and maps the counts back to tank rows.
+    'engine': 'perTank',
+    # 'mpsolver' solves through pywraplp with SOLVER_BACKEND; 'cpsat' builds
+    # the same model directly with ortools.sat.python.cp_model.
+    'solverBackend': 'mpsolver',
+    # Native CP-SAT parameters. None leaves the CP-SAT default in place.
+    'searchWorkers': None,
+    'randomSeed': None,
+    # Stop limits, clamped by SOLVER_LIMIT_POLICY. The search ends at the
+    # time limit or once the incumbent is within relativeGap (a fraction of
+    # the objective) or absoluteGapUSD of the best bound. None keeps the
+    # policy's time limit and the solver's default gaps.
+    'timeLimitMs': None,
+    'relativeGap': None,
+    'absoluteGapUSD': None,
+    # Multiply objective coefficients by this factor and round them to
+    # integers (e.g. 100 for cents). None keeps CP-SAT's floating objective.
+    'objectiveScale': None,
+    # 'expressions' builds the per-tank model through solver.BoolVar/Add
+    # calls; 'arrays' assembles the same rows from NumPy index arrays and
+    # loads them into the solver in one step.
+    'modelBuild': 'expressions',
+    # Skip per-entity variable and constraint names in the 'arrays' build.
+    # Names are still generated when the model is exported.
+    'anonymousNames': False,
+    # 'cumulative' ties operating state to all earlier openings and closures
+    # (O(T^2) nonzeros per tank); 'recursive' carries it from t-1 to t and
+    # forces each permanently zero-demand period empty with a single row.
+    'stateFormulation': 'cumulative',
+    # Drop tank rows that no optimal plan can use, bounded by the cost of a
+    # greedy feasible plan. The optimum is unchanged.
+    'tightenTankCounts': True,
+    # Leave out per-tank variables whose value InitialState and the demand
+    # profile already decide, and the rows they settle (see
+    # _presolve_per_tank). The optimum is unchanged.
+    'presolve': False,
+    # Drop capacity options that another option can replace in every plan
+    # at no extra cost (see _prune_dominated_options). The optimum is
+    # unchanged.
+    'pruneDominatedOptions': False,
+    # Hint a starting plan to the solver: 'greedy' builds one with
+    # tank_heuristics; 'nearest' reuses the closest plan this process solved
+    # for the same periods, fuels and options, falling back to 'greedy'.
+    'warmStart': 'off',
+}
+
+MODEL_ENGINES = ('perTank', 'aggregated')
+SOLVER_BACKENDS = ('mpsolver', 'cpsat')
+MODEL_BUILDS = ('expressions', 'arrays')
+STATE_FORMULATIONS = ('cumulative', 'recursive')
+WARM_START_SOURCES = ('off', 'greedy', 'nearest')
+
+# CP-SAT statuses reported with the pywraplp codes the response always used.
+CP_SAT_STATUS_CODES = {
+    cp_model.OPTIMAL: pywraplp.Solver.OPTIMAL,
+    cp_model.FEASIBLE: pywraplp.Solver.FEASIBLE,
+    cp_model.INFEASIBLE: pywraplp.Solver.INFEASIBLE,
+    cp_model.MODEL_INVALID: pywraplp.Solver.MODEL_INVALID,
+    cp_model.UNKNOWN: pywraplp.Solver.NOT_SOLVED,
+}
+
+# Request fields that are mappings keyed by fuel name.
+FUEL_KEYED_FIELDS = (
+    'Capacities',
+    'TankOptions',
+    'Demand',
+    'InitialState',
+) + FUEL_ANNUAL_RATE_FIELDS
 
 
 def _require_finite_model_number(value, field_name, minimum=None):
@@ -31,6 +163,89 @@ def _require_finite_model_number(value, field_name, minimum=None):
     return number
 
 
+def _validate_solver_options(data):
+    options = data.get('solverOptions', {})
+    if not isinstance(options, dict):
+        raise ValueError('solverOptions must be an object')
+    unknown = sorted(set(options) - set(DEFAULT_SOLVER_OPTIONS))
+    if unknown:
+        raise ValueError(f'Unknown solverOptions: {", ".join(unknown)}')
+    validated = {**DEFAULT_SOLVER_OPTIONS, **options}
+
+    for field in (
+        'decomposeByFuel',
+        'symmetryBreaking',
+        'anonymousNames',
+        'tightenTankCounts',
+        'presolve',
+        'pruneDominatedOptions',
+    ):
+        if not isinstance(validated[field], bool):
+            raise ValueError(f'solverOptions.{field} must be a boolean')
+    if validated['engine'] not in MODEL_ENGINES:
+        raise ValueError(
+            f'solverOptions.engine must be one of {", ".join(MODEL_ENGINES)}'
+        )
+    if validated['solverBackend'] not in SOLVER_BACKENDS:
+        raise ValueError(
+            'solverOptions.solverBackend must be one of '
+            f'{", ".join(SOLVER_BACKENDS)}'
+        )
+    for field, minimum in (
+        ('decompositionWorkers', 1),
+        ('searchWorkers', 1),
+        ('randomSeed', 0),
+    ):
+        value = validated[field]
+        if value is not None and (
+            isinstance(value, bool) or not isinstance(value, int) or value < minimum
+        ):
+            raise ValueError(
+                f'solverOptions.{field} must be an integer of at least {minimum}'
+            )
+    for field in ('relativeGap', 'absoluteGapUSD'):
+        if validated[field] is not None:
+            _require_finite_model_number(
+                validated[field],
+                f'solverOptions.{field}',
+                minimum=0,
+            )
+    if validated['timeLimitMs'] is not None and _require_finite_model_number(
+        validated['timeLimitMs'],
+        'solverOptions.timeLimitMs',
+    ) <= 0:
+        raise ValueError('solverOptions.timeLimitMs must be positive')
+    if validated['objectiveScale'] is not None and _require_finite_model_number(
+        validated['objectiveScale'],
+        'solverOptions.objectiveScale',
+    ) <= 0:
+        raise ValueError('solverOptions.objectiveScale must be positive')
+    if validated['modelBuild'] not in MODEL_BUILDS:
+        raise ValueError(
+            f'solverOptions.modelBuild must be one of {", ".join(MODEL_BUILDS)}'
+        )
+    if validated['modelBuild'] == 'arrays' and (
+        validated['engine'] != 'perTank' or validated['solverBackend'] != 'mpsolver'
+    ):
+        raise ValueError(
+            "solverOptions.modelBuild 'arrays' requires the perTank engine and "
+            'the mpsolver solver backend'
+        )
+    if validated['stateFormulation'] not in STATE_FORMULATIONS:
+        raise ValueError(
+            'solverOptions.stateFormulation must be one of '
+            f'{", ".join(STATE_FORMULATIONS)}'
+        )
+    if validated['warmStart'] not in WARM_START_SOURCES:
+        raise ValueError(
+            'solverOptions.warmStart must be one of '
+            f'{", ".join(WARM_START_SOURCES)}'
+        )
+    if validated['anonymousNames'] and validated['modelBuild'] != 'arrays':
+        raise ValueError("solverOptions.anonymousNames requires modelBuild 'arrays'")
+    return validated
+
+
 def _validate_model_inputs(data, prepared_costs):
     periods = data['T']
     fuels = data['Fuels']
@@ -81,9 +296,9 @@ def _validate_model_inputs(data, prepared_costs):
         fuel_initial_state = initial_state_by_fuel.get(fuel)
         if not isinstance(fuel_initial_state, list):
             raise ValueError(f'InitialState.{fuel} must be a list by tank index')
-        if len(fuel_initial_state) != tank_count:
+        if len(fuel_initial_state) > tank_count:
             raise ValueError(
-                f'InitialState.{fuel} must contain {tank_count} tank rows'
+                f'InitialState.{fuel} must contain at most {tank_count} tank rows'
             )
 
         validated_rows = []
@@ -106,6 +321,10 @@ def _validate_model_inputs(data, prepared_costs):
                     f'InitialState.{fuel}[{tank_index}] selects multiple capacities'
                 )
             validated_rows.append(validated_row)
+        # Rows left out of InitialState are tanks that do not exist yet.
+        validated_rows.extend(
+            [0] * len(capacities) for _ in range(tank_count - len(validated_rows))
+        )
 
         initial_capacity = sum(
             validated_capacities[option_index] * validated_rows[tank_index][option_index]
@@ -125,36 +344,776 @@ def _validate_model_inputs(data, prepared_costs):
     return validated_demand, validated_initial_state, tank_counts
 
 
-def build_facility_location_model(data):
+def _tighten_tank_counts(data, prepared_costs, demand, initial_state, tank_counts):
+    """Cut each fuel's tank rows to those an optimal plan can need.
+
+    A greedy feasible plan bounds the fuel's optimal cost, which in turn
+    bounds how many tanks an optimal plan opens (see tank_row_bound). Fuels
+    for which the greedy rule finds no plan keep every row.
+    """
+    periods = data['T']
+    tightened_state = {}
+    tightened_counts = {}
+    bounds = {}
+    for fuel in data['Fuels']:
+        plan = greedy_fuel_plan(
+            demand[fuel],
+            periods,
+            data['Capacities'][fuel],
+            prepared_costs[fuel],
+            initial_state[fuel],
+        )
+        greedy_cost = None if plan is None else plan_cost(plan, prepared_costs[fuel])
+        rows = tank_counts[fuel]
+        if plan is not None:
+            rows = tank_row_bound(
+                greedy_cost,
+                demand[fuel],
+                periods,
+                prepared_costs[fuel],
+                initial_state[fuel],
+            )
+        tightened_state[fuel] = initial_state[fuel][:rows]
+        tightened_counts[fuel] = rows
+        bounds[fuel] = {
+            'demandBound': tank_counts[fuel],
+            'tankRows': rows,
+            'greedyCostUSD': greedy_cost,
+        }
+    return tightened_state, tightened_counts, bounds
+
+
+def _option_cost_arrays(costs):
+    # Per-option cost coefficients from period 1 on: opening, maintenance and
+    # decommissioning as (option, period) arrays and transitions as
+    # (from, to, period), NaN on the diagonal. Period 0 only holds the
+    # InitialState tanks, whose options are never pruned.
+    period_count = len(costs['maintenanceCostCoefficientsUSD'][0])
+    option_count = len(costs['maintenanceCostCoefficientsUSD'])
+    transition = np.array(
+        [
+            [[None] * period_count if row is None else row for row in from_rows]
+            for from_rows in costs['transitionCostCoefficientsUSD']
+        ],
+        dtype=float,
+    ).reshape(option_count, option_count, period_count)
+    return (
+        np.asarray(costs['openingCostCoefficientsUSD'], dtype=float)[:, 1:],
+        np.asarray(costs['maintenanceCostCoefficientsUSD'], dtype=float)[:, 1:],
+        np.asarray(costs['decommissioningCostCoefficientsUSD'], dtype=float)[:, 1:],
+        transition[:, :, 1:],
+    )
+
+
+def _replaces_option(cost_arrays, capacities, options, replacement, option):
+    # Whether every tank with `option` in a plan over `options` can take
+    # `replacement` in the same periods instead: it holds at least as much,
+    # and no opening, maintenance, decommissioning or transition it takes
+    # part in costs more.
+    if capacities[replacement] < capacities[option]:
+        return False
+    *coefficients, transition = cost_arrays
+    if any(
+        (values[replacement] > values[option]).any() for values in coefficients
+    ):
+        return False
+    others = [other for other in options if other not in (replacement, option)]
+    return not (
+        (transition[others, replacement] > transition[others, option]).any()
+        or (transition[replacement, others] > transition[option, others]).any()
+        # A transition between the two disappears.
+        or (transition[replacement, option] < 0).any()
+        or (transition[option, replacement] < 0).any()
+    )
+
+
+def _prune_dominated_options(data, prepared_costs, initial_state):
+    """Find the capacity options no optimal plan needs.
+
+    An option is dominated when another option that is still kept can
+    replace it in every plan without costing more (see _replaces_option).
+    Replacing the pruned options one at a time, in the order they were
+    pruned, turns any plan into one over the kept options that is feasible
+    and no more expensive, so the optimum is unchanged. Options pinned by
+    InitialState are kept. Of two interchangeable options the lower index is
+    kept.
+
+    Returns ({fuel: kept option indices}, {fuel: [pruned option]}).
+    """
+    option_indices = {}
+    pruned = {}
+    for fuel in data['Fuels']:
+        capacities = data['Capacities'][fuel]
+        pinned = {
+            option_index
+            for row in initial_state[fuel]
+            for option_index, value in enumerate(row)
+            if value
+        }
+        cost_arrays = _option_cost_arrays(prepared_costs[fuel])
+        kept = list(range(len(capacities)))
+        fuel_pruned = []
+        # Pruning an option can lift the transition check on another, so
+        # passes repeat until none prunes anything.
+        pruning = True
+        while pruning:
+            pruning = False
+            for option_index in reversed(list(kept)):
+                if option_index in pinned:
+                    continue
+                replacement = next(
+                    (
+                        candidate
+                        for candidate in kept
+                        if candidate != option_index and _replaces_option(
+                            cost_arrays,
+                            capacities,
+                            kept,
+                            candidate,
+                            option_index,
+                        )
+                    ),
+                    None,
+                )
+                if replacement is None:
+                    continue
+                kept.remove(option_index)
+                fuel_pruned.append({
+                    'optionIndex': option_index,
+                    'capacity': capacities[option_index],
+                    'dominatedBy': replacement,
+                })
+                pruning = True
+        option_indices[fuel] = kept
+        if fuel_pruned:
+            pruned[fuel] = sorted(fuel_pruned, key=lambda option: option['optionIndex'])
+    return option_indices, pruned
+
+
+# Prepared cost fields with one entry per capacity option.
+_OPTION_COST_FIELDS = (
+    'baseInvestmentCostsUSD',
+    'openingCostCoefficientsUSD',
+    'maintenanceCostCoefficientsUSD',
+    'decommissioningCostCoefficientsUSD',
+)
+
+
+def _option_subset(data, prepared_costs, initial_state, option_indices):
+    """Restrict the request, its prepared costs and initial state to the
+    options in `option_indices`, renumbered from zero."""
+    subset = dict(data)
+    subset_costs = {}
+    subset_state = {}
+    for field in ('Capacities', 'TankOptions'):
+        subset[field] = {
+            **data[field],
+            **{
+                fuel: [data[field][fuel][option] for option in options]
+                for fuel, options in option_indices.items()
+            },
+        }
+    for fuel, options in option_indices.items():
+        costs = dict(prepared_costs[fuel])
+        for field in _OPTION_COST_FIELDS:
+            costs[field] = [prepared_costs[fuel][field][option] for option in options]
+        transition = prepared_costs[fuel]['transitionCostCoefficientsUSD']
+        costs['transitionCostCoefficientsUSD'] = [
+            [transition[from_option][to_option] for to_option in options]
+            for from_option in options
+        ]
+        costs['investmentCostsUSDByPeriod'] = costs['openingCostCoefficientsUSD']
+        costs['maintenanceCostsUSDByPeriod'] = costs['maintenanceCostCoefficientsUSD']
+        costs['decommissioningCostsUSDByPeriod'] = costs['decommissioningCostCoefficientsUSD']
+        subset_costs[fuel] = costs
+        subset_state[fuel] = [
+            [row[option] for option in options] for row in initial_state[fuel]
+        ]
+    return subset, subset_costs, subset_state
+
+
+def _prepare_model_inputs(data, solver_options, timings, control=None):
+    """Validate `data` and prepare what either engine builds from.
+
+    Returns (model data, prepared costs, demand, initial state, tank counts,
+    tank count bounds, option pruning). With pruneDominatedOptions the model
+    data, costs and initial state cover the kept options only and the
+    pruning is ({fuel: kept option indices}, {fuel: [pruned option]});
+    otherwise it is None. Tank counts always follow the full request.
+    `control` (a SolveControl) is told once the request is valid.
+    """
     prepared_costs = prepare_financial_costs_for_model(data)
+    timings.lap('preparation')
     demand, initial_state, tank_counts = _validate_model_inputs(
         data,
         prepared_costs,
     )
+    timings.lap('validation')
+    if control is not None:
+        control.report('validated')
+    pruning = None
+    if solver_options['pruneDominatedOptions']:
+        pruning = _prune_dominated_options(data, prepared_costs, initial_state)
+        data, prepared_costs, initial_state = _option_subset(
+            data,
+            prepared_costs,
+            initial_state,
+            pruning[0],
+        )
+    tank_count_bounds = None
+    if solver_options['tightenTankCounts']:
+        initial_state, tank_counts, tank_count_bounds = _tighten_tank_counts(
+            data,
+            prepared_costs,
+            demand,
+            initial_state,
+            tank_counts,
+        )
+    timings.lap('preparation')
+    return (
+        data,
+        prepared_costs,
+        demand,
+        initial_state,
+        tank_counts,
+        tank_count_bounds,
+        pruning,
+    )
 
+
+def _with_option_pruning(model, data, pruning):
+    # Records the pruning on a built model; solve_model maps plans between
+    # the model's options and the request's.
+    if pruning is not None:
+        model['modelData'] = data
+        model['optionIndices'] = [pruning[0][fuel] for fuel in data['Fuels']]
+        model['prunedOptions'] = pruning[1]
+    return model
+
+
+def _plan_options(plan, option_maps):
+    # Renumber the options in plan keys; keys of options missing from the
+    # map are left out.
+    mapped = {}
+    for family, keys in plan.items():
+        positions = (2, 3) if family == 'z' else (2,)
+        family_keys = set()
+        for key in keys:
+            option_map = option_maps[key[0]]
+            if all(key[position] in option_map for position in positions):
+                key = list(key)
+                for position in positions:
+                    key[position] = option_map[key[position]]
+                family_keys.add(tuple(key))
+        mapped[family] = family_keys
+    return mapped
+
+
+def _request_plan(model, plan):
+    """A plan over the model's options as a plan over the request's."""
+    if model.get('optionIndices') is None:
+        return plan
+    return _plan_options(plan, [dict(enumerate(options)) for options in model['optionIndices']])
+
+
+def _model_plan(model, plan):
+    """A plan over the request's options as a plan over the model's; keys
+    of pruned options are dropped."""
+    if model.get('optionIndices') is None:
+        return plan
+    return _plan_options(
+        plan,
+        [
+            {option: index for index, option in enumerate(options)}
+            for options in model['optionIndices']
+        ],
+    )
+
+
+class PhaseTimings(dict):
+    """Wall-clock seconds per request phase, e.g. {'buildSeconds': 0.12}.
+
+    lap(phase) charges the time since the previous lap (or since the timer
+    was created or restarted) to `phase`; a phase lapped twice accumulates.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lap_started = time.perf_counter()
+
+    def restart(self):
+        self._lap_started = time.perf_counter()
+        return self
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        key = f'{phase}Seconds'
+        self[key] = self.get(key, 0.0) + now - self._lap_started
+        self._lap_started = now
+
+
+class SolveControl:
+    """Progress events and cancellation for one solve.
+
+    `progress` is called with event dicts ({'event': 'validated'},
+    {'event': 'model', ...}, {'event': 'incumbent', ...}); incumbents are only
+    reported by the cpsat backend. cancel() may be called from another
+    thread and stops the search, keeping the best plan found so far.
+    """
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.cancelled = False
+        self._interrupt = None
+        self._lock = threading.Lock()
+
+    def report(self, event, **fields):
+        if self.progress is not None:
+            self.progress({'event': event, **fields})
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._interrupt is not None:
+                self._interrupt()
+
+    def attach(self, solver):
+        self.attach_interrupt(lambda: _interrupt(solver))
+
+    def attach_interrupt(self, interrupt):
+        """Call `interrupt` when the solve is cancelled, until detach()."""
+        with self._lock:
+            self._interrupt = interrupt
+
+    def detach(self):
+        with self._lock:
+            self._interrupt = None
+
+
+def _interrupt(solver):
+    if isinstance(solver, CpSatSolver):
+        solver.solver.StopSearch()
+    else:
+        solver.InterruptSolve()
+
+
+class _SolutionCallback(cp_model.CpSolverSolutionCallback):
+    def __init__(self, solver):
+        super().__init__()
+        self.solver = solver
+        self.first_solution_seconds = None
+
+    def on_solution_callback(self):
+        if self.first_solution_seconds is None:
+            self.first_solution_seconds = self.WallTime()
+        if self.solver.solution_listener is not None:
+            # Solution values are read from this callback while it runs.
+            self.solver.incumbent = self
+            try:
+                self.solver.solution_listener()
+            finally:
+                self.solver.incumbent = None
+
+
+class CpSatSolver:
+    """The subset of the pywraplp.Solver interface used by the model
+    builders, backed by a native CP-SAT model so its parallel search and
+    parameters are available."""
+
+    def __init__(self, solver_options):
+        self.model = cp_model.CpModel()
+        self.solver = cp_model.CpSolver()
+        self.options = solver_options
+        self.time_limit_ms = None
+        self.relative_gap = None
+        self.absolute_gap_usd = None
+        # Unscaled objective as (variable, coefficient) pairs plus offset, so
+        # the reported objective is exact even when CP-SAT optimizes a
+        # rounded integer objective.
+        self.objective_terms = []
+        self.objective_offset = 0.0
+        self.status = None
+        self.first_solution_seconds = None
+        # Called for every improving solution; see _SolutionCallback.
+        self.solution_listener = None
+        self.incumbent = None
+
+    def BoolVar(self, name):
+        return self.model.NewBoolVar(name)
+
+    def IntVar(self, lower_bound, upper_bound, name):
+        return self.model.NewIntVar(lower_bound, upper_bound, name)
+
+    def Sum(self, terms):
+        return cp_model.LinearExpr.Sum(list(terms))
+
+    def Add(self, constraint, name=''):
+        added = self.model.Add(constraint)
+        if name:
+            added.WithName(name)
+        return added
+
+    def Minimize(self, expression):
+        self.model.Minimize(expression)
+        objective = self.model.Proto().floating_point_objective
+        self.objective_terms = [
+            (self.model.GetIntVarFromProtoIndex(index), coefficient)
+            for index, coefficient in zip(objective.vars, objective.coeffs)
+        ]
+        self.objective_columns = np.array(objective.vars, dtype=np.int64)
+        self.objective_offset = objective.offset
+        scale = self.options['objectiveScale']
+        if scale is not None:
+            self.model.ClearObjective()
+            self.model.Minimize(
+                cp_model.LinearExpr.WeightedSum(
+                    [variable for variable, _ in self.objective_terms],
+                    [round(coefficient * scale) for _, coefficient in self.objective_terms],
+                )
+            )
+
+    def SetHint(self, variables, values):
+        for variable, value in zip(variables, values):
+            self.model.AddHint(variable, value)
+
+    def NumVariables(self):
+        return len(self.model.Proto().variables)
+
+    def NumConstraints(self):
+        return len(self.model.Proto().constraints)
+
+    def SetTimeLimit(self, time_limit_ms):
+        self.time_limit_ms = time_limit_ms
+
+    def SetGapLimits(self, relative_gap, absolute_gap_usd):
+        self.relative_gap = relative_gap
+        self.absolute_gap_usd = absolute_gap_usd
+
+    def Solve(self, parameters=None):
+        cp_parameters = self.solver.parameters
+        if self.time_limit_ms is not None:
+            cp_parameters.max_time_in_seconds = self.time_limit_ms / 1000.0
+        if self.options['searchWorkers'] is not None:
+            cp_parameters.num_workers = self.options['searchWorkers']
+        if self.options['randomSeed'] is not None:
+            cp_parameters.random_seed = self.options['randomSeed']
+        if self.relative_gap is not None:
+            cp_parameters.relative_gap_limit = self.relative_gap
+        if self.absolute_gap_usd is not None:
+            cp_parameters.absolute_gap_limit = (
+                self.absolute_gap_usd * (self.options['objectiveScale'] or 1)
+            )
+        callback = _SolutionCallback(self)
+        self.status = self.solver.Solve(self.model, callback)
+        self.first_solution_seconds = callback.first_solution_seconds
+        return CP_SAT_STATUS_CODES[self.status]
+
+    def WallTime(self):
+        if self.status is None:
+            return 0.0
+        return self.solver.WallTime() * 1000.0
+
+    def Objective(self):
+        return self
+
+    def Value(self):
+        # Zero terms do not change the sum, so only the nonzero ones are
+        # added, still in objective order.
+        values = self.solution_values()[self.objective_columns]
+        terms = values.tolist()
+        return self.objective_offset + sum(
+            self.objective_terms[position][1] * terms[position]
+            for position in np.flatnonzero(values).tolist()
+        )
+
+    def BestBound(self):
+        source = self.incumbent or self.solver
+        scale = self.options['objectiveScale']
+        if scale is None:
+            return source.BestObjectiveBound()
+        # The scaled objective leaves out the offset.
+        return source.BestObjectiveBound() / scale + self.objective_offset
+
+    def solution_value(self, variable):
+        return (self.incumbent or self.solver).Value(variable)
+
+    def solution_values(self):
+        """Values of all variables, indexed by proto index."""
+        source = self.incumbent or self.solver
+        return np.array(source.response_proto.solution, dtype=np.int64)
+
+
+def _create_solver(solver_options):
+    if solver_options['solverBackend'] == 'cpsat':
+        return CpSatSolver(solver_options)
     solver = pywraplp.Solver.CreateSolver(SOLVER_BACKEND)
     if not solver:
         raise RuntimeError(f'{SOLVER_BACKEND} solver is not available')
+    return solver
+
+
+def _demand_row(solver, capacities, demand):
+    # CP-SAT only accepts integer coefficients and bounds. Capacities are
+    # scaled to integers (up to six decimals) and the demand bound rounded
+    # up, which admits exactly the same integer tank selections.
+    if not isinstance(solver, CpSatSolver):
+        return capacities, demand
+    for decimals in range(7):
+        scale = 10 ** decimals
+        scaled = [round(capacity * scale) for capacity in capacities]
+        if all(
+            math.isclose(capacity * scale, value, rel_tol=0, abs_tol=1e-6)
+            for capacity, value in zip(capacities, scaled)
+        ):
+            return scaled, math.ceil(round(demand * scale, 6))
+    raise ValueError(
+        'Capacities must have at most six decimals for the cpsat solver backend'
+    )
+
+
+def _tank_ordering_key(solver, y, x, fuel_index, tank_index, option_count, period_count):
+    # Lexicographic key (opening period, opening capacity option, closing
+    # period) as one integer-valued expression. A tank that never opens sorts
+    # after every opened tank and a tank that never closes after every closed
+    # one. Variables left out by presolve are fixed at zero unless y or x
+    # holds them as constants.
+    opening_key = period_count * option_count + solver.Sum(
+        (period_index * option_count + option_index - period_count * option_count)
+        * y.get((fuel_index, tank_index, option_index, period_index), 0)
+        for option_index in range(option_count)
+        for period_index in range(period_count)
+    )
+    closing_key = period_count + solver.Sum(
+        (period_index - period_count)
+        * x.get((fuel_index, tank_index, option_index, period_index), 0)
+        for option_index in range(option_count)
+        for period_index in range(period_count)
+    )
+    return (period_count + 1) * opening_key + closing_key
+
+
+def _add_tank_symmetry_breaking(
+    solver,
+    y,
+    x,
+    fuels,
+    capacities_by_fuel,
+    period_count,
+    tank_counts,
+    initial_state,
+):
+    # Tanks are identical apart from their InitialState row, so tanks that
+    # share a row are interchangeable: any plan can be relabelled to sort them
+    # by the ordering key. Pinned tanks are only compared with tanks pinned to
+    # the same capacity, never with free or differently pinned tanks.
+    for fuel_index, fuel in enumerate(fuels):
+        option_count = len(capacities_by_fuel[fuel])
+        groups = {}
+        for tank_index in range(tank_counts[fuel]):
+            groups.setdefault(tuple(initial_state[fuel][tank_index]), []).append(
+                tank_index
+            )
+        for tank_indices in groups.values():
+            for earlier_tank, later_tank in zip(tank_indices, tank_indices[1:]):
+                solver.Add(
+                    _tank_ordering_key(
+                        solver, y, x, fuel_index, earlier_tank, option_count, period_count
+                    )
+                    <= _tank_ordering_key(
+                        solver, y, x, fuel_index, later_tank, option_count, period_count
+                    ),
+                    f'tank_symmetry[{fuel_index},{earlier_tank},{later_tank}]',
+                )
+
+
+def _permanent_zero_demand_rows(fuel_demand, periods, state_formulation):
+    """Yield (row key, period index) for each permanent_zero_demand row.
+
+    If demand drops from positive to zero, every later zero-demand period must
+    be empty. The cumulative formulation emits one row per (drop period,
+    future period) pair. A zero-demand period is covered by some drop exactly
+    when an earlier period has positive demand, so the recursive formulation
+    emits each such period once; the duplicate rows were identical.
+    """
+    if state_formulation == 'recursive':
+        seen_positive = False
+        for period_index, period in enumerate(periods):
+            if fuel_demand[period] > 0:
+                seen_positive = True
+            elif seen_positive:
+                yield f'{period_index}', period_index
+        return
+    for drop_period in range(1, len(periods)):
+        if not (
+            fuel_demand[periods[drop_period - 1]] > 0
+            and fuel_demand[periods[drop_period]] == 0
+        ):
+            continue
+        for future_period in range(drop_period, len(periods)):
+            if fuel_demand[periods[future_period]] != 0:
+                continue
+            yield f'{drop_period},{future_period}', future_period
+
+
+def _presolve_per_tank(data, demand, initial_state, tank_counts):
+    """Per-tank variable values that every feasible plan shares.
+
+    Returns {fuel: (y, s, x, z)} int8 arrays shaped like the index arrays of
+    _per_tank_variable_indices, holding 0 or 1 where the rows below force a
+    value and -1 where the variable is free:
 
+    - initial_opening, initial_operating and initial_closure pin period 0;
+    - single_opening keeps a tank pinned open in period 0 from opening again;
+    - permanent_zero_demand empties the periods after demand has dropped;
+    - operational stops a tank from operating or closing before it opens;
+    - decommissioning_validity and transition_ub1 stop a closure or a
+      transition from an option that was inactive in the previous period,
+      transition_ub2 a transition into an option that is not operating.
+
+    The fixed values follow from the rows, so the feasible plans and the
+    optimum are unchanged when the fixed variables are not built.
+    """
+    periods = data['T']
+    period_count = len(periods)
+    presolved = {}
+    for fuel in data['Fuels']:
+        option_count = len(data['Capacities'][fuel])
+        tank_count = tank_counts[fuel]
+        y = np.full((tank_count, option_count, period_count), -1, dtype=np.int8)
+        s = y.copy()
+        x = y.copy()
+        z = np.full(
+            (tank_count, option_count, option_count, period_count),
+            -1,
+            dtype=np.int8,
+        )
+        initial = np.array(initial_state[fuel], dtype=np.int8).reshape(
+            tank_count,
+            option_count,
+        )
+        y[:, :, 0] = initial
+        s[:, :, 0] = 0
+        x[:, :, 0] = 0
+        pinned = initial.any(axis=1)
+        y[pinned, :, 1:] = 0
+        empty_periods = sorted({
+            period_index
+            for _, period_index in _permanent_zero_demand_rows(
+                demand[fuel],
+                periods,
+                'recursive',
+            )
+        })
+        y[:, :, empty_periods] = 0
+        s[:, :, empty_periods] = 0
+        for tank_index in np.flatnonzero(~pinned).tolist():
+            openings = np.flatnonzero((y[tank_index] < 0).any(axis=0))
+            first_opening = openings[0] if len(openings) else period_count
+            s[tank_index, :, :first_opening + 1] = 0
+            x[tank_index, :, :first_opening + 1] = 0
+        inactive = (y == 0) & (s == 0)
+        x[:, :, 1:][inactive[:, :, :-1]] = 0
+        transition_fixed = (
+            inactive[:, :, None, :-1] | (s == 0)[:, None, :, 1:]
+        ) & ~np.eye(option_count, dtype=bool)[None, :, :, None]
+        z[:, :, :, 1:][transition_fixed] = 0
+        presolved[fuel] = (y, s, x, z)
+    return presolved
+
+
+def _fixed_plan(presolved, fuels):
+    # Keys of the variables presolve fixed at one, per family, so they can be
+    # added back to every extracted plan.
+    plan = {family: set() for family in ('y', 's', 'x', 'z')}
+    for fuel_index, fuel in enumerate(fuels):
+        for family, values in zip(('y', 's', 'x', 'z'), presolved[fuel]):
+            plan[family].update(
+                (fuel_index, *key) for key in np.argwhere(values == 1).tolist()
+            )
+    return plan
+
+
+def _fixed_objective(prepared_costs, fuels, fixed_plan):
+    # Objective constant of the variables fixed at one.
+    return sum(
+        float(_objective_coefficient(prepared_costs[fuels[key[0]]], family, key))
+        for family, keys in fixed_plan.items()
+        for key in keys
+    )
+
+
+def _add_per_tank_rows(
+    solver,
+    data,
+    prepared_costs,
+    demand,
+    initial_state,
+    tank_counts,
+    state_formulation='cumulative',
+    presolved=None,
+):
+    """Add the per-tank model to `solver`.
+
+    Returns the y, s, x and z variables and the number of rows left out.
+    With `presolved` (see _presolve_per_tank), fixed variables are not
+    created: rows use their values as constants, and a row left with no
+    variable is dropped.
+    """
     periods = data['T']
     fuels = data['Fuels']
     capacities_by_fuel = data['Capacities']
     y, s, x, z = {}, {}, {}, {}
+    removed_rows = 0
+
+    def term(fixed_values, index, name):
+        # A fixed variable is built as the int it is fixed at.
+        if fixed_values is not None:
+            value = fixed_values
+            for position in index:
+                value = value[position]
+            if value >= 0:
+                return value
+        return solver.BoolVar(name)
+
+    def add_row(terms, constraint, name, satisfied=True):
+        # The rows imply the fixed values, so a row of constants holds; only
+        # demand rows check `satisfied` explicitly. Rows keep every variable
+        # on the left, so substituting a constant never flips a row's sense
+        # and both builds emit the same rows.
+        nonlocal removed_rows
+        if presolved is not None and satisfied and all(
+            isinstance(row_term, int) for row_term in terms
+        ):
+            removed_rows += 1
+            return
+        solver.Add(constraint, name)
 
     for fuel_index, fuel in enumerate(fuels):
         option_count = len(capacities_by_fuel[fuel])
+        fixed_y, fixed_s, fixed_x, fixed_z = (
+            [values.tolist() for values in presolved[fuel]]
+            if presolved is not None
+            else (None,) * 4
+        )
         for tank_index in range(tank_counts[fuel]):
             for option_index in range(option_count):
                 for period_index in range(len(periods)):
                     key = (fuel_index, tank_index, option_index, period_index)
-                    y[key] = solver.BoolVar(
-                        f'y[{fuel_index},{tank_index},{option_index},{period_index}]'
+                    index = key[1:]
+                    y[key] = term(
+                        fixed_y,
+                        index,
+                        f'y[{fuel_index},{tank_index},{option_index},{period_index}]',
                     )
-                    s[key] = solver.BoolVar(
-                        f's[{fuel_index},{tank_index},{option_index},{period_index}]'
+                    s[key] = term(
+                        fixed_s,
+                        index,
+                        f's[{fuel_index},{tank_index},{option_index},{period_index}]',
                     )
-                    x[key] = solver.BoolVar(
-                        f'x[{fuel_index},{tank_index},{option_index},{period_index}]'
+                    x[key] = term(
+                        fixed_x,
+                        index,
+                        f'x[{fuel_index},{tank_index},{option_index},{period_index}]',
                     )
             for from_option in range(option_count):
                 for to_option in range(option_count):
@@ -168,9 +1127,11 @@ def build_facility_location_model(data):
                             to_option,
                             period_index,
                         )
-                        z[key] = solver.BoolVar(
+                        z[key] = term(
+                            fixed_z,
+                            key[1:],
                             f'z[{fuel_index},{tank_index},{from_option},'
-                            f'{to_option},{period_index}]'
+                            f'{to_option},{period_index}]',
                         )
 
     objective_terms = []
@@ -218,17 +1179,36 @@ def build_facility_location_model(data):
     for fuel_index, fuel in enumerate(fuels):
         option_count = len(capacities_by_fuel[fuel])
         for period_index, period in enumerate(periods):
-            solver.Add(
-                solver.Sum(
-                    capacities_by_fuel[fuel][option_index]
-                    * (
-                        y[fuel_index, tank_index, option_index, period_index]
-                        + s[fuel_index, tank_index, option_index, period_index]
-                    )
+            capacities, required = _demand_row(
+                solver,
+                capacities_by_fuel[fuel],
+                demand[fuel][period],
+            )
+            active = [
+                (
+                    capacities[option_index],
+                    y[fuel_index, tank_index, option_index, period_index]
+                    + s[fuel_index, tank_index, option_index, period_index],
+                )
+                for tank_index in range(tank_counts[fuel])
+                for option_index in range(option_count)
+            ]
+            add_row(
+                [
+                    family[fuel_index, tank_index, option_index, period_index]
+                    for family in (y, s)
                     for tank_index in range(tank_counts[fuel])
                     for option_index in range(option_count)
-                ) >= demand[fuel][period],
+                ],
+                solver.Sum(
+                    capacity * tank_active for capacity, tank_active in active
+                ) >= required,
                 f'demand[{fuel_index},{period_index}]',
+                satisfied=all(
+                    isinstance(tank_active, int) for _, tank_active in active
+                ) and sum(
+                    capacity * tank_active for capacity, tank_active in active
+                ) >= required,
             )
 
     # Operational state is intentionally aggregated over capacity options.
@@ -236,42 +1216,73 @@ def build_facility_location_model(data):
         option_count = len(capacities_by_fuel[fuel])
         for tank_index in range(tank_counts[fuel]):
             for period_index in range(1, len(periods)):
-                solver.Add(
-                    solver.Sum(
-                        s[fuel_index, tank_index, option_index, period_index]
+                operating = [
+                    s[fuel_index, tank_index, option_index, period_index]
+                    for option_index in range(option_count)
+                ]
+                if state_formulation == 'recursive':
+                    # Tanks operating in t were active in t-1 and not closed
+                    # in t. With s = 0 in period 0 this telescopes to the
+                    # cumulative row below.
+                    prior_active = [
+                        s[fuel_index, tank_index, option_index, period_index - 1]
+                        + y[fuel_index, tank_index, option_index, period_index - 1]
                         for option_index in range(option_count)
-                    )
-                    == solver.Sum(
-                        y[fuel_index, tank_index, option_index, earlier_period]
+                    ]
+                    closed = [
+                        x[fuel_index, tank_index, option_index, period_index]
                         for option_index in range(option_count)
-                        for earlier_period in range(period_index)
+                    ]
+                    add_row(
+                        operating + closed + [
+                            family[fuel_index, tank_index, option_index, period_index - 1]
+                            for family in (y, s)
+                            for option_index in range(option_count)
+                        ],
+                        solver.Sum(operating)
+                        == solver.Sum(prior_active) - solver.Sum(closed),
+                        f'operational[{fuel_index},{tank_index},{period_index}]',
                     )
-                    - solver.Sum(
-                        x[fuel_index, tank_index, option_index, earlier_period]
-                        for option_index in range(option_count)
-                        for earlier_period in range(1, period_index + 1)
-                    ),
+                    continue
+                opened = [
+                    y[fuel_index, tank_index, option_index, earlier_period]
+                    for option_index in range(option_count)
+                    for earlier_period in range(period_index)
+                ]
+                closed = [
+                    x[fuel_index, tank_index, option_index, earlier_period]
+                    for option_index in range(option_count)
+                    for earlier_period in range(1, period_index + 1)
+                ]
+                add_row(
+                    operating + opened + closed,
+                    solver.Sum(operating)
+                    == solver.Sum(opened) - solver.Sum(closed),
                     f'operational[{fuel_index},{tank_index},{period_index}]',
                 )
 
     for fuel_index, fuel in enumerate(fuels):
         option_count = len(capacities_by_fuel[fuel])
         for tank_index in range(tank_counts[fuel]):
-            solver.Add(
-                solver.Sum(
-                    y[fuel_index, tank_index, option_index, period_index]
-                    for option_index in range(option_count)
-                    for period_index in range(len(periods))
-                ) <= 1,
+            openings = [
+                y[fuel_index, tank_index, option_index, period_index]
+                for option_index in range(option_count)
+                for period_index in range(len(periods))
+            ]
+            add_row(
+                openings,
+                solver.Sum(openings) <= 1,
                 f'single_opening[{fuel_index},{tank_index}]',
             )
             for period_index in range(len(periods)):
-                solver.Add(
-                    solver.Sum(
-                        y[fuel_index, tank_index, option_index, period_index]
-                        + s[fuel_index, tank_index, option_index, period_index]
-                        for option_index in range(option_count)
-                    ) <= 1,
+                active = [
+                    family[fuel_index, tank_index, option_index, period_index]
+                    for option_index in range(option_count)
+                    for family in (y, s)
+                ]
+                add_row(
+                    active,
+                    solver.Sum(active) <= 1,
                     f'single_capacity[{fuel_index},{tank_index},{period_index}]',
                 )
 
@@ -280,10 +1291,9 @@ def build_facility_location_model(data):
         for tank_index in range(tank_counts[fuel]):
             for period_index in range(1, len(periods)):
                 for from_option in range(option_count):
-                    prior_active = (
-                        y[fuel_index, tank_index, from_option, period_index - 1]
-                        + s[fuel_index, tank_index, from_option, period_index - 1]
-                    )
+                    prior_y = y[fuel_index, tank_index, from_option, period_index - 1]
+                    prior_s = s[fuel_index, tank_index, from_option, period_index - 1]
+                    prior_active = prior_y + prior_s
                     for to_option in range(option_count):
                         if from_option == to_option:
                             continue
@@ -300,18 +1310,21 @@ def build_facility_location_model(data):
                             to_option,
                             period_index,
                         ]
-                        solver.Add(
-                            transition >= prior_active + current_operating - 1,
+                        add_row(
+                            [transition, prior_y, prior_s, current_operating],
+                            transition - prior_active - current_operating >= -1,
                             f'transition_lb[{fuel_index},{tank_index},{from_option},'
                             f'{to_option},{period_index}]',
                         )
-                        solver.Add(
-                            transition <= prior_active,
+                        add_row(
+                            [transition, prior_y, prior_s],
+                            transition - prior_active <= 0,
                             f'transition_ub1[{fuel_index},{tank_index},{from_option},'
                             f'{to_option},{period_index}]',
                         )
-                        solver.Add(
-                            transition <= current_operating,
+                        add_row(
+                            [transition, current_operating],
+                            transition - current_operating <= 0,
                             f'transition_ub2[{fuel_index},{tank_index},{from_option},'
                             f'{to_option},{period_index}]',
                         )
@@ -320,223 +1333,1089 @@ def build_facility_location_model(data):
     # period uses tau on the left-hand side.
     for fuel_index, fuel in enumerate(fuels):
         option_count = len(capacities_by_fuel[fuel])
-        for drop_period in range(1, len(periods)):
-            if not (
-                demand[fuel][periods[drop_period - 1]] > 0
-                and demand[fuel][periods[drop_period]] == 0
-            ):
-                continue
-            for future_period in range(drop_period, len(periods)):
-                if demand[fuel][periods[future_period]] != 0:
-                    continue
-                solver.Add(
-                    solver.Sum(
-                        y[fuel_index, tank_index, option_index, future_period]
-                        + s[fuel_index, tank_index, option_index, future_period]
-                        for tank_index in range(tank_counts[fuel])
-                        for option_index in range(option_count)
-                    ) == 0,
-                    f'permanent_zero_demand[{fuel_index},{drop_period},{future_period}]',
-                )
+        for row_key, future_period in _permanent_zero_demand_rows(
+            demand[fuel],
+            periods,
+            state_formulation,
+        ):
+            active = [
+                family[fuel_index, tank_index, option_index, future_period]
+                for tank_index in range(tank_counts[fuel])
+                for option_index in range(option_count)
+                for family in (y, s)
+            ]
+            add_row(
+                active,
+                solver.Sum(active) == 0,
+                f'permanent_zero_demand[{fuel_index},{row_key}]',
+            )
 
     for fuel_index, fuel in enumerate(fuels):
         option_count = len(capacities_by_fuel[fuel])
         for tank_index in range(tank_counts[fuel]):
             for option_index in range(option_count):
                 for period_index in range(1, len(periods)):
-                    solver.Add(
-                        x[fuel_index, tank_index, option_index, period_index]
-                        <= y[fuel_index, tank_index, option_index, period_index - 1]
-                        + s[fuel_index, tank_index, option_index, period_index - 1],
+                    closed = x[fuel_index, tank_index, option_index, period_index]
+                    prior_y = y[fuel_index, tank_index, option_index, period_index - 1]
+                    prior_s = s[fuel_index, tank_index, option_index, period_index - 1]
+                    add_row(
+                        [closed, prior_y, prior_s],
+                        closed - prior_y - prior_s <= 0,
                         f'decommissioning_validity[{fuel_index},{tank_index},'
                         f'{option_index},{period_index}]',
                     )
 
-                solver.Add(
-                    y[fuel_index, tank_index, option_index, 0]
-                    == initial_state[fuel][tank_index][option_index],
+                opened = y[fuel_index, tank_index, option_index, 0]
+                operating = s[fuel_index, tank_index, option_index, 0]
+                closed = x[fuel_index, tank_index, option_index, 0]
+                add_row(
+                    [opened],
+                    opened == initial_state[fuel][tank_index][option_index],
                     f'initial_opening[{fuel_index},{tank_index},{option_index}]',
                 )
-                solver.Add(
-                    s[fuel_index, tank_index, option_index, 0] == 0,
+                add_row(
+                    [operating],
+                    operating == 0,
                     f'initial_operating[{fuel_index},{tank_index},{option_index}]',
                 )
-                solver.Add(
-                    x[fuel_index, tank_index, option_index, 0] == 0,
+                add_row(
+                    [closed],
+                    closed == 0,
                     f'initial_closure[{fuel_index},{tank_index},{option_index}]',
                 )
 
+    families = tuple(
+        {key: variable for key, variable in family.items() if not isinstance(variable, int)}
+        for family in (y, s, x, z)
+    )
+    return (*families, removed_rows)
+
+
+def _per_tank_variable_indices(option_count, period_count, tank_count, offset):
+    # Variable indices in the order _add_per_tank_rows creates them: per tank,
+    # y/s/x interleaved by (option, period), then z by (from, to, period).
+    # z holds -1 on the diagonal and in period 0, where no variable exists.
+    cell_count = option_count * period_count
+    block = 3 * cell_count + option_count * (option_count - 1) * (period_count - 1)
+    tank_offsets = offset + block * np.arange(tank_count)
+    cells = 3 * np.arange(cell_count).reshape(option_count, period_count)
+    y = tank_offsets[:, None, None] + cells[None, :, :]
+
+    z = np.full(
+        (tank_count, option_count, option_count, period_count),
+        -1,
+        dtype=np.int64,
+    )
+    transition_offset = 3 * cell_count
+    for from_option in range(option_count):
+        for to_option in range(option_count):
+            if from_option == to_option:
+                continue
+            z[:, from_option, to_option, 1:] = (
+                tank_offsets[:, None]
+                + transition_offset
+                + np.arange(period_count - 1)[None, :]
+            )
+            transition_offset += period_count - 1
+    return y, y + 1, y + 2, z, block * tank_count
+
+
+def _per_tank_columns(data, tank_counts, variables):
+    # Solver column of every per-tank variable, per family in key order.
+    # Both per-tank builds create variables in the layout above.
+    period_count = len(data['T'])
+    parts = {family: [] for family in variables}
+    offset = 0
+    for fuel in data['Fuels']:
+        *fuel_indices, size = _per_tank_variable_indices(
+            len(data['Capacities'][fuel]),
+            period_count,
+            tank_counts[fuel],
+            offset,
+        )
+        for family, indices in zip(('y', 's', 'x', 'z'), fuel_indices):
+            parts[family].append(indices[indices >= 0])
+        offset += size
     return {
-        'solver': solver,
-        'preparedCosts': prepared_costs,
-        'tankCounts': tank_counts,
-        'demand': demand,
-        'initialState': initial_state,
-        'variables': {'y': y, 's': s, 'x': x, 'z': z},
+        family: (list(variables[family]), np.concatenate(parts[family]))
+        for family in variables
     }
 
 
-def _binary_value(variable):
-    return 1 if variable.solution_value() > 0.5 else 0
-
+def _load_per_tank_arrays(
+    data,
+    prepared_costs,
+    demand,
+    initial_state,
+    tank_counts,
+    named=True,
+    state_formulation='cumulative',
+    presolved=None,
+):
+    """Build the per-tank model from NumPy index arrays.
 
-def solve_facility_location(data, export_model=False):
-    model = build_facility_location_model(data)
-    solver = model['solver']
-    prepared_costs = model['preparedCosts']
-    tank_counts = model['tankCounts']
-    y = model['variables']['y']
-    s = model['variables']['s']
-    x = model['variables']['x']
-    z = model['variables']['z']
+    Rows, bounds, coefficients and their order are the same as in
+    _add_per_tank_rows; only the construction differs. Variables and the
+    objective are set in bulk through model_builder, each row is appended to
+    the MPModelProto as plain index and coefficient lists, and the proto is
+    loaded into a pywraplp solver so solving and extraction are unchanged.
+    Rows are laid out over every variable and `presolved` values are
+    substituted as each row is added.
+    """
     periods = data['T']
     fuels = data['Fuels']
     capacities_by_fuel = data['Capacities']
+    period_count = len(periods)
 
-    if export_model:
-        with open('facility_location_model.lp', 'w') as lp_file:
-            lp_file.write(solver.ExportModelAsLpFormat(False))
+    indices = {}
+    variable_count = 0
+    for fuel in fuels:
+        *fuel_indices, size = _per_tank_variable_indices(
+            len(capacities_by_fuel[fuel]),
+            period_count,
+            tank_counts[fuel],
+            variable_count,
+        )
+        indices[fuel] = fuel_indices
+        variable_count += size
 
-    solver.SetTimeLimit(SOLVER_TIME_LIMIT_MS)
-    solver_parameters = pywraplp.MPSolverParameters()
-    # solver_parameters.SetDoubleParam(
-    #     pywraplp.MPSolverParameters.RELATIVE_MIP_GAP,
-    #     SOLVER_RELATIVE_MIP_GAP,
-    # )
-    constraint_count = solver.NumConstraints()
-    variable_count = solver.NumVariables()
-    status = solver.Solve(solver_parameters)
-    # wall time is returned in milliseconds by OR-Tools
-    solve_cpu_time_seconds = solver.WallTime() / 1000.0
-    discount_factors = prepared_costs[fuels[0]]['discountFactorsByPeriod']
-    planning_period_years = prepared_costs[fuels[0]]['planningPeriodYears']
-    period_mapping = [
-        {
-            'label': period,
-            'periodIndex': period_index,
-            'elapsedYears': planning_period_years * period_index,
-            'discountFactor': discount_factors[period_index],
-        }
-        for period_index, period in enumerate(periods)
-    ]
-    result = {
-        'status': status,
-        'solveCpuTimeSeconds': solve_cpu_time_seconds,
-        'constraintCount': constraint_count,
-        'variableCount': variable_count,
-        'solution': {},
-        'costs': {},
-        'transitions': {},
-        'planningPeriods': period_mapping,
-        'periodMapping': period_mapping,
-        'financialParameters': financial_parameters_for_response(
-            prepared_costs,
-            fuels,
-        ),
-        'costBreakdown': {
-            'openingInvestmentCostUSD': 0.0,
-            'maintenanceCostUSD': 0.0,
-            'decommissioningCostUSD': 0.0,
-            'transitionCostUSD': 0.0,
-            'totalObjectiveUSD': 0.0,
-        },
-    }
+    # Fixed value of each laid-out variable (NaN when free) and its solver
+    # column (-1 when fixed).
+    fixed_values = np.full(variable_count, np.nan)
+    if presolved is not None:
+        for fuel in fuels:
+            for family_indices, values in zip(indices[fuel], presolved[fuel]):
+                fixed = (family_indices >= 0) & (values >= 0)
+                fixed_values[family_indices[fixed]] = values[fixed]
+    kept = np.isnan(fixed_values)
+    columns = np.where(kept, np.cumsum(kept) - 1, -1)
+    column_count = int(kept.sum())
 
-    if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
-        return result
+    helper = model_builder_helper.ModelBuilderHelper()
+    helper.add_var_array_with_bounds(
+        np.zeros(column_count),
+        np.ones(column_count),
+        np.ones(column_count, dtype=bool),
+        '',
+    )
+    objective = np.zeros(variable_count)
+    for fuel in fuels:
+        y, s, x, z = indices[fuel]
+        coefficients = prepared_costs[fuel]
+        option_count = len(capacities_by_fuel[fuel])
+        opening = np.array(coefficients['openingCostCoefficientsUSD'])
+        opening[:, 0] = 0
+        maintenance = np.array(coefficients['maintenanceCostCoefficientsUSD'])
+        transition = np.array(
+            [
+                [[None] * period_count if row is None else row for row in from_rows]
+                for from_rows in coefficients['transitionCostCoefficientsUSD']
+            ],
+            dtype=float,
+        ).reshape(option_count, option_count, period_count)
+        objective[y] = opening + maintenance
+        objective[s] = maintenance
+        objective[x] = coefficients['decommissioningCostCoefficientsUSD']
+        has_transition = z >= 0
+        objective[z[has_transition]] = np.broadcast_to(transition, z.shape)[
+            has_transition
+        ]
+    helper.set_objective_coefficients(
+        list(range(column_count)),
+        objective[kept].tolist(),
+    )
+    columns_by_fuel = {
+        fuel: [
+            np.where(family_indices >= 0, columns[family_indices], -1)
+            for family_indices in indices[fuel]
+        ]
+        for fuel in fuels
+    }
+
+    if named:
+        for fuel_index, fuel in enumerate(fuels):
+            for family, family_columns in zip('ysxz', columns_by_fuel[fuel]):
+                for key in zip(*np.nonzero(family_columns >= 0)):
+                    helper.set_var_name(
+                        int(family_columns[key]),
+                        f'{family}[{fuel_index},{",".join(map(str, key))}]',
+                    )
+
+    proto = model_builder_helper.to_mpmodel_proto(helper)
+    add_constraint = proto.constraint.add
+    removed_rows = 0
+    if presolved is not None:
+        proto.objective_offset = float(
+            objective[~kept] @ fixed_values[~kept]
+        )
+        column_list = columns.tolist()
+        fixed_list = fixed_values.tolist()
+
+    def add_row(
+        name,
+        var_index,
+        coefficient,
+        lower_bound=-math.inf,
+        upper_bound=math.inf,
+    ):
+        nonlocal removed_rows
+        if presolved is not None:
+            row_index, row_coefficient, constant = [], [], 0.0
+            for index, value in zip(var_index, coefficient):
+                column = column_list[index]
+                if column < 0:
+                    constant += value * fixed_list[index]
+                else:
+                    row_index.append(column)
+                    row_coefficient.append(value)
+            if not row_index and lower_bound <= constant <= upper_bound:
+                removed_rows += 1
+                return
+            var_index, coefficient = row_index, row_coefficient
+            lower_bound -= constant
+            upper_bound -= constant
+        add_constraint(
+            var_index=var_index,
+            coefficient=coefficient,
+            lower_bound=lower_bound,
+            upper_bound=upper_bound,
+            name=name() if named else '',
+        )
 
     for fuel_index, fuel in enumerate(fuels):
+        y, s, _, _ = indices[fuel]
+        capacities = np.asarray(capacities_by_fuel[fuel], dtype=float)
+        row_coefficients = np.repeat(
+            np.tile(capacities, tank_counts[fuel]),
+            2,
+        ).tolist()
+        for period_index, period in enumerate(periods):
+            add_row(
+                lambda: f'demand[{fuel_index},{period_index}]',
+                np.stack(
+                    [y[:, :, period_index], s[:, :, period_index]],
+                    axis=-1,
+                ).ravel().tolist(),
+                row_coefficients,
+                lower_bound=demand[fuel][period],
+            )
+
+    for fuel_index, fuel in enumerate(fuels):
+        y, s, x, _ = indices[fuel]
         option_count = len(capacities_by_fuel[fuel])
-        fuel_solution = {}
-        fuel_costs = {}
-        fuel_transitions = {}
-        coefficients = prepared_costs[fuel]
+        for tank_index in range(tank_counts[fuel]):
+            for period_index in range(1, period_count):
+                if state_formulation == 'recursive':
+                    add_row(
+                        lambda: f'operational[{fuel_index},{tank_index},{period_index}]',
+                        np.concatenate([
+                            s[tank_index, :, period_index],
+                            s[tank_index, :, period_index - 1],
+                            y[tank_index, :, period_index - 1],
+                            x[tank_index, :, period_index],
+                        ]).tolist(),
+                        [1.0] * option_count
+                        + [-1.0] * (2 * option_count)
+                        + [1.0] * option_count,
+                        lower_bound=0.0,
+                        upper_bound=0.0,
+                    )
+                    continue
+                add_row(
+                    lambda: f'operational[{fuel_index},{tank_index},{period_index}]',
+                    np.concatenate([
+                        s[tank_index, :, period_index],
+                        y[tank_index, :, :period_index].ravel(),
+                        x[tank_index, :, 1:period_index + 1].ravel(),
+                    ]).tolist(),
+                    [1.0] * option_count
+                    + [-1.0] * (option_count * period_index)
+                    + [1.0] * (option_count * period_index),
+                    lower_bound=0.0,
+                    upper_bound=0.0,
+                )
 
-        for period_index, period in enumerate(periods):
-            period_solution = {}
-            period_costs = {}
-            period_transitions = {}
-            for tank_index in range(tank_counts[fuel]):
-                tank_solution = {}
-                tank_costs = {}
-                tank_transitions = []
-                for option_index, capacity in enumerate(capacities_by_fuel[fuel]):
-                    opened = _binary_value(
-                        y[fuel_index, tank_index, option_index, period_index]
+    for fuel_index, fuel in enumerate(fuels):
+        y, s, _, _ = indices[fuel]
+        option_count = len(capacities_by_fuel[fuel])
+        for tank_index in range(tank_counts[fuel]):
+            add_row(
+                lambda: f'single_opening[{fuel_index},{tank_index}]',
+                y[tank_index].ravel().tolist(),
+                [1.0] * (option_count * period_count),
+                upper_bound=1.0,
+            )
+            active = np.stack([y[tank_index], s[tank_index]], axis=-1)
+            for period_index in range(period_count):
+                add_row(
+                    lambda: (
+                        f'single_capacity[{fuel_index},{tank_index},{period_index}]'
+                    ),
+                    active[:, period_index].ravel().tolist(),
+                    [1.0] * (2 * option_count),
+                    upper_bound=1.0,
+                )
+
+    for fuel_index, fuel in enumerate(fuels):
+        y, s, _, z = indices[fuel]
+        option_count = len(capacities_by_fuel[fuel])
+        # One row per (tank, period >= 1, from, to != from), in loop order.
+        tanks, periods_from_one, from_options, to_options = np.nonzero(
+            np.broadcast_to(
+                ~np.eye(option_count, dtype=bool),
+                (tank_counts[fuel], period_count - 1, option_count, option_count),
+            )
+        )
+        period_indices = periods_from_one + 1
+        transitions = np.stack([
+            z[tanks, from_options, to_options, period_indices],
+            y[tanks, from_options, period_indices - 1],
+            s[tanks, from_options, period_indices - 1],
+            s[tanks, to_options, period_indices],
+        ], axis=1).tolist()
+        keys = zip(
+            tanks.tolist(),
+            from_options.tolist(),
+            to_options.tolist(),
+            period_indices.tolist(),
+        )
+        for row, (tank_index, from_option, to_option, period_index) in zip(
+            transitions,
+            keys,
+        ):
+            transition, prior_y, prior_s, current = row
+            add_row(
+                lambda: (
+                    f'transition_lb[{fuel_index},{tank_index},{from_option},'
+                    f'{to_option},{period_index}]'
+                ),
+                row,
+                [1.0, -1.0, -1.0, -1.0],
+                lower_bound=-1.0,
+            )
+            add_row(
+                lambda: (
+                    f'transition_ub1[{fuel_index},{tank_index},{from_option},'
+                    f'{to_option},{period_index}]'
+                ),
+                [transition, prior_y, prior_s],
+                [1.0, -1.0, -1.0],
+                upper_bound=0.0,
+            )
+            add_row(
+                lambda: (
+                    f'transition_ub2[{fuel_index},{tank_index},{from_option},'
+                    f'{to_option},{period_index}]'
+                ),
+                [transition, current],
+                [1.0, -1.0],
+                upper_bound=0.0,
+            )
+
+    for fuel_index, fuel in enumerate(fuels):
+        y, s, _, _ = indices[fuel]
+        option_count = len(capacities_by_fuel[fuel])
+        active = np.stack([y, s], axis=-1)
+        for row_key, future_period in _permanent_zero_demand_rows(
+            demand[fuel],
+            periods,
+            state_formulation,
+        ):
+            add_row(
+                lambda: f'permanent_zero_demand[{fuel_index},{row_key}]',
+                active[:, :, future_period].ravel().tolist(),
+                [1.0] * (2 * tank_counts[fuel] * option_count),
+                lower_bound=0.0,
+                upper_bound=0.0,
+            )
+
+    for fuel_index, fuel in enumerate(fuels):
+        y, s, x, _ = indices[fuel]
+        option_count = len(capacities_by_fuel[fuel])
+        for tank_index in range(tank_counts[fuel]):
+            for option_index in range(option_count):
+                tank_y = y[tank_index, option_index].tolist()
+                tank_s = s[tank_index, option_index].tolist()
+                tank_x = x[tank_index, option_index].tolist()
+                for period_index in range(1, period_count):
+                    add_row(
+                        lambda: (
+                            f'decommissioning_validity[{fuel_index},{tank_index},'
+                            f'{option_index},{period_index}]'
+                        ),
+                        [
+                            tank_x[period_index],
+                            tank_y[period_index - 1],
+                            tank_s[period_index - 1],
+                        ],
+                        [1.0, -1.0, -1.0],
+                        upper_bound=0.0,
                     )
-                    operating = _binary_value(
-                        s[fuel_index, tank_index, option_index, period_index]
+                initial = float(initial_state[fuel][tank_index][option_index])
+                key = f'{fuel_index},{tank_index},{option_index}'
+                add_row(
+                    lambda: f'initial_opening[{key}]',
+                    [tank_y[0]],
+                    [1.0],
+                    lower_bound=initial,
+                    upper_bound=initial,
+                )
+                add_row(
+                    lambda: f'initial_operating[{key}]',
+                    [tank_s[0]],
+                    [1.0],
+                    lower_bound=0.0,
+                    upper_bound=0.0,
+                )
+                add_row(
+                    lambda: f'initial_closure[{key}]',
+                    [tank_x[0]],
+                    [1.0],
+                    lower_bound=0.0,
+                    upper_bound=0.0,
+                )
+
+    solver = _create_solver({'solverBackend': 'mpsolver'})
+    load_error = solver.LoadModelFromProtoKeepNames(proto)
+    if load_error:
+        raise RuntimeError(f'Could not load the array-built model: {load_error}')
+
+    variables = solver.variables()
+    families = []
+    for family_index in range(4):
+        family = {}
+        for fuel_index, fuel in enumerate(fuels):
+            family_columns = columns_by_fuel[fuel][family_index]
+            exists = family_columns >= 0
+            family.update(zip(
+                ((fuel_index, *key) for key in np.argwhere(exists).tolist()),
+                (variables[index] for index in family_columns[exists].tolist()),
+            ))
+        families.append(family)
+    return solver, families, removed_rows
+
+
+def build_facility_location_model(data, keep_names=False, timings=None, control=None):
+    timings = (PhaseTimings() if timings is None else timings).restart()
+    solver_options = _validate_solver_options(data)
+    timings.lap('validation')
+    (
+        data,
+        prepared_costs,
+        demand,
+        initial_state,
+        tank_counts,
+        tank_count_bounds,
+        pruning,
+    ) = _prepare_model_inputs(data, solver_options, timings, control)
+
+    presolved = None
+    if solver_options['presolve']:
+        presolved = _presolve_per_tank(data, demand, initial_state, tank_counts)
+    if solver_options['modelBuild'] == 'arrays':
+        solver, (y, s, x, z), removed_rows = _load_per_tank_arrays(
+            data,
+            prepared_costs,
+            demand,
+            initial_state,
+            tank_counts,
+            named=keep_names or not solver_options['anonymousNames'],
+            state_formulation=solver_options['stateFormulation'],
+            presolved=presolved,
+        )
+    else:
+        solver = _create_solver(solver_options)
+        y, s, x, z, removed_rows = _add_per_tank_rows(
+            solver,
+            data,
+            prepared_costs,
+            demand,
+            initial_state,
+            tank_counts,
+            state_formulation=solver_options['stateFormulation'],
+            presolved=presolved,
+        )
+    fixed_plan = None
+    if presolved is not None:
+        fixed_plan = _fixed_plan(presolved, data['Fuels'])
+
+    if solver_options['symmetryBreaking']:
+        _add_tank_symmetry_breaking(
+            solver,
+            y if fixed_plan is None else {**y, **dict.fromkeys(fixed_plan['y'], 1)},
+            x if fixed_plan is None else {**x, **dict.fromkeys(fixed_plan['x'], 1)},
+            data['Fuels'],
+            data['Capacities'],
+            len(data['T']),
+            tank_counts,
+            initial_state,
+        )
+
+    timings.lap('build')
+    variables = {'y': y, 's': s, 'x': x, 'z': z}
+    model = {
+        'solver': solver,
+        'preparedCosts': prepared_costs,
+        'tankCounts': tank_counts,
+        'tankCountBounds': tank_count_bounds,
+        'demand': demand,
+        'initialState': initial_state,
+        'solverOptions': solver_options,
+        'engine': 'perTank',
+        'timings': timings,
+        'variables': variables,
+        # Presolved models leave gaps in the layout, so their columns are
+        # looked up on first use.
+        'columns': None if presolved is not None else _per_tank_columns(
+            data,
+            tank_counts,
+            variables,
+        ),
+    }
+    if presolved is not None:
+        model['fixedPlan'] = fixed_plan
+        model['presolve'] = {
+            'removedVariables': sum(
+                int((values >= 0).sum())
+                for fuel_values in presolved.values()
+                for values in fuel_values
+            ),
+            'removedConstraints': removed_rows,
+        }
+    return _with_option_pruning(model, data, pruning)
+
+
+def build_tank_count_model(data, timings=None, control=None):
+    # Aggregated engine: integer counts of tanks opened (Y), operating (S) and
+    # closed (X) per fuel, capacity option and period, plus a flow F[k, k2]
+    # of tanks that were active with option k in the previous period and
+    # operate with option k2 now (k == k2 keeps the option, k != k2 is a
+    # transition). Any integral flow decomposes into at most tank_count tank
+    # lifetimes, so the optimum equals the per-tank model's.
+    timings = (PhaseTimings() if timings is None else timings).restart()
+    solver_options = _validate_solver_options(data)
+    timings.lap('validation')
+    (
+        data,
+        prepared_costs,
+        demand,
+        initial_state,
+        tank_counts,
+        tank_count_bounds,
+        pruning,
+    ) = _prepare_model_inputs(data, solver_options, timings, control)
+
+    solver = _create_solver(solver_options)
+
+    periods = data['T']
+    fuels = data['Fuels']
+    capacities_by_fuel = data['Capacities']
+    opened, operating, closed, flow = {}, {}, {}, {}
+
+    for fuel_index, fuel in enumerate(fuels):
+        option_count = len(capacities_by_fuel[fuel])
+        tank_count = tank_counts[fuel]
+        for option_index in range(option_count):
+            for period_index in range(len(periods)):
+                key = (fuel_index, option_index, period_index)
+                opened[key] = solver.IntVar(
+                    0, tank_count, f'Y[{fuel_index},{option_index},{period_index}]'
+                )
+                operating[key] = solver.IntVar(
+                    0, tank_count, f'S[{fuel_index},{option_index},{period_index}]'
+                )
+                closed[key] = solver.IntVar(
+                    0, tank_count, f'X[{fuel_index},{option_index},{period_index}]'
+                )
+            for to_option in range(option_count):
+                for period_index in range(1, len(periods)):
+                    key = (fuel_index, option_index, to_option, period_index)
+                    flow[key] = solver.IntVar(
+                        0,
+                        tank_count,
+                        f'F[{fuel_index},{option_index},{to_option},{period_index}]',
                     )
-                    closed = _binary_value(
-                        x[fuel_index, tank_index, option_index, period_index]
+
+    objective_terms = []
+    for fuel_index, fuel in enumerate(fuels):
+        option_count = len(capacities_by_fuel[fuel])
+        coefficients = prepared_costs[fuel]
+        for option_index in range(option_count):
+            for period_index in range(1, len(periods)):
+                objective_terms.append(
+                    coefficients['openingCostCoefficientsUSD'][option_index][period_index]
+                    * opened[fuel_index, option_index, period_index]
+                )
+            for period_index in range(len(periods)):
+                objective_terms.append(
+                    coefficients['maintenanceCostCoefficientsUSD'][option_index][period_index]
+                    * (
+                        opened[fuel_index, option_index, period_index]
+                        + operating[fuel_index, option_index, period_index]
                     )
-                    if opened or operating or closed:
-                        tank_solution[capacity] = {
-                            'opened': opened,
-                            'operating': operating,
-                            'closed': closed,
-                        }
-
-                    opening_cost = (
-                        opened
-                        * coefficients['openingCostCoefficientsUSD'][option_index][period_index]
-                        if period_index > 0
-                        else 0.0
+                )
+                objective_terms.append(
+                    coefficients['decommissioningCostCoefficientsUSD'][option_index][period_index]
+                    * closed[fuel_index, option_index, period_index]
+                )
+            for to_option in range(option_count):
+                if option_index == to_option:
+                    continue
+                for period_index in range(1, len(periods)):
+                    objective_terms.append(
+                        coefficients['transitionCostCoefficientsUSD'][option_index][to_option][period_index]
+                        * flow[fuel_index, option_index, to_option, period_index]
                     )
-                    maintenance_cost = (
-                        (opened + operating)
-                        * coefficients['maintenanceCostCoefficientsUSD'][option_index][period_index]
+    solver.Minimize(solver.Sum(objective_terms))
+
+    for fuel_index, fuel in enumerate(fuels):
+        option_count = len(capacities_by_fuel[fuel])
+        for period_index, period in enumerate(periods):
+            capacities, required = _demand_row(
+                solver,
+                capacities_by_fuel[fuel],
+                demand[fuel][period],
+            )
+            solver.Add(
+                solver.Sum(
+                    capacities[option_index]
+                    * (
+                        opened[fuel_index, option_index, period_index]
+                        + operating[fuel_index, option_index, period_index]
                     )
-                    decommissioning_cost = (
-                        closed
-                        * coefficients['decommissioningCostCoefficientsUSD'][option_index][period_index]
+                    for option_index in range(option_count)
+                ) >= required,
+                f'demand[{fuel_index},{period_index}]',
+            )
+
+        # Every tank row opens at most once, initial tanks included.
+        solver.Add(
+            solver.Sum(
+                opened[fuel_index, option_index, period_index]
+                for option_index in range(option_count)
+                for period_index in range(len(periods))
+            ) <= tank_counts[fuel],
+            f'tank_count[{fuel_index}]',
+        )
+
+        for option_index in range(option_count):
+            solver.Add(
+                opened[fuel_index, option_index, 0]
+                == sum(row[option_index] for row in initial_state[fuel]),
+                f'initial_opening[{fuel_index},{option_index}]',
+            )
+            solver.Add(
+                operating[fuel_index, option_index, 0] == 0,
+                f'initial_operating[{fuel_index},{option_index}]',
+            )
+            solver.Add(
+                closed[fuel_index, option_index, 0] == 0,
+                f'initial_closure[{fuel_index},{option_index}]',
+            )
+            for period_index in range(1, len(periods)):
+                solver.Add(
+                    opened[fuel_index, option_index, period_index - 1]
+                    + operating[fuel_index, option_index, period_index - 1]
+                    == solver.Sum(
+                        flow[fuel_index, option_index, to_option, period_index]
+                        for to_option in range(option_count)
                     )
-                    if opened or operating or closed:
-                        tank_costs[capacity] = {
-                            'opened': opening_cost,
-                            'operating': maintenance_cost,
-                            'closed': decommissioning_cost,
-                        }
-                    result['costBreakdown']['openingInvestmentCostUSD'] += opening_cost
-                    result['costBreakdown']['maintenanceCostUSD'] += maintenance_cost
-                    result['costBreakdown']['decommissioningCostUSD'] += decommissioning_cost
-
-                if period_index > 0:
-                    for from_option in range(option_count):
-                        for to_option in range(option_count):
-                            if from_option == to_option:
-                                continue
-                            transition_variable = z[
+                    + closed[fuel_index, option_index, period_index],
+                    f'flow_out[{fuel_index},{option_index},{period_index}]',
+                )
+                solver.Add(
+                    operating[fuel_index, option_index, period_index]
+                    == solver.Sum(
+                        flow[fuel_index, from_option, option_index, period_index]
+                        for from_option in range(option_count)
+                    ),
+                    f'flow_in[{fuel_index},{option_index},{period_index}]',
+                )
+
+    for fuel_index, fuel in enumerate(fuels):
+        option_count = len(capacities_by_fuel[fuel])
+        for row_key, future_period in _permanent_zero_demand_rows(
+            demand[fuel],
+            periods,
+            solver_options['stateFormulation'],
+        ):
+            solver.Add(
+                solver.Sum(
+                    opened[fuel_index, option_index, future_period]
+                    + operating[fuel_index, option_index, future_period]
+                    for option_index in range(option_count)
+                ) == 0,
+                f'permanent_zero_demand[{fuel_index},{row_key}]',
+            )
+
+    timings.lap('build')
+    return _with_option_pruning(
+        {
+            'solver': solver,
+            'preparedCosts': prepared_costs,
+            'tankCounts': tank_counts,
+            'tankCountBounds': tank_count_bounds,
+            'demand': demand,
+            'initialState': initial_state,
+            'solverOptions': solver_options,
+            'engine': 'aggregated',
+            'timings': timings,
+            'variables': {'Y': opened, 'S': operating, 'X': closed, 'F': flow},
+        },
+        data,
+        pruning,
+    )
+
+
+def _objective_coefficient(coefficients, family, key):
+    # Objective coefficient of one variable of either engine. Keys end in
+    # (option, period) or, for transitions, (from option, to option, period).
+    if family in ('z', 'F'):
+        from_option, to_option, period_index = key[-3:]
+        if from_option == to_option:
+            return 0.0
+        return coefficients['transitionCostCoefficientsUSD'][from_option][to_option][
+            period_index
+        ]
+    option_index, period_index = key[-2:]
+    if family in ('x', 'X'):
+        return coefficients['decommissioningCostCoefficientsUSD'][option_index][
+            period_index
+        ]
+    cost = coefficients['maintenanceCostCoefficientsUSD'][option_index][period_index]
+    if family in ('y', 'Y') and period_index > 0:
+        cost += coefficients['openingCostCoefficientsUSD'][option_index][period_index]
+    return cost
+
+
+def retarget_model(model, previous_data, data):
+    """Move a built model from `previous_data` to `data` in place.
+
+    Only objective coefficients and demand lower bounds change, so an edit
+    to a financial parameter or a demand value reuses the built solver.
+    Returns False, leaving the model untouched, when the edit needs a
+    rebuild: a different structure or solverOptions, a CP-SAT model, a
+    demand that switches periods between zero and positive (which moves
+    permanent_zero_demand rows), more tank rows than the model has, or
+    costs that prune a different set of dominated options.
+    """
+    timings = PhaseTimings()
+    solver_options = _validate_solver_options(data)
+    solver = model['solver']
+    if isinstance(solver, CpSatSolver) or solver_options != model['solverOptions']:
+        return False
+    for field in ('T', 'Fuels', 'Capacities', 'InitialState'):
+        if data.get(field) != previous_data.get(field):
+            return False
+    timings.lap('validation')
+
+    (
+        model_data,
+        prepared_costs,
+        demand,
+        _,
+        tank_counts,
+        tank_count_bounds,
+        pruning,
+    ) = _prepare_model_inputs(data, solver_options, timings)
+    if pruning is not None and [
+        pruning[0][fuel] for fuel in data['Fuels']
+    ] != model['optionIndices']:
+        return False
+    if tank_count_bounds is not None:
+        for fuel, bounds in tank_count_bounds.items():
+            bounds['tankRows'] = model['tankCounts'][fuel]
+
+    periods = data['T']
+    demand_rows = {}
+    for fuel_index, fuel in enumerate(data['Fuels']):
+        if tank_counts[fuel] > model['tankCounts'][fuel]:
+            return False
+        if list(_permanent_zero_demand_rows(
+            demand[fuel],
+            periods,
+            solver_options['stateFormulation'],
+        )) != list(_permanent_zero_demand_rows(
+            model['demand'][fuel],
+            periods,
+            solver_options['stateFormulation'],
+        )):
+            return False
+        for period_index, period in enumerate(periods):
+            constraint = solver.LookupConstraint(f'demand[{fuel_index},{period_index}]')
+            if constraint is None:
+                # Presolve drops the rows of period 0, which InitialState
+                # must cover, and of permanently zero-demand periods.
+                if model.get('presolve') is not None:
+                    continue
+                return False
+            demand_rows[constraint] = demand[fuel][period]
+
+    objective = solver.Objective()
+    for family, variables in model['variables'].items():
+        for key, variable in variables.items():
+            objective.SetCoefficient(
+                variable,
+                float(_objective_coefficient(
+                    prepared_costs[data['Fuels'][key[0]]],
+                    family,
+                    key,
+                )),
+            )
+    if model.get('fixedPlan') is not None:
+        objective.SetOffset(
+            _fixed_objective(prepared_costs, data['Fuels'], model['fixedPlan'])
+        )
+    for constraint, required in demand_rows.items():
+        constraint.SetLb(required)
+    model['preparedCosts'] = prepared_costs
+    model['demand'] = demand
+    model['tankCountBounds'] = tank_count_bounds
+    _with_option_pruning(model, model_data, pruning)
+    # Updating coefficients and bounds in place is this solve's build.
+    timings.lap('build')
+    model['timings'] = timings
+    return True
+
+
+def _solution_values(solver):
+    """Values of all variables in one call, indexed by solver column."""
+    if isinstance(solver, CpSatSolver):
+        return solver.solution_values()
+    response = linear_solver_pb2.MPSolutionResponse()
+    solver.FillSolutionResponseProto(response)
+    return np.array(response.variable_value)
+
+
+def _variable_columns(model):
+    # {family: (keys, solver columns)}. Per-tank models know their layout
+    # when they are built; other models look the columns up once.
+    columns = model.get('columns')
+    if columns is None:
+        solver = model['solver']
+        columns = {}
+        for family, variables in model['variables'].items():
+            columns[family] = (
+                list(variables),
+                np.fromiter(
+                    (
+                        variable.Index() if isinstance(solver, CpSatSolver)
+                        else variable.index()
+                        for variable in variables.values()
+                    ),
+                    dtype=np.int64,
+                    count=len(variables),
+                ),
+            )
+        model['columns'] = columns
+    return columns
+
+
+def _nonzero_values(model):
+    """{family: {key: value}} for the variables with a nonzero value."""
+    values = _solution_values(model['solver'])
+    nonzero = {}
+    for family, (keys, columns) in _variable_columns(model).items():
+        family_values = values[columns]
+        positions = np.flatnonzero(np.abs(family_values) > 0.5).tolist()
+        nonzero[family] = dict(zip(
+            (keys[position] for position in positions),
+            family_values[positions].tolist(),
+        ))
+    return nonzero
+
+
+def _extract_tank_plan(model):
+    # The per-tank plan is the set of variable keys that take value one,
+    # including those presolve fixed at one.
+    plan = {
+        family: set(values)
+        for family, values in _nonzero_values(model).items()
+    }
+    for family, keys in model.get('fixedPlan', {}).items():
+        plan[family] |= keys
+    return plan
+
+
+def _tank_plan_from_counts(model, data):
+    # Decompose the aggregated flow into tank lifetimes. Initial tanks keep
+    # their InitialState rows; later openings take the free rows in order.
+    # Within an option, tanks keep their option first, then transition, then
+    # close, always in tank-row order.
+    counts = _nonzero_values(model)
+
+    def count(family, key):
+        return int(round(counts[family].get(key, 0)))
+
+    initial_state = model['initialState']
+    period_count = len(data['T'])
+    plan = {'y': set(), 's': set(), 'x': set(), 'z': set()}
+
+    for fuel_index, fuel in enumerate(data['Fuels']):
+        option_count = len(data['Capacities'][fuel])
+        free_rows = [
+            tank_index
+            for tank_index, row in enumerate(initial_state[fuel])
+            if not any(row)
+        ]
+        active = {option_index: [] for option_index in range(option_count)}
+        for tank_index, row in enumerate(initial_state[fuel]):
+            for option_index, value in enumerate(row):
+                if value:
+                    active[option_index].append(tank_index)
+                    plan['y'].add((fuel_index, tank_index, option_index, 0))
+
+        for period_index in range(1, period_count):
+            next_active = {option_index: [] for option_index in range(option_count)}
+            for option_index in range(option_count):
+                tanks = iter(active[option_index])
+                destinations = [option_index] + [
+                    to_option
+                    for to_option in range(option_count)
+                    if to_option != option_index
+                ]
+                for to_option in destinations:
+                    moved = count('F', (fuel_index, option_index, to_option, period_index))
+                    for _ in range(moved):
+                        tank_index = next(tanks)
+                        next_active[to_option].append(tank_index)
+                        plan['s'].add((fuel_index, tank_index, to_option, period_index))
+                        if to_option != option_index:
+                            plan['z'].add((
                                 fuel_index,
                                 tank_index,
-                                from_option,
+                                option_index,
                                 to_option,
                                 period_index,
-                            ]
-                            if _binary_value(transition_variable):
-                                transition_cost = coefficients[
-                                    'transitionCostCoefficientsUSD'
-                                ][from_option][to_option][period_index]
-                                tank_transitions.append({
-                                    'fromCapacity': capacities_by_fuel[fuel][from_option],
-                                    'toCapacity': capacities_by_fuel[fuel][to_option],
-                                    'costUSD': transition_cost,
-                                })
-                                result['costBreakdown']['transitionCostUSD'] += transition_cost
-
-                if tank_solution:
-                    period_solution[f'Tank_{tank_index + 1}'] = tank_solution
-                if tank_costs:
-                    period_costs[f'Tank_{tank_index + 1}'] = tank_costs
-                if tank_transitions:
-                    period_transitions[f'Tank_{tank_index + 1}'] = tank_transitions
-
-            if period_solution:
-                fuel_solution[period] = period_solution
-            if period_costs:
-                fuel_costs[period] = period_costs
-            if period_transitions:
-                fuel_transitions[period] = period_transitions
+                            ))
+                for _ in range(count('X', (fuel_index, option_index, period_index))):
+                    plan['x'].add((fuel_index, next(tanks), option_index, period_index))
+            for option_index in range(option_count):
+                for _ in range(count('Y', (fuel_index, option_index, period_index))):
+                    tank_index = free_rows.pop(0)
+                    next_active[option_index].append(tank_index)
+                    plan['y'].add((fuel_index, tank_index, option_index, period_index))
+            active = {
+                option_index: sorted(tanks)
+                for option_index, tanks in next_active.items()
+            }
+    return plan
+
+
+def _populate_plan_result(result, data, prepared_costs, plan):
+    # Only the keys in the plan are visited, sorted into the order in which
+    # the response nests them: fuel, period, tank, option. The cost breakdown
+    # is summed in that order too; the keys left out would only add zeros.
+    periods = data['T']
+    fuels = data['Fuels']
+    capacities_by_fuel = data['Capacities']
+    breakdown = result['costBreakdown']
+    cells = {}
+    for family in ('y', 's', 'x'):
+        for key in plan[family]:
+            cells.setdefault(key[0], set()).add(key[1:])
+    transitions = {}
+    for key in plan['z']:
+        transitions.setdefault(key[0], []).append(key[1:])
+
+    for fuel_index, fuel in enumerate(fuels):
+        capacities = capacities_by_fuel[fuel]
+        coefficients = prepared_costs[fuel]
+        fuel_solution = {}
+        fuel_costs = {}
+        fuel_transitions = {}
+
+        # (tank, option, period) rows sorted by period, tank, option.
+        fuel_cells = sorted(
+            cells.get(fuel_index, ()),
+            key=lambda cell: (cell[2], cell[0], cell[1]),
+        )
+        if fuel_cells:
+            tank_indices, option_indices, period_indices = np.array(fuel_cells).T
+            opened = np.array([
+                (fuel_index, *cell) in plan['y'] for cell in fuel_cells
+            ], dtype=np.int64)
+            operating = np.array([
+                (fuel_index, *cell) in plan['s'] for cell in fuel_cells
+            ], dtype=np.int64)
+            closed = np.array([
+                (fuel_index, *cell) in plan['x'] for cell in fuel_cells
+            ], dtype=np.int64)
+            opening_costs = np.where(
+                period_indices > 0,
+                opened * np.asarray(
+                    coefficients['openingCostCoefficientsUSD'],
+                    dtype=float,
+                )[option_indices, period_indices],
+                0.0,
+            )
+            maintenance_costs = (opened + operating) * np.asarray(
+                coefficients['maintenanceCostCoefficientsUSD'],
+                dtype=float,
+            )[option_indices, period_indices]
+            decommissioning_costs = closed * np.asarray(
+                coefficients['decommissioningCostCoefficientsUSD'],
+                dtype=float,
+            )[option_indices, period_indices]
+
+            for (
+                tank_index,
+                option_index,
+                period_index,
+                tank_opened,
+                tank_operating,
+                tank_closed,
+                opening_cost,
+                maintenance_cost,
+                decommissioning_cost,
+            ) in zip(
+                tank_indices.tolist(),
+                option_indices.tolist(),
+                period_indices.tolist(),
+                opened.tolist(),
+                operating.tolist(),
+                closed.tolist(),
+                opening_costs.tolist(),
+                maintenance_costs.tolist(),
+                decommissioning_costs.tolist(),
+            ):
+                period = periods[period_index]
+                tank = f'Tank_{tank_index + 1}'
+                capacity = capacity_key(capacities[option_index])
+                fuel_solution.setdefault(period, {}).setdefault(tank, {})[capacity] = {
+                    'opened': tank_opened,
+                    'operating': tank_operating,
+                    'closed': tank_closed,
+                }
+                fuel_costs.setdefault(period, {}).setdefault(tank, {})[capacity] = {
+                    'opened': opening_cost,
+                    'operating': maintenance_cost,
+                    'closed': decommissioning_cost,
+                }
+                breakdown['openingInvestmentCostUSD'] += opening_cost
+                breakdown['maintenanceCostUSD'] += maintenance_cost
+                breakdown['decommissioningCostUSD'] += decommissioning_cost
+
+        # (tank, from option, to option, period) sorted by period, tank,
+        # from option, to option.
+        fuel_transition_keys = sorted(
+            transitions.get(fuel_index, ()),
+            key=lambda key: (key[3], key[0], key[1], key[2]),
+        )
+        # The transition coefficients are ragged (None on the diagonal and in
+        # period 0), so they are looked up one key at a time.
+        transition_coefficients = coefficients['transitionCostCoefficientsUSD']
+        for tank_index, from_option, to_option, period_index in fuel_transition_keys:
+            transition_cost = transition_coefficients[from_option][to_option][period_index]
+            fuel_transitions.setdefault(periods[period_index], {}).setdefault(
+                f'Tank_{tank_index + 1}',
+                [],
+            ).append({
+                'fromCapacity': capacities[from_option],
+                'toCapacity': capacities[to_option],
+                'costUSD': transition_cost,
+            })
+            breakdown['transitionCostUSD'] += transition_cost
 
         if fuel_solution:
             result['solution'][fuel] = fuel_solution
@@ -545,33 +2424,652 @@ def solve_facility_location(data, export_model=False):
         if fuel_transitions:
             result['transitions'][fuel] = fuel_transitions
 
+
+def _greedy_plan(model, data):
+    plan = {'y': set(), 's': set(), 'x': set(), 'z': set()}
+    for fuel_index, fuel in enumerate(data['Fuels']):
+        fuel_plan = greedy_fuel_plan(
+            model['demand'][fuel],
+            data['T'],
+            data['Capacities'][fuel],
+            model['preparedCosts'][fuel],
+            model['initialState'][fuel],
+        )
+        if fuel_plan is None:
+            continue
+        fuel_keys = tank_plan_keys(fuel_index, fuel_plan, len(data['T']))
+        for family, keys in fuel_keys.items():
+            plan[family] |= keys
+    return plan
+
+
+def _plan_hint(model, plan):
+    # Every variable of the model gets a hint. Per-tank hints are the plan's
+    # binaries; aggregated hints are the plan's tank counts.
+    variables = model['variables']
+    if model['engine'] == 'perTank':
+        return [
+            (variable, 1 if key in plan[family] else 0)
+            for family, family_variables in variables.items()
+            for key, variable in family_variables.items()
+        ]
+
+    counts = {family: {} for family in ('Y', 'S', 'X', 'F')}
+    for family, keys in (('Y', plan['y']), ('S', plan['s']), ('X', plan['x'])):
+        for fuel_index, _, option_index, period_index in keys:
+            key = (fuel_index, option_index, period_index)
+            counts[family][key] = counts[family].get(key, 0) + 1
+    active_option = {
+        (fuel_index, tank_index, period_index): option_index
+        for fuel_index, tank_index, option_index, period_index in plan['y'] | plan['s']
+    }
+    for fuel_index, tank_index, to_option, period_index in plan['s']:
+        from_option = active_option.get((fuel_index, tank_index, period_index - 1))
+        if from_option is None:
+            continue
+        key = (fuel_index, from_option, to_option, period_index)
+        counts['F'][key] = counts['F'].get(key, 0) + 1
+    return [
+        (variable, counts[family].get(key, 0))
+        for family, family_variables in variables.items()
+        for key, variable in family_variables.items()
+    ]
+
+
+def _apply_warm_start(model, data, previous_plan=None):
+    # Plans from earlier solves are over the request's options; the hint is
+    # over the model's.
+    source = model['solverOptions']['warmStart']
+    plan = None
+    distance = None
+    model_data = model.get('modelData', data)
+    if previous_plan is not None:
+        source = 'previous'
+        plan = _model_plan(model, previous_plan)
+    elif source == 'off':
+        return None
+    elif source == 'nearest':
+        nearest = DEFAULT_PLAN_STORE.nearest(data)
+        if nearest is not None:
+            stored_plan, distance = nearest
+            # Keep only tanks that still exist after tank-count tightening.
+            tank_counts = [model['tankCounts'][fuel] for fuel in data['Fuels']]
+            plan = _model_plan(model, {
+                family: {key for key in keys if key[1] < tank_counts[key[0]]}
+                for family, keys in stored_plan.items()
+            })
+        else:
+            source = 'greedy'
+    if plan is None:
+        plan = _greedy_plan(model, model_data)
+
+    hint = _plan_hint(model, plan)
+    model['solver'].SetHint(
+        [variable for variable, _ in hint],
+        [value for _, value in hint],
+    )
+    hinted = _result_skeleton(model_data, model['preparedCosts'])
+    _populate_plan_result(
+        hinted,
+        model_data,
+        model['preparedCosts'],
+        plan,
+    )
+    return {
+        'source': source,
+        'scenarioDistance': distance,
+        'hintedVariables': len(hint),
+        'hintObjectiveUSD': sum(
+            value
+            for component, value in hinted['costBreakdown'].items()
+            if component != 'totalObjectiveUSD'
+        ),
+        'firstSolutionSeconds': None,
+        'improvementUSD': None,
+    }
+
+
+def _result_skeleton(data, prepared_costs):
+    periods = data['T']
+    fuels = data['Fuels']
+    discount_factors = prepared_costs[fuels[0]]['discountFactorsByPeriod']
+    planning_period_years = prepared_costs[fuels[0]]['planningPeriodYears']
+    period_mapping = [
+        {
+            'label': period,
+            'periodIndex': period_index,
+            'elapsedYears': planning_period_years * period_index,
+            'discountFactor': discount_factors[period_index],
+        }
+        for period_index, period in enumerate(periods)
+    ]
+    return {
+        'status': None,
+        'solveCpuTimeSeconds': 0.0,
+        'constraintCount': 0,
+        'variableCount': 0,
+        'solution': {},
+        'costs': {},
+        'transitions': {},
+        'planningPeriods': period_mapping,
+        'periodMapping': period_mapping,
+        'financialParameters': financial_parameters_for_response(
+            prepared_costs,
+            fuels,
+        ),
+        'costBreakdown': {
+            'openingInvestmentCostUSD': 0.0,
+            'maintenanceCostUSD': 0.0,
+            'decommissioningCostUSD': 0.0,
+            'transitionCostUSD': 0.0,
+            'totalObjectiveUSD': 0.0,
+        },
+    }
+
+
+def _check_cost_breakdown(cost_breakdown, objective_total):
     component_total = (
-        result['costBreakdown']['openingInvestmentCostUSD']
-        + result['costBreakdown']['maintenanceCostUSD']
-        + result['costBreakdown']['decommissioningCostUSD']
-        + result['costBreakdown']['transitionCostUSD']
+        cost_breakdown['openingInvestmentCostUSD']
+        + cost_breakdown['maintenanceCostUSD']
+        + cost_breakdown['decommissioningCostUSD']
+        + cost_breakdown['transitionCostUSD']
     )
-    objective_total = solver.Objective().Value()
     if not math.isclose(component_total, objective_total, rel_tol=1e-9, abs_tol=1e-6):
         raise RuntimeError(
             'Reported cost breakdown does not match the solver objective: '
             f'{component_total} != {objective_total}'
         )
+
+
+def _fuel_subproblem(data, fuel, limits):
+    subproblem = dict(data)
+    subproblem['Fuels'] = [fuel]
+    for field in FUEL_KEYED_FIELDS:
+        subproblem[field] = {fuel: data[field][fuel]}
+    # Subprocesses may not share this process's policy, so they get the
+    # clamped limits. Relative gaps add up across fuels; an absolute gap is
+    # split between them.
+    absolute_gap = limits['absoluteGapUSD']
+    subproblem['solverOptions'] = {
+        **data.get('solverOptions', {}),
+        'decomposeByFuel': False,
+        'timeLimitMs': limits['timeLimitMs'],
+        'relativeGap': limits['relativeGap'],
+        'absoluteGapUSD': None if absolute_gap is None else absolute_gap / len(data['Fuels']),
+    }
+    return subproblem
+
+
+# Fuel subproblems of decomposed solves run in one process pool per process,
+# created on first use and kept, so a long-lived solver worker pays process
+# start-up and the OR-Tools import once. Pool processes are spawned rather
+# than forked because solver_worker.py reads stdin on a thread. Setting the
+# pool's shared event cancels the subproblems running in it.
+_DECOMPOSITION_POOL = {'executor': None, 'workers': 0, 'cancel': None}
+_DECOMPOSITION_POOL_LOCK = threading.Lock()
+_SUBPROBLEM_CANCEL = None
+_CANCEL_POLL_SECONDS = 0.05
+
+
+def _init_subproblem_process(cancel):
+    global _SUBPROBLEM_CANCEL
+    _SUBPROBLEM_CANCEL = cancel
+
+
+def _decomposition_pool(workers):
+    """Return the process pool and its cancel event for `workers` processes."""
+    pool = _DECOMPOSITION_POOL
+    with _DECOMPOSITION_POOL_LOCK:
+        if pool['executor'] is None or pool['workers'] != workers:
+            if pool['executor'] is not None:
+                pool['executor'].shutdown()
+            context = multiprocessing.get_context('spawn')
+            pool['cancel'] = context.Event()
+            pool['executor'] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_subproblem_process,
+                initargs=(pool['cancel'],),
+            )
+            pool['workers'] = workers
+        return pool['executor'], pool['cancel']
+
+
+def _solve_subproblem(subproblem, cancel=None):
+    """Solve one fuel subproblem, stopping it once `cancel` (by default the
+    event of the pool this process belongs to) is set."""
+    cancel = _SUBPROBLEM_CANCEL if cancel is None else cancel
+    control = SolveControl()
+    finished = threading.Event()
+
+    def watch():
+        while not finished.is_set():
+            if cancel.wait(_CANCEL_POLL_SECONDS):
+                control.cancel()
+                return
+
+    # The watcher may cancel before the solve starts; solve_model then
+    # returns without searching.
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        return solve_facility_location(subproblem, control=control)
+    finally:
+        finished.set()
+        watcher.join()
+
+
+def _combined_status(statuses):
+    for status in statuses:
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            return status
+    if all(status == pywraplp.Solver.OPTIMAL for status in statuses):
+        return pywraplp.Solver.OPTIMAL
+    return pywraplp.Solver.FEASIBLE
+
+
+def _solve_decomposed_by_fuel(data, solver_options, timings, control=None):
+    # Validate the whole request up front so errors are reported exactly as
+    # for the monolithic model, before any subprocess is started.
+    timings.restart()
+    prepared_costs = prepare_financial_costs_for_model(data)
+    timings.lap('preparation')
+    _validate_model_inputs(data, prepared_costs)
+    timings.lap('validation')
+    if control is not None:
+        control.report('validated')
+    fuels = data['Fuels']
+    limits = _solver_limits(solver_options)
+    subproblems = [_fuel_subproblem(data, fuel, limits) for fuel in fuels]
+    workers = min(
+        len(fuels),
+        solver_options['decompositionWorkers'] or os.cpu_count() or 1,
+    )
+
+    started = time.perf_counter()
+    if workers == 1:
+        executor, cancel = None, threading.Event()
+    else:
+        executor, cancel = _decomposition_pool(workers)
+        cancel.clear()
+    if control is not None:
+        control.attach_interrupt(cancel.set)
+        if control.cancelled:
+            cancel.set()
+    try:
+        if executor is None:
+            fuel_results = [
+                _solve_subproblem(subproblem, cancel) for subproblem in subproblems
+            ]
+        else:
+            fuel_results = list(executor.map(_solve_subproblem, subproblems))
+    finally:
+        if control is not None:
+            control.detach()
+    wall_seconds = time.perf_counter() - started
+    # The subproblems overlap, so their phases are reported per fuel and the
+    # pool's wall time as this request's solve.
+    timings.restart()
+    timings['solveSeconds'] = wall_seconds
+
+    result = _result_skeleton(data, prepared_costs)
+    result['status'] = _combined_status(
+        [fuel_result['status'] for fuel_result in fuel_results]
+    )
+    result['solveCpuTimeSeconds'] = wall_seconds
+    result['constraintCount'] = sum(
+        fuel_result['constraintCount'] for fuel_result in fuel_results
+    )
+    result['variableCount'] = sum(
+        fuel_result['variableCount'] for fuel_result in fuel_results
+    )
+    result['solverLimits'] = limits
+    if control is not None and control.cancelled:
+        result['cancelled'] = True
+    result['terminationReason'] = max(
+        (fuel_result['terminationReason'] for fuel_result in fuel_results),
+        key=TERMINATION_REASONS.index,
+    )
+    result['decomposition'] = {
+        'mode': 'perFuel',
+        'workers': workers,
+        'fuels': {
+            fuel: {
+                'status': fuel_result['status'],
+                'objectiveUSD': fuel_result['costBreakdown']['totalObjectiveUSD'],
+                'bestBoundUSD': fuel_result.get('bestBoundUSD'),
+                'terminationReason': fuel_result['terminationReason'],
+                'solveCpuTimeSeconds': fuel_result['solveCpuTimeSeconds'],
+                'timings': fuel_result['timings'],
+            }
+            for fuel, fuel_result in zip(fuels, fuel_results)
+        },
+    }
+    if solver_options['warmStart'] != 'off':
+        # Each fuel is hinted on its own; with worker processes the plans
+        # are remembered by whichever pool process solved the fuel.
+        for fuel, fuel_result in zip(fuels, fuel_results):
+            result['decomposition']['fuels'][fuel]['warmStart'] = fuel_result['warmStart']
+    if solver_options['tightenTankCounts']:
+        result['tankCountBounds'] = {
+            fuel: fuel_result['tankCountBounds'][fuel]
+            for fuel, fuel_result in zip(fuels, fuel_results)
+        }
+    if solver_options['pruneDominatedOptions']:
+        result['prunedOptions'] = {
+            fuel: fuel_result['prunedOptions'][fuel]
+            for fuel, fuel_result in zip(fuels, fuel_results)
+            if fuel in fuel_result['prunedOptions']
+        }
+    if 'presolve' in fuel_results[0]:
+        result['presolve'] = {
+            field: sum(fuel_result['presolve'][field] for fuel_result in fuel_results)
+            for field in fuel_results[0]['presolve']
+        }
+    if result['status'] not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        result['timings'] = dict(timings)
+        return result
+
+    breakdown = result['costBreakdown']
+    for fuel, fuel_result in zip(fuels, fuel_results):
+        for section in ('solution', 'costs', 'transitions'):
+            if fuel in fuel_result[section]:
+                result[section][fuel] = fuel_result[section][fuel]
+        for component, value in fuel_result['costBreakdown'].items():
+            breakdown[component] += value
+    _check_cost_breakdown(breakdown, breakdown['totalObjectiveUSD'])
+    # Fuels are independent, so the bounds add up like the objectives.
+    result['bestBoundUSD'] = sum(fuel_result['bestBoundUSD'] for fuel_result in fuel_results)
+    result['gap'] = _relative_gap(breakdown['totalObjectiveUSD'], result['bestBoundUSD'])
+    timings.lap('extraction')
+    result['timings'] = dict(timings)
+    return result
+
+
+def build_model(data, keep_names=False, timings=None, control=None):
+    """Build the model of the engine selected in solverOptions. `control`
+    receives the 'validated' progress event."""
+    if _validate_solver_options(data)['engine'] == 'aggregated':
+        return build_tank_count_model(data, timings=timings, control=control)
+    return build_facility_location_model(
+        data,
+        keep_names=keep_names,
+        timings=timings,
+        control=control,
+    )
+
+
+def solve_facility_location(data, export_model=False, control=None):
+    timings = PhaseTimings()
+    solver_options = _validate_solver_options(data)
+    timings.lap('validation')
+    if solver_options['decomposeByFuel'] and not export_model:
+        # Subproblems run in other processes and report no incumbents.
+        return _solve_decomposed_by_fuel(data, solver_options, timings, control)
+
+    model = build_model(data, keep_names=export_model, timings=timings, control=control)
+    solver = model['solver']
+    if control is not None:
+        control.report(
+            'model',
+            variableCount=solver.NumVariables(),
+            constraintCount=solver.NumConstraints(),
+            buildSeconds=timings['buildSeconds'],
+        )
+
+    if export_model:
+        if isinstance(solver, CpSatSolver):
+            raise ValueError('LP export requires the mpsolver solver backend')
+        write_model(solver, 'facility_location_model.lp')
+        timings.lap('export')
+
+    return solve_model(model, data, control=control)
+
+
+def _relative_gap(objective, bound):
+    if objective == bound:
+        return 0.0
+    return abs(objective - bound) / max(abs(objective), 1e-9)
+
+
+def _solver_limits(solver_options, policy=None):
+    """Return the stop limits of a solve: the requested ones clamped by
+    `policy` (SOLVER_LIMIT_POLICY by default), and the clamped fields."""
+    policy = SOLVER_LIMIT_POLICY if policy is None else policy
+    limits = {
+        'timeLimitMs': solver_options['timeLimitMs'] or SOLVER_TIME_LIMIT_MS,
+        'relativeGap': solver_options['relativeGap'],
+        'absoluteGapUSD': solver_options['absoluteGapUSD'],
+        'clamped': [],
+    }
+    maximum = policy['maxTimeLimitMs']
+    if maximum is not None and limits['timeLimitMs'] > maximum:
+        if solver_options['timeLimitMs'] is not None:
+            limits['clamped'].append('timeLimitMs')
+        limits['timeLimitMs'] = maximum
+    for field, policy_field in (
+        ('relativeGap', 'minRelativeGap'),
+        ('absoluteGapUSD', 'minAbsoluteGapUSD'),
+    ):
+        minimum = policy[policy_field]
+        if minimum is not None and (limits[field] or 0.0) < minimum:
+            if limits[field] is not None:
+                limits['clamped'].append(field)
+            limits[field] = minimum
+    return limits
+
+
+def _apply_solver_limits(solver, limits):
+    solver.SetTimeLimit(int(math.ceil(limits['timeLimitMs'])))
+    if isinstance(solver, CpSatSolver):
+        solver.SetGapLimits(limits['relativeGap'], limits['absoluteGapUSD'])
+        return
+    # The SAT backend of MPSolver ignores MPSolverParameters' gaps and takes
+    # CP-SAT's own parameters instead.
+    parameters = []
+    if limits['relativeGap'] is not None:
+        parameters.append(f'relative_gap_limit:{limits["relativeGap"]!r}')
+    if limits['absoluteGapUSD'] is not None:
+        parameters.append(f'absolute_gap_limit:{limits["absoluteGapUSD"]!r}')
+    if parameters and not solver.SetSolverSpecificParametersAsString(' '.join(parameters)):
+        raise RuntimeError('The solver rejected the gap limits')
+
+
+def _termination_reason(status, objective=None, bound=None, cancelled=False):
+    if status in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE) and cancelled:
+        return 'cancelled'
+    if status == pywraplp.Solver.OPTIMAL:
+        # CP-SAT reports OPTIMAL when it stops at a gap limit, too.
+        if abs(objective - bound) <= 1e-6 * max(1.0, abs(objective)):
+            return 'optimal'
+        return 'gapLimit'
+    if status in (pywraplp.Solver.FEASIBLE, pywraplp.Solver.NOT_SOLVED):
+        return 'cancelled' if cancelled else 'timeLimit'
+    if status == pywraplp.Solver.INFEASIBLE:
+        return 'infeasible'
+    if status == pywraplp.Solver.MODEL_INVALID:
+        return 'modelInvalid'
+    return 'abnormal'
+
+
+def _extract_plan(model, data):
+    if model['engine'] == 'aggregated':
+        return _tank_plan_from_counts(model, data)
+    return _extract_tank_plan(model)
+
+
+def _report_incumbent(model, data, control):
+    # Runs inside the CP-SAT solution callback, so solution values are the
+    # incumbent's.
+    solver = model['solver']
+    data = model.get('modelData', data)
+    incumbent = _result_skeleton(data, model['preparedCosts'])
+    _populate_plan_result(
+        incumbent,
+        data,
+        model['preparedCosts'],
+        _extract_plan(model, data),
+    )
+    objective = solver.Objective().Value()
+    bound = solver.BestBound()
+    incumbent['costBreakdown']['totalObjectiveUSD'] = objective
+    control.report(
+        'incumbent',
+        seconds=solver.incumbent.WallTime(),
+        objectiveUSD=objective,
+        bestBoundUSD=bound,
+        gap=_relative_gap(objective, bound),
+        costBreakdown=incumbent['costBreakdown'],
+        solution=incumbent['solution'],
+    )
+
+
+def solve_model(model, data, previous_plan=None, control=None):
+    """Solve a built model and map the solution to the response.
+
+    `previous_plan` hints a plan from an earlier solve of the same model in
+    place of the warmStart option. The extracted plan is kept as
+    model['plan']. `control` (a SolveControl) receives incumbent events and
+    can stop the search early. Plans are over the request's capacity
+    options even when the model pruned some; the response does not depend
+    on the option numbering.
+    """
+    solver = model['solver']
+    prepared_costs = model['preparedCosts']
+    model_data = model.get('modelData', data)
+    # A fresh or retargeted model carries the timings of its build; later
+    # solves of the same model report only their own phases.
+    timings = model.pop('timings', None) or PhaseTimings()
+    timings.restart()
+    warm_start = _apply_warm_start(model, data, previous_plan)
+    if warm_start is not None:
+        timings.lap('warmStart')
+
+    limits = _solver_limits(model['solverOptions'])
+    _apply_solver_limits(solver, limits)
+    solver_parameters = pywraplp.MPSolverParameters()
+    constraint_count = solver.NumConstraints()
+    variable_count = solver.NumVariables()
+    if control is None:
+        status = solver.Solve(solver_parameters)
+    else:
+        if isinstance(solver, CpSatSolver):
+            solver.solution_listener = lambda: _report_incumbent(model, data, control)
+        control.attach(solver)
+        try:
+            if control.cancelled:
+                status = pywraplp.Solver.NOT_SOLVED
+            else:
+                status = solver.Solve(solver_parameters)
+        finally:
+            control.detach()
+            if isinstance(solver, CpSatSolver):
+                solver.solution_listener = None
+    timings.lap('solve')
+    # wall time is returned in milliseconds by OR-Tools
+    solve_cpu_time_seconds = solver.WallTime() / 1000.0
+    result = _result_skeleton(model_data, prepared_costs)
+    result['status'] = status
+    result['solveCpuTimeSeconds'] = solve_cpu_time_seconds
+    result['constraintCount'] = constraint_count
+    result['variableCount'] = variable_count
+    if model['tankCountBounds'] is not None:
+        result['tankCountBounds'] = model['tankCountBounds']
+    if model.get('presolve') is not None:
+        result['presolve'] = model['presolve']
+    if model.get('prunedOptions') is not None:
+        result['prunedOptions'] = model['prunedOptions']
+    if warm_start is not None:
+        if isinstance(solver, CpSatSolver):
+            # MPSolver does not report when the first solution was found.
+            warm_start['firstSolutionSeconds'] = solver.first_solution_seconds
+        result['warmStart'] = warm_start
+    cancelled = control is not None and control.cancelled
+    if cancelled:
+        result['cancelled'] = True
+    result['solverLimits'] = limits
+
+    if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        result['terminationReason'] = _termination_reason(status, cancelled=cancelled)
+        result['timings'] = dict(timings)
+        return result
+
+    plan = _extract_plan(model, model_data)
+    _populate_plan_result(result, model_data, prepared_costs, plan)
+    plan = _request_plan(model, plan)
+    # Only requests that use warm starts feed the plan store.
+    if model['solverOptions']['warmStart'] != 'off':
+        DEFAULT_PLAN_STORE.remember(data, plan)
+    model['plan'] = plan
+
+    objective_total = solver.Objective().Value()
+    _check_cost_breakdown(result['costBreakdown'], objective_total)
     result['costBreakdown']['totalObjectiveUSD'] = objective_total
+    if warm_start is not None:
+        # How much the search improved on the hinted plan; zero when the
+        # hint was already the reported plan.
+        warm_start['improvementUSD'] = warm_start['hintObjectiveUSD'] - objective_total
+    bound = solver.Objective().BestBound()
+    if status == pywraplp.Solver.OPTIMAL:
+        # OPTIMAL guarantees the incumbent is within the gap limits, but
+        # CP-SAT can report a weaker bound for a floating-point objective it
+        # solved in presolve.
+        allowed_gap = max(
+            limits['absoluteGapUSD'] or 0.0,
+            (limits['relativeGap'] or 0.0) * abs(objective_total),
+        )
+        bound = max(bound, objective_total - allowed_gap)
+    result['bestBoundUSD'] = bound
+    result['gap'] = _relative_gap(objective_total, bound)
+    result['terminationReason'] = _termination_reason(
+        status, objective_total, bound, cancelled
+    )
+    timings.lap('extraction')
+    result['timings'] = dict(timings)
     return result
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Solve the optimization request read from stdin.',
+    )
+    parser.add_argument('--result-format', choices=RESULT_FORMATS, default='nested')
+    parser.add_argument(
+        '--compression',
+        choices=COMPRESSIONS,
+        default='none',
+        help='compress the JSON written to stdout',
+    )
+    parser.add_argument(
+        '--audit-dir',
+        default=None,
+        help='journal the request and its result to this directory',
+    )
+    parser.add_argument('--request-id', default=None, help='id of the journal record')
+    arguments = parser.parse_args()
+    journal = AuditJournal(arguments.audit_dir) if arguments.audit_dir else None
     try:
         input_text = sys.stdin.read()
+        parse_started = time.perf_counter()
         input_data = json.loads(input_text)
-        with open('input_data.txt', 'w') as input_file:
-            input_file.write(input_text)
+        parse_seconds = time.perf_counter() - parse_started
         result_data = solve_facility_location(input_data, export_model=False)
+        result_data['timings']['parseSeconds'] = parse_seconds
+        result_data = format_result(result_data, input_data, arguments.result_format)
         output_text = json.dumps(result_data)
-        print(output_text)
-        with open('output_data.txt', 'w') as output_file:
-            output_file.write(output_text)
-    except (KeyError, TypeError, ValueError, json.JSONDecodeError) as error:
+        if arguments.compression == 'none':
+            print(output_text)
+        else:
+            sys.stdout.buffer.write(compress(output_text.encode('utf-8'), arguments.compression))
+        if journal is not None:
+            journal.record(
+                arguments.request_id or uuid.uuid4().hex,
+                input_data,
+                {'code': 0, 'result': result_data},
+            )
+    except VALIDATION_ERRORS as error:
         print(json.dumps({'error': 'validation_error', 'message': str(error)}))
-        sys.exit(2)
\ No newline at end of file
+        sys.exit(2)
+    finally:
+        if journal is not None:
+            journal.close()
@@ -1,25 +1,25 @@
 import re
+import sys
 
-def modify_lp_file(input_file, output_file):
-    # Regular expression to match variable names of the format: <name>[<indices>]
-    variable_pattern = re.compile(r"(\w+)\[(\d+,\d+(?:,\d+)*)\]")
+# Kept for LP files written by OR-Tools' own exporter. model_export.py writes
+# these names directly; see `python model_export.py --help`.
 
-    with open(input_file, "r") as file:
-        lp_content = file.read()
+# Matches variable names of the format: <name>[<indices>]
+VARIABLE_PATTERN = re.compile(r"(\w+)\[(\d+(?:,\d+)*)\]")
 
-    # Replace variable names
-    modified_content = variable_pattern.sub(
-        lambda match: f"{match.group(1)}_{match.group(2).replace(',', '_')}",
-        lp_content,
-    )
 
-    # Write the modified content to the new file
-    with open(output_file, "w") as file:
-        file.write(modified_content)
+def modify_lp_file(input_file, output_file):
+    # Rewrites one line at a time, so large files are never read whole.
+    with open(input_file, "r") as source, open(output_file, "w") as target:
+        for line in source:
+            target.write(VARIABLE_PATTERN.sub(
+                lambda match: f"{match.group(1)}_{match.group(2).replace(',', '_')}",
+                line,
+            ))
 
-# Example usage
-input_lp_file = "facility_location_model.lp"
-output_lp_file = "facility_location_model_cplex.lp"
 
-modify_lp_file(input_lp_file, output_lp_file)
-print(f"Modified LP file written to {output_lp_file}")
+if __name__ == "__main__":
+    input_lp_file = sys.argv[1] if len(sys.argv) > 1 else "facility_location_model.lp"
+    output_lp_file = sys.argv[2] if len(sys.argv) > 2 else "facility_location_model_cplex.lp"
+    modify_lp_file(input_lp_file, output_lp_file)
+    print(f"Modified LP file written to {output_lp_file}")
@@ -0,0 +1,242 @@
+// resultCache.js
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+// Only these TankOptions fields reach the optimizer; the remaining fields are
+// estimator metadata and must not split the cache.
+const TANK_OPTION_MODEL_FIELDS = [
+  'optimizerName',
+  'capacityMgoEquivalentTonnes',
+  'baseInvestmentCostUSD',
+];
+
+function canonicalize(value) {
+  if (Array.isArray(value)) {
+    return value.map(canonicalize);
+  }
+  if (value && typeof value === 'object') {
+    const sorted = {};
+    for (const key of Object.keys(value).sort()) {
+      sorted[key] = canonicalize(value[key]);
+    }
+    return sorted;
+  }
+  return value;
+}
+
+function reduceTankOptions(tankOptions) {
+  if (!tankOptions || typeof tankOptions !== 'object' || Array.isArray(tankOptions)) {
+    return tankOptions;
+  }
+  const reduced = {};
+  for (const [fuel, options] of Object.entries(tankOptions)) {
+    reduced[fuel] = Array.isArray(options)
+      ? options.map((option) => {
+        if (!option || typeof option !== 'object') {
+          return option;
+        }
+        const modelOption = {};
+        for (const field of TANK_OPTION_MODEL_FIELDS) {
+          if (field in option) {
+            modelOption[field] = option[field];
+          }
+        }
+        return modelOption;
+      })
+      : options;
+  }
+  return reduced;
+}
+
+// Every top-level field takes part in the key, so a request that would fail
+// validation (e.g. a forbidden `Costs` matrix) can never alias a cached
+// success. `salt` identifies the solver code and settings that produced the
+// result.
+function canonicalScenarioKey(payload, salt = '') {
+  const scenario = { ...payload, TankOptions: reduceTankOptions(payload.TankOptions) };
+  return crypto
+    .createHash('sha256')
+    .update(salt)
+    .update('\0')
+    .update(JSON.stringify(canonicalize(scenario)))
+    .digest('hex');
+}
+
+// Hash of the backend Python sources. Solver settings such as SOLVER_BACKEND
+// and SOLVER_TIME_LIMIT_MS live in those sources, so a deployment that
+// changes the model or its settings never serves results from the old one.
+function solverSourceSalt(directory = __dirname) {
+  const hash = crypto.createHash('sha256');
+  const sources = fs.readdirSync(directory)
+    .filter((name) => name.endsWith('.py') && !name.startsWith('test_'))
+    .sort();
+  for (const name of sources) {
+    hash.update(name).update(fs.readFileSync(path.join(directory, name)));
+  }
+  return hash.digest('hex');
+}
+
+// Two-tier result cache: a bounded in-memory LRU in front of an optional
+// on-disk directory bounded by total size. Concurrent lookups of a key that
+// is being computed share the in-flight promise instead of solving again.
+class ResultCache {
+  constructor({
+    maxEntries = 256,
+    directory = null,
+    maxDiskBytes = 256 * 1024 * 1024,
+  } = {}) {
+    this.maxEntries = maxEntries;
+    this.directory = directory;
+    this.maxDiskBytes = maxDiskBytes;
+    this.memory = new Map();
+    this.inFlight = new Map();
+    // key -> file size, in least-recently-used order.
+    this.diskEntries = new Map();
+    this.diskBytes = 0;
+    if (this.directory) {
+      this.loadDiskIndex();
+    }
+  }
+
+  loadDiskIndex() {
+    fs.mkdirSync(this.directory, { recursive: true });
+    const entries = fs.readdirSync(this.directory)
+      .filter((name) => name.endsWith('.json'))
+      .map((name) => {
+        const stats = fs.statSync(path.join(this.directory, name));
+        return { key: name.slice(0, -'.json'.length), size: stats.size, mtimeMs: stats.mtimeMs };
+      })
+      .sort((first, second) => first.mtimeMs - second.mtimeMs);
+    for (const { key, size } of entries) {
+      this.diskEntries.set(key, size);
+      this.diskBytes += size;
+    }
+    this.evictDisk();
+  }
+
+  diskPath(key) {
+    return path.join(this.directory, `${key}.json`);
+  }
+
+  rememberInMemory(key, value) {
+    this.memory.delete(key);
+    this.memory.set(key, value);
+    while (this.memory.size > this.maxEntries) {
+      this.memory.delete(this.memory.keys().next().value);
+    }
+  }
+
+  async get(key) {
+    if (this.memory.has(key)) {
+      const value = this.memory.get(key);
+      this.rememberInMemory(key, value);
+      return value;
+    }
+    if (!this.directory || !this.diskEntries.has(key)) {
+      return undefined;
+    }
+    try {
+      const value = JSON.parse(await fs.promises.readFile(this.diskPath(key), 'utf8'));
+      const size = this.diskEntries.get(key);
+      this.diskEntries.delete(key);
+      this.diskEntries.set(key, size);
+      this.rememberInMemory(key, value);
+      return value;
+    } catch {
+      this.forgetDisk(key);
+      return undefined;
+    }
+  }
+
+  async set(key, value) {
+    this.rememberInMemory(key, value);
+    if (!this.directory) {
+      return;
+    }
+    const text = JSON.stringify(value);
+    const temporaryPath = `${this.diskPath(key)}.${process.pid}.tmp`;
+    await fs.promises.writeFile(temporaryPath, text);
+    await fs.promises.rename(temporaryPath, this.diskPath(key));
+    this.forgetDisk(key, { unlink: false });
+    const size = Buffer.byteLength(text);
+    this.diskEntries.set(key, size);
+    this.diskBytes += size;
+    this.evictDisk();
+  }
+
+  forgetDisk(key, { unlink = true } = {}) {
+    if (!this.diskEntries.has(key)) {
+      return;
+    }
+    this.diskBytes -= this.diskEntries.get(key);
+    this.diskEntries.delete(key);
+    if (unlink) {
+      fs.rmSync(this.diskPath(key), { force: true });
+    }
+  }
+
+  evictDisk() {
+    while (this.diskBytes > this.maxDiskBytes && this.diskEntries.size > 0) {
+      this.forgetDisk(this.diskEntries.keys().next().value);
+    }
+  }
+
+  leaveInFlight(key, flight) {
+    if (this.inFlight.get(key) === flight) {
+      this.inFlight.delete(key);
+    }
+  }
+
+  // Resolves with `{ cacheStatus, value }`. `compute(signal)` is only called
+  // on a miss; `shouldStore(value)` decides whether its value is cacheable.
+  // The computation's signal aborts once every caller sharing it has aborted
+  // its own `signal`; a caller without one keeps the computation alive.
+  async getOrCompute(key, compute, shouldStore = () => true, signal = null) {
+    const cached = await this.get(key);
+    if (cached !== undefined) {
+      return { cacheStatus: 'hit', value: cached };
+    }
+    // An aborted flight has already left inFlight, so an identical request
+    // arriving while it winds down starts a fresh computation.
+    let flight = this.inFlight.get(key);
+    const cacheStatus = flight ? 'shared' : 'miss';
+    if (!flight) {
+      const controller = new AbortController();
+      const current = { controller, callers: 0, pending: null };
+      flight = current;
+      this.inFlight.set(key, current);
+      current.pending = (async () => {
+        try {
+          const value = await compute(controller.signal);
+          if (shouldStore(value)) {
+            await this.set(key, value).catch((error) => {
+              console.error(`Result cache write failed: ${error.message}`);
+            });
+          }
+          return value;
+        } finally {
+          this.leaveInFlight(key, current);
+        }
+      })();
+    }
+    flight.callers += 1;
+    if (signal) {
+      const leave = () => {
+        flight.callers -= 1;
+        if (flight.callers === 0) {
+          this.leaveInFlight(key, flight);
+          flight.controller.abort();
+        }
+      };
+      if (signal.aborted) {
+        leave();
+      } else {
+        signal.addEventListener('abort', leave, { once: true });
+      }
+    }
+    return { cacheStatus, value: await flight.pending };
+  }
+}
+
+module.exports = { ResultCache, canonicalScenarioKey, solverSourceSalt };
@@ -0,0 +1,74 @@
+// resultFormat.js
+// Converter from the opt-in columnar result format (see result_format.py) to
+// the nested format, for clients that only understand the latter.
+
+const RESULT_FORMATS = ['nested', 'columnar'];
+
+// Nested-result key of a capacity, the same as result_format.capacity_key:
+// 1000.0 and 1000 are both "1000".
+function capacityKey(capacity) {
+  return String(capacity);
+}
+
+function setDefault(object, key, value) {
+  if (!(key in object)) {
+    object[key] = value;
+  }
+  return object[key];
+}
+
+// Inverse of result_format.to_columnar. A result that is already nested is
+// returned unchanged.
+function columnarToNested(result) {
+  if (!result || result.format !== 'columnar') {
+    return result;
+  }
+  const { dictionaries, events } = result;
+  const sections = { solution: {}, costs: {}, transitions: {} };
+  for (let row = 0; row < events.event.length; row += 1) {
+    const fuel = dictionaries.fuels[events.fuel[row]];
+    const period = dictionaries.periods[events.period[row]];
+    const tank = `Tank_${events.tank[row] + 1}`;
+    const capacities = dictionaries.capacities[fuel];
+    const event = dictionaries.events[events.event[row]];
+    const cost = events.costUSD[row];
+    if (event === 'transition') {
+      const periodTransitions = setDefault(setDefault(sections.transitions, fuel, {}), period, {});
+      setDefault(periodTransitions, tank, []).push({
+        fromCapacity: capacities[events.fromOption[row]],
+        toCapacity: capacities[events.option[row]],
+        costUSD: cost,
+      });
+      continue;
+    }
+    const capacity = capacityKey(capacities[events.option[row]]);
+    const flags = setDefault(
+      setDefault(setDefault(setDefault(sections.solution, fuel, {}), period, {}), tank, {}),
+      capacity,
+      { opened: 0, operating: 0, closed: 0 }
+    );
+    const costs = setDefault(
+      setDefault(setDefault(setDefault(sections.costs, fuel, {}), period, {}), tank, {}),
+      capacity,
+      { opened: 0, operating: 0, closed: 0 }
+    );
+    // Maintenance is booked as operating cost without the operating flag.
+    const name = event === 'maintenance' ? 'operating' : event;
+    if (event !== 'maintenance') {
+      flags[name] = 1;
+    }
+    costs[name] = cost;
+  }
+
+  const nested = {};
+  for (const [field, value] of Object.entries(result)) {
+    if (field === 'format') {
+      Object.assign(nested, sections);
+    } else if (field !== 'dictionaries' && field !== 'events') {
+      nested[field] = value;
+    }
+  }
+  return nested;
+}
+
+module.exports = { RESULT_FORMATS, columnarToNested };
@@ -0,0 +1,206 @@
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is an optional dependency
+    brotli = None
+
+# Opt-in compact response format. The nested response repeats
+# fuel -> period -> Tank_n -> capacity -> flags in `solution`, again in
+# `costs` and a third time in `transitions`. The columnar format replaces the
+# three with one sparse event table whose columns are parallel lists:
+#
+#   "format": "columnar",
+#   "dictionaries": {"fuels": [...], "periods": [...],
+#                    "capacities": {"Ammonia": [...]},
+#                    "events": ["opened", "operating", "closed",
+#                               "maintenance", "transition"]},
+#   "events": {"fuel": [0, 0], "tank": [0, 0], "option": [1, 1],
+#              "fromOption": [null, 0], "period": [0, 2],
+#              "event": [0, 4], "costUSD": [0.0, 123.4]}
+#
+# fuel, period, option and event index the dictionaries; tank is the
+# zero-based tank row (Tank_1 is 0). A row is written for every set flag
+# with the cost booked under the same name. An opening period's
+# maintenance is booked under `operating` without the operating flag, so it
+# gets a `maintenance` row. Transition rows carry fromOption and put the
+# target option in option. Every other response field is unchanged, and
+# to_nested() restores the nested format exactly.
+#
+# Capacities key the nested `solution` and `costs` objects. JSON object keys
+# are strings, and Python writes the float 1000.0 as "1000.0" where
+# JavaScript's String() writes "1000", so integral capacities are keyed as
+# ints on both sides (capacity_key here, capacityKey in resultFormat.js).
+
+RESULT_FORMATS = ('nested', 'columnar')
+COMPRESSIONS = ('none', 'gzip', 'br')
+EVENT_TYPES = ('opened', 'operating', 'closed', 'maintenance', 'transition')
+EVENT_COLUMNS = ('fuel', 'tank', 'option', 'fromOption', 'period', 'event', 'costUSD')
+NESTED_SECTIONS = ('solution', 'costs', 'transitions')
+
+_OPENED, _OPERATING, _CLOSED, _MAINTENANCE, _TRANSITION = range(len(EVENT_TYPES))
+
+
+def capacity_key(capacity):
+    """Nested-result key of `capacity`: integral floats become ints."""
+    if isinstance(capacity, float) and capacity.is_integer():
+        return int(capacity)
+    return capacity
+
+
+def _tank_index(tank_label):
+    return int(tank_label[len('Tank_'):]) - 1
+
+
+def to_columnar(result, data):
+    """Return `result` in the columnar format. `data` is the request payload;
+    only its T, Fuels and Capacities are used."""
+    fuels = data['Fuels']
+    periods = data['T']
+    period_index = {period: index for index, period in enumerate(periods)}
+    events = {column: [] for column in EVENT_COLUMNS}
+
+    def add(fuel_index, tank, option, from_option, period, event, cost):
+        events['fuel'].append(fuel_index)
+        events['tank'].append(tank)
+        events['option'].append(option)
+        events['fromOption'].append(from_option)
+        events['period'].append(period)
+        events['event'].append(event)
+        events['costUSD'].append(cost)
+
+    for fuel_index, fuel in enumerate(fuels):
+        # With duplicate capacities the nested format keeps the last option.
+        option_index = {
+            capacity: index for index, capacity in enumerate(data['Capacities'][fuel])
+        }
+        fuel_solution = result['solution'].get(fuel, {})
+        fuel_costs = result['costs'].get(fuel, {})
+        fuel_transitions = result['transitions'].get(fuel, {})
+        for period, period_solution in fuel_solution.items():
+            for tank_label, tank_solution in period_solution.items():
+                tank = _tank_index(tank_label)
+                tank_costs = fuel_costs[period][tank_label]
+                for capacity, flags in tank_solution.items():
+                    option = option_index[capacity]
+                    costs = tank_costs[capacity]
+                    if flags['opened']:
+                        add(fuel_index, tank, option, None, period_index[period],
+                            _OPENED, costs['opened'])
+                    if flags['operating']:
+                        add(fuel_index, tank, option, None, period_index[period],
+                            _OPERATING, costs['operating'])
+                    elif costs['operating']:
+                        add(fuel_index, tank, option, None, period_index[period],
+                            _MAINTENANCE, costs['operating'])
+                    if flags['closed']:
+                        add(fuel_index, tank, option, None, period_index[period],
+                            _CLOSED, costs['closed'])
+        for period, period_transitions in fuel_transitions.items():
+            for tank_label, tank_transitions in period_transitions.items():
+                for transition in tank_transitions:
+                    add(
+                        fuel_index,
+                        _tank_index(tank_label),
+                        option_index[transition['toCapacity']],
+                        option_index[transition['fromCapacity']],
+                        period_index[period],
+                        _TRANSITION,
+                        transition['costUSD'],
+                    )
+
+    # The columnar fields take the place of `solution`, so converting back
+    # restores the field order too.
+    columnar = {}
+    for field, value in result.items():
+        if field == 'solution':
+            columnar['format'] = 'columnar'
+            columnar['dictionaries'] = {
+                'fuels': list(fuels),
+                'periods': list(periods),
+                'capacities': {fuel: list(data['Capacities'][fuel]) for fuel in fuels},
+                'events': list(EVENT_TYPES),
+            }
+            columnar['events'] = events
+        elif field not in NESTED_SECTIONS:
+            columnar[field] = value
+    return columnar
+
+
+def to_nested(columnar):
+    """Inverse of to_columnar()."""
+    dictionaries = columnar['dictionaries']
+    fuels = dictionaries['fuels']
+    periods = dictionaries['periods']
+    sections = {section: {} for section in NESTED_SECTIONS}
+    events = columnar['events']
+    for fuel_index, tank, option, from_option, period_index, event, cost in zip(
+        *(events[column] for column in EVENT_COLUMNS)
+    ):
+        fuel = fuels[fuel_index]
+        period = periods[period_index]
+        tank_label = f'Tank_{tank + 1}'
+        capacities = dictionaries['capacities'][fuel]
+        if event == _TRANSITION:
+            sections['transitions'].setdefault(fuel, {}).setdefault(
+                period, {}
+            ).setdefault(tank_label, []).append({
+                'fromCapacity': capacities[from_option],
+                'toCapacity': capacities[option],
+                'costUSD': cost,
+            })
+            continue
+        capacity = capacity_key(capacities[option])
+        flags = sections['solution'].setdefault(fuel, {}).setdefault(
+            period, {}
+        ).setdefault(tank_label, {}).setdefault(
+            capacity, {'opened': 0, 'operating': 0, 'closed': 0}
+        )
+        costs = sections['costs'].setdefault(fuel, {}).setdefault(
+            period, {}
+        ).setdefault(tank_label, {}).setdefault(
+            capacity, {'opened': 0.0, 'operating': 0.0, 'closed': 0.0}
+        )
+        name = 'operating' if event == _MAINTENANCE else EVENT_TYPES[event]
+        if event != _MAINTENANCE:
+            flags[name] = 1
+        costs[name] = cost
+
+    nested = {}
+    for field, value in columnar.items():
+        if field == 'format':
+            nested.update(sections)
+        elif field not in ('dictionaries', 'events'):
+            nested[field] = value
+    return nested
+
+
+def check_result_format(result_format):
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f'resultFormat must be one of {", ".join(RESULT_FORMATS)}')
+    return result_format
+
+
+def format_result(result, data, result_format='nested'):
+    if check_result_format(result_format) == 'columnar':
+        return to_columnar(result, data)
+    return result
+
+
+def compress(encoded, compression='none'):
+    """Compress encoded response bytes with gzip or Brotli."""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'compression must be one of {", ".join(COMPRESSIONS)}')
+    if compression == 'gzip':
+        return gzip.compress(encoded, compresslevel=6)
+    if compression == 'br':
+        if brotli is None:
+            raise ValueError('Brotli compression requires the brotli package')
+        return brotli.compress(encoded, quality=5)
+    return encoded
+
+
+def encode_result(result, compression='none'):
+    """Serialize a response to UTF-8 JSON bytes, optionally compressed."""
+    return compress(json.dumps(result).encode('utf-8'), compression)
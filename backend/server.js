@@ -1,10 +1,16 @@
 // server.js
-const { spawn } = require('child_process');
 const crypto = require('crypto'); // For generating random suffix
 const path = require('path');
 const fs = require('fs');
+const os = require('os');
 const express = require('express');
 const cors = require('cors');
+const { ResultCache, canonicalScenarioKey, solverSourceSalt } = require('./resultCache');
+const { SolverPool } = require('./solverPool');
+const { batchError, streamBatch } = require('./batch');
+const { SolverMetrics } = require('./metrics');
+const { sendJson } = require('./compression');
+const { RESULT_FORMATS } = require('./resultFormat');
 
 const app = express();
 const port = 3000;
@@ -12,78 +18,372 @@ const port = 3000;
 // Use CORS middleware to allow cross-origin requests
 app.use(cors());
 
+// Request latency, queue wait, solve phases and solver statuses, scraped by
+// Prometheus from GET /metrics.
+const metrics = new SolverMetrics();
+app.use((req, res, next) => {
+  const started = process.hrtime.bigint();
+  res.on('finish', () => {
+    // Label by route pattern, not URL, so session ids do not explode series.
+    const route = req.route ? req.baseUrl + req.route.path : 'unmatched';
+    const seconds = Number(process.hrtime.bigint() - started) / 1e9;
+    metrics.observeRequest(req.method, route, String(res.statusCode), seconds);
+  });
+  next();
+});
+
+// Every request gets an id, echoed in X-Request-Id, that names its audit
+// journal record. A well-formed X-Request-Id from the client is kept.
+app.use((req, res, next) => {
+  const requestId = req.get('X-Request-Id');
+  req.id = /^[\w.:-]{1,128}$/.test(requestId || '') ? requestId : crypto.randomUUID();
+  res.set('X-Request-Id', req.id);
+  next();
+});
+
+app.get('/metrics', (req, res) => {
+  res.set('Content-Type', 'text/plain; version=0.0.4');
+  res.send(metrics.render());
+});
+
+// Batches carry many scenarios, so they get a larger body limit. This parser
+// runs first; the default one below skips bodies that are already parsed.
+const maxBatchScenarios = Number(process.env.BATCH_MAX_SCENARIOS) || 500;
+app.use('/submit-batch', express.json({ limit: process.env.BATCH_MAX_BODY || '50mb' }));
+
 // Include middleware to parse JSON bodies
 app.use(express.json());
 
-// Define a POST route to receive the data
-app.post('/submit', (req, res) => {
+// Long-lived Python solver workers, one per core by default.
+const solverTimeoutMs = Number(process.env.SOLVER_JOB_TIMEOUT_MS) || 120000;
+const solverPool = new SolverPool({
+  size: Number(process.env.SOLVER_WORKERS) || os.cpus().length,
+  maxJobsPerWorker: Number(process.env.SOLVER_WORKER_MAX_JOBS) || 200,
+  maxRssMb: Number(process.env.SOLVER_WORKER_MAX_RSS_MB) || 1024,
+  maxSessionsPerWorker: Number(process.env.SOLVER_WORKER_MAX_SESSIONS) || 8,
+  // Admission control: requests beyond the workers wait in a bounded
+  // priority queue, and every request has a hard deadline.
+  maxQueued: Number(process.env.SOLVER_MAX_QUEUED) || 1000,
+  timeoutMs: solverTimeoutMs,
+  killGraceMs: Number(process.env.SOLVER_KILL_GRACE_MS) || 2000,
+  // Per-request solverOptions.timeLimitMs is capped so a solve ends well
+  // before its deadline, leaving time to build the model and extract the plan.
+  solverLimits: {
+    maxTimeLimitMs: Number(process.env.SOLVER_MAX_TIME_LIMIT_MS)
+      || Math.max(1000, solverTimeoutMs - 10000),
+    minRelativeGap: Number(process.env.SOLVER_MIN_RELATIVE_GAP) || null,
+    minAbsoluteGapUSD: Number(process.env.SOLVER_MIN_ABSOLUTE_GAP_USD) || null,
+  },
+  // Opt-in journal of solved requests for replaying them (audit_journal.py).
+  audit: {
+    directory: process.env.AUDIT_JOURNAL_DIR || null,
+    sampleRate: process.env.AUDIT_JOURNAL_SAMPLE_RATE,
+    maxMb: process.env.AUDIT_JOURNAL_MAX_MB,
+    maxAgeSeconds: process.env.AUDIT_JOURNAL_MAX_AGE_SECONDS,
+    maxFiles: process.env.AUDIT_JOURNAL_MAX_FILES,
+  },
+}).start();
+
+// Interactive requests are dispatched before batches and sweeps.
+const INTERACTIVE_PRIORITY = 1;
+const BULK_PRIORITY = 0;
 
-  // console.log(req.body);
-  const data = JSON.stringify(req.body, 2);
-  
-  const python = spawn('python', ['model_tank_index.py']);
+// Aborts when the client goes away before its response is complete, so the
+// solver pool stops the solve.
+function disconnectSignal(res) {
+  const controller = new AbortController();
+  res.on('close', () => {
+    if (!res.writableFinished) {
+      controller.abort();
+    }
+  });
+  return controller.signal;
+}
 
-  let output = '';
-  let errorOutput = '';  
+// Solved scenarios keyed by a canonical hash of the request. The disk tier is
+// enabled by pointing RESULT_CACHE_DIR at a writable directory.
+const resultCache = new ResultCache({
+  maxEntries: Number(process.env.RESULT_CACHE_MAX_ENTRIES) || 256,
+  directory: process.env.RESULT_CACHE_DIR || null,
+  maxDiskBytes: (Number(process.env.RESULT_CACHE_MAX_DISK_MB) || 256) * 1024 * 1024,
+});
+const resultCacheSalt = solverSourceSalt();
 
-  // Collect data from Python script
-  python.stdout.on('data', (data) => {
-    output += data.toString();
+function writeErrorLog(code, errorOutput, data) {
+  // Create logs folder
+  const logsFolder = path.join(__dirname, 'logs');
+  if (!fs.existsSync(logsFolder)) {
+    fs.mkdirSync(logsFolder);
+  }
+
+  // Generate filename with current datetime
+  const timestamp = new Date().toISOString().replace(/:/g, '-');
+  let logFilename = `log-${timestamp}.log`;
+  let logFilePath = path.join(logsFolder, logFilename);
+
+  // Check if file already exists, and add random suffix if needed
+  while (fs.existsSync(logFilePath)) {
+    const randomSuffix = crypto.randomBytes(4).toString('hex');
+    logFilename = `log-${timestamp}-${randomSuffix}.log`;
+    logFilePath = path.join(logsFolder, logFilename);
+  }
+
+  // Write error output to the log file
+  fs.writeFileSync(logFilePath, `Error code: ${code}\nError output:\n${errorOutput}\nData:\n${data}`);
+  console.log(logFilePath);
+  return logFilename;
+}
+
+// Map a solver pool response to HTTP: 200 (or `successStatus`), 400 for
+// validation errors, 404 for unknown sessions, 429 when the solver queue is
+// full, 503 when the deadline passed and 500 for solver failures. JSON bodies
+// are compressed with Brotli or gzip when the client accepts it.
+const ERROR_STATUSES = { session_not_found: 404, queue_full: 429, deadline_exceeded: 503 };
+
+function sendSolverResponse(res, { code, result, errorOutput }, requestBody, successStatus = 200) {
+  if (code === 0) {
+    return sendJson(res, successStatus, result);
+  } else if (code === 2) {
+    const status = (result && ERROR_STATUSES[result.error]) || 400;
+    if (result && result.retryAfterSeconds) {
+      res.set('Retry-After', String(result.retryAfterSeconds));
+    }
+    return sendJson(res, status, result || {
+      error: 'validation_error',
+      message: (errorOutput || '').trim() || 'Invalid optimization request',
+    });
+  } else {
+    console.error(`Python solver exited with code ${code}`);
+    console.error(`Error output: ${errorOutput}`);
+    const logFilename = writeErrorLog(code, errorOutput, JSON.stringify(requestBody, 2));
+    // Respond to the client with an error message
+    res.status(500).send(`An error occurred. Details logged in ${logFilename}`);
+  }
+}
+
+// Record a fresh solver pool response in the metrics and pass it on.
+function observed(response) {
+  metrics.observeSolve(response);
+  return response;
+}
+
+// Solve through the result cache. The solve is cancelled once every client
+// waiting for it has aborted its `signal`. `onProgress` only sees the events
+// of a solve this call starts; a request sharing an identical in-flight solve
+// gets its result alone.
+function solveCached(
+  payload,
+  {
+    resultFormat = 'nested',
+    requestId = null,
+    signal = null,
+    priority = INTERACTIVE_PRIORITY,
+    onProgress = null,
+  } = {}
+) {
+  // Nested results keep the original key so existing cache entries stay valid.
+  const salt = resultFormat === 'nested' ? resultCacheSalt : `${resultCacheSalt}:${resultFormat}`;
+  return resultCache.getOrCompute(
+    canonicalScenarioKey(payload, salt),
+    async (solveSignal) => observed(await solverPool.submit(payload, {
+      resultFormat,
+      requestId,
+      signal: solveSignal,
+      priority,
+      onProgress,
+    })),
+    (response) => response.code === 0 && !response.result.cancelled,
+    signal
+  );
+}
+
+// `?format=columnar` opts into the compact result format (see
+// result_format.py); the nested format stays the default.
+function resultFormatError(req) {
+  const format = req.query.format;
+  if (format === undefined || RESULT_FORMATS.includes(format)) {
+    return null;
+  }
+  return `format must be one of ${RESULT_FORMATS.join(', ')}`;
+}
+
+// Define a POST route to receive the data
+app.post('/submit', async (req, res) => {
+  const formatError = resultFormatError(req);
+  if (formatError) {
+    res.status(400).json({ error: 'validation_error', message: formatError });
+    return;
+  }
+  const { cacheStatus, value } = await solveCached(req.body, {
+    resultFormat: req.query.format,
+    requestId: req.id,
+    signal: disconnectSignal(res),
   });
 
-  python.stderr.on('data', (data) => {
-    errorOutput += data.toString();
+  res.set('X-Result-Cache', cacheStatus);
+  const result = value.code === 0 ? { ...value.result, resultCache: cacheStatus } : value.result;
+  await sendSolverResponse(res, { ...value, result }, req.body);
+});
+
+// Streaming solves: progress arrives as Server-Sent Events over the POST
+// response. Events are `accepted` (with the `streamId`), `validated`, `model`,
+// `incumbent` (cpsat backend only) and finally `result` or `error`. POST
+// /submit-stream/:streamId/stop ends the search early; the `result` event then
+// carries the best plan found so far. Closing the connection cancels the solve.
+// Streams go through the result cache like /submit, so identical concurrent
+// requests share one solve; stopping a shared solve waits for its other
+// requests to leave.
+const activeStreams = new Map();
+
+app.post('/submit-stream', async (req, res) => {
+  const streamId = crypto.randomUUID();
+  const controller = new AbortController();
+  res.status(200);
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    Connection: 'keep-alive',
+  });
+  res.flushHeaders();
+  const send = (event, data) => {
+    if (!res.destroyed) {
+      res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+    }
+  };
+  let finished = false;
+  res.on('close', () => {
+    if (!finished) {
+      controller.abort();
+    }
   });
+  send('accepted', { streamId });
+
+  activeStreams.set(streamId, controller);
+  try {
+    const { cacheStatus, value } = await solveCached(req.body, {
+      requestId: req.id,
+      signal: controller.signal,
+      onProgress: (progress) => send(progress.event, progress),
+    });
+    finished = true;
 
-  python.on('close', (code) => {
+    const { code, result, errorOutput } = value;
     if (code === 0) {
-      // Send the Python script's output back to the client
-      //console.log(output);
-      res.type('application/json').send(output);
+      send('result', { ...result, resultCache: cacheStatus });
     } else if (code === 2) {
-      let validationResponse;
-      try {
-        validationResponse = JSON.parse(output);
-      } catch {
-        validationResponse = {
-          error: 'validation_error',
-          message: output.trim() || errorOutput.trim() || 'Invalid optimization request',
-        };
-      }
-      res.status(400).json(validationResponse);
+      send('error', result);
     } else {
-      console.error(`Python script exited with code ${code}`);
-      console.error(`Error output: ${errorOutput}`);
+      console.error(`Python solver exited with code ${code}`);
+      const logFilename = writeErrorLog(code, errorOutput, JSON.stringify(req.body, 2));
+      send('error', { error: 'solver_error', message: `An error occurred. Details logged in ${logFilename}` });
+    }
+  } catch (error) {
+    // The 200 status has already been sent with the `accepted` event, so the
+    // failure is reported as the stream's final event.
+    finished = true;
+    console.error(`Streaming solve failed: ${error.stack || error}`);
+    send('error', { error: 'solver_error', status: 500, message: 'An error occurred while solving' });
+  } finally {
+    activeStreams.delete(streamId);
+  }
+  res.end();
+});
 
-      // Create logs folder
-      const logsFolder = path.join(__dirname, 'logs');
-      if (!fs.existsSync(logsFolder)) {
-        fs.mkdirSync(logsFolder);
-      }
+app.post('/submit-stream/:streamId/stop', (req, res) => {
+  const controller = activeStreams.get(req.params.streamId);
+  if (!controller) {
+    res.status(404).json({ error: 'stream_not_found', message: `Unknown stream ${req.params.streamId}` });
+    return;
+  }
+  controller.abort();
+  res.status(202).json({ streamId: req.params.streamId, stopping: true });
+});
 
-      // Generate filename with current datetime
-      const timestamp = new Date().toISOString().replace(/:/g, '-');
-      let logFilename = `log-${timestamp}.log`;
-      let logFilePath = path.join(logsFolder, logFilename);
+// Solve many scenarios in parallel and stream one NDJSON line per scenario as
+// it finishes (see batch.js).
+app.post('/submit-batch', async (req, res) => {
+  const error = batchError(req.body, maxBatchScenarios) || resultFormatError(req);
+  if (error) {
+    res.status(400).json({ error: 'validation_error', message: error });
+    return;
+  }
 
-      // Check if file already exists, and add random suffix if needed
-      while (fs.existsSync(logFilePath)) {
-        const randomSuffix = crypto.randomBytes(4).toString('hex');
-        logFilename = `log-${timestamp}-${randomSuffix}.log`;
-        logFilePath = path.join(logsFolder, logFilename);
+  res.status(200);
+  res.set('Content-Type', 'application/x-ndjson');
+  res.flushHeaders();
+  const signal = disconnectSignal(res);
+
+  await streamBatch(
+    req.body,
+    async (payload, index) => {
+      const { cacheStatus, value } = await solveCached(payload, {
+        resultFormat: req.query.format,
+        requestId: `${req.id}:${index}`,
+        signal,
+        priority: BULK_PRIORITY,
+      });
+      const { code, result, errorOutput } = value;
+      if (code === 0) {
+        return { status: 'ok', resultCache: cacheStatus, result };
+      }
+      if (code === 2 && result && ERROR_STATUSES[result.error] >= 429) {
+        return { status: 'unavailable', result };
+      }
+      if (code === 2) {
+        return {
+          status: 'validation_error',
+          result: result || {
+            error: 'validation_error',
+            message: (errorOutput || '').trim() || 'Invalid optimization request',
+          },
+        };
       }
+      console.error(`Python solver exited with code ${code}`);
+      const logFilename = writeErrorLog(code, errorOutput, JSON.stringify(payload, 2));
+      return { status: 'error', message: `An error occurred. Details logged in ${logFilename}` };
+    },
+    (line) => res.write(line),
+    () => signal.aborted
+  );
+  res.end();
+});
 
-      // Write error output to the log file
-      fs.writeFileSync(logFilePath, `Error code: ${code}\nError output:\n${errorOutput}\nData:\n${data}`);
-      console.log(logFilePath);
-      // Respond to the client with an error message
-      res.status(500).send(`An error occurred. Details logged in ${logFilename}`);
-    }
+// Sweep financial parameters over a grid on one built model (see sweep.py).
+// Sweeps are not cached. A sweep that reaches the job deadline returns the
+// points it finished, flagged `cancelled` and `deadlineExceeded`.
+app.post('/sweep', async (req, res) => {
+  const response = await solverPool.submitSweep(req.body, {
+    signal: disconnectSignal(res),
+    priority: BULK_PRIORITY,
   });
+  await sendSolverResponse(res, observed(response), req.body);
+});
+
+// What-if sessions: POST a full scenario to open one, PATCH partial changes
+// to re-solve it in the same worker, DELETE it when the analyst is done.
+// Session results are not cached; the worker already keeps the model.
+// Session jobs are interactive, have the job deadline and are cancelled when
+// the client goes away; a cancelled solve leaves the session open.
+function sessionJobOptions(res) {
+  return { signal: disconnectSignal(res), priority: INTERACTIVE_PRIORITY };
+}
+
+app.post('/sessions', async (req, res) => {
+  const response = await solverPool.openSession(req.body, sessionJobOptions(res));
+  await sendSolverResponse(res, observed(response), req.body, 201);
+});
+
+app.patch('/sessions/:sessionId', async (req, res) => {
+  await sendSolverResponse(
+    res,
+    observed(await solverPool.updateSession(req.params.sessionId, req.body, sessionJobOptions(res))),
+    req.body
+  );
+});
 
-  // Send the JSON data to the Python script via stdin
-  python.stdin.write(data);
-  python.stdin.end();
+app.delete('/sessions/:sessionId', async (req, res) => {
+  const response = await solverPool.closeSession(req.params.sessionId, sessionJobOptions(res));
+  await sendSolverResponse(res, response, null);
 });
 
 // Start the server
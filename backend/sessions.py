@@ -0,0 +1,105 @@
+import copy
+import time
+import uuid
+from collections import OrderedDict
+
+from model_tank_index import build_model, retarget_model, solve_model
+
+# What-if sessions keep a built model in the worker process between requests.
+# A session is opened with a full model_tank_index payload; each update is a
+# partial payload merged into it, e.g. {"discountRateAnnual": 0.08} or
+# {"Demand": {"Ammonia": {"2030": 1200}}}. Updates that only move objective
+# coefficients or demand bounds re-solve the existing model from the previous
+# plan; any other update rebuilds it.
+
+
+class SessionNotFoundError(LookupError):
+    """The session id is unknown, closed or evicted."""
+
+
+def merge_changes(data, changes):
+    """Return a copy of `data` with `changes` merged in. Nested mappings are
+    merged key by key; every other value replaces the previous one."""
+    if not isinstance(changes, dict):
+        raise ValueError('Session changes must be an object')
+    merged = copy.deepcopy(data)
+    for field, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(field), dict):
+            merged[field] = merge_changes(merged[field], value)
+        else:
+            merged[field] = copy.deepcopy(value)
+    return merged
+
+
+def build_session_model(data):
+    # Demand rows are looked up by name when the session is updated.
+    model = build_model(data, keep_names=True)
+    if model['solverOptions']['decomposeByFuel']:
+        raise ValueError('Sessions do not support solverOptions.decomposeByFuel')
+    return model
+
+
+class SolveSession:
+    def __init__(self, session_id, data):
+        self.session_id = session_id
+        self.data = data
+        self.model = None
+        self.solves = 0
+
+    def solve(self, data, control=None):
+        started = time.perf_counter()
+        if self.model is None:
+            update = 'built'
+            self.model = build_session_model(data)
+        elif retarget_model(self.model, self.data, data):
+            update = 'inPlace'
+        else:
+            update = 'rebuilt'
+            self.model = build_session_model(data)
+        prepare_seconds = time.perf_counter() - started
+        previous_plan = self.model.get('plan') if update == 'inPlace' else None
+        result = solve_model(self.model, data, previous_plan=previous_plan, control=control)
+        self.data = data
+        self.solves += 1
+        result['session'] = {
+            'id': self.session_id,
+            'update': update,
+            'prepareSeconds': prepare_seconds,
+            'solves': self.solves,
+        }
+        return result
+
+
+class SessionStore:
+    """Open sessions of one worker, least recently used evicted first."""
+
+    def __init__(self, max_sessions=8):
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def open(self, data, control=None):
+        session = SolveSession(uuid.uuid4().hex, data)
+        result = session.solve(data, control)
+        self.sessions[session.session_id] = session
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return result
+
+    def update(self, session_id, changes, control=None):
+        session = self._session(session_id)
+        self.sessions.move_to_end(session_id)
+        return session.solve(merge_changes(session.data, changes), control)
+
+    def close(self, session_id):
+        self._session(session_id)
+        del self.sessions[session_id]
+        return {'session': {'id': session_id, 'closed': True}}
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f'Unknown session {session_id}')
+        return session
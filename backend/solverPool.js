@@ -0,0 +1,515 @@
+// solverPool.js
+const { spawn } = require('child_process');
+const os = require('os');
+const path = require('path');
+
+const WORKER_SCRIPT = path.join(__dirname, 'solver_worker.py');
+const STARTUP_RETRY_DELAY_MS = 1000;
+// Weight of the latest job in the running average of service time used for
+// Retry-After.
+const SERVICE_TIME_SMOOTHING = 0.2;
+const SOLVER_LIMIT_FLAGS = [
+  ['maxTimeLimitMs', '--max-time-limit-ms'],
+  ['minRelativeGap', '--min-relative-gap'],
+  ['minAbsoluteGapUSD', '--min-absolute-gap-usd'],
+];
+const AUDIT_FLAGS = [
+  ['sampleRate', '--audit-sample-rate'],
+  ['maxMb', '--audit-max-mb'],
+  ['maxAgeSeconds', '--audit-max-age-seconds'],
+  ['maxFiles', '--audit-max-files'],
+];
+
+// A fixed-size pool of long-lived `solver_worker.py` processes. Each worker
+// has model_tank_index and OR-Tools imported once and then serves requests as
+// newline-delimited JSON frames, so a request only pays for its own solve.
+// Workers retire themselves after `maxJobsPerWorker` requests or once their
+// peak resident memory reaches `maxRssMb`; the pool replaces them on exit.
+//
+// What-if sessions (see sessions.py) keep their model inside one worker, so
+// every request for a session is dispatched to the worker that opened it. A
+// session whose worker has exited resolves as `session_not_found`.
+//
+// Responses carry `queueWaitSeconds`, the time the request waited for a
+// free worker; solve results also get it, and the worker's serialization
+// time, in `result.timings`.
+//
+// `submit(payload, { onProgress, signal })` streams the worker's progress
+// events to `onProgress`. Aborting `signal` drops a queued request or asks the
+// worker to stop a running solve, which then resolves with the best plan
+// found so far and `cancelled: true`. `resultFormat: 'columnar'` returns the
+// result in the compact format of result_format.py.
+//
+// Admission control: at most `size` jobs run at once, and at most `maxQueued`
+// wait. Waiting jobs are ordered by `priority` (higher first), FIFO within a
+// priority. When the queue is full a higher-priority job displaces the newest
+// lowest-priority one; otherwise the new job resolves as `queue_full`. A job
+// still unfinished `timeoutMs` after it was submitted resolves as
+// `deadline_exceeded` if it is still queued; if it is running, the worker is
+// asked to stop and answers with its best plan. Cancelled and expired jobs
+// whose worker has not answered within `killGraceMs` get the worker killed;
+// the pool starts a replacement.
+//
+// `solverLimits: { maxTimeLimitMs, minRelativeGap, minAbsoluteGapUSD }` is
+// the policy workers clamp each request's solverOptions.timeLimitMs,
+// relativeGap and absoluteGapUSD to.
+//
+// `audit: { directory, sampleRate, maxMb, maxAgeSeconds, maxFiles }` makes
+// every worker journal its payload requests (see audit_journal.py) under the
+// `requestId` passed to `submit`.
+class SolverPool {
+  constructor({
+    size = os.cpus().length,
+    maxJobsPerWorker = null,
+    maxRssMb = null,
+    maxSessionsPerWorker = null,
+    audit = null,
+    solverLimits = null,
+    maxQueued = Infinity,
+    timeoutMs = null,
+    killGraceMs = 2000,
+    pythonExecutable = process.env.PYTHON || 'python',
+    scriptPath = WORKER_SCRIPT,
+  } = {}) {
+    this.size = Math.max(1, size);
+    this.maxJobsPerWorker = maxJobsPerWorker;
+    this.maxRssMb = maxRssMb;
+    this.maxSessionsPerWorker = maxSessionsPerWorker;
+    this.audit = audit;
+    this.solverLimits = solverLimits;
+    this.maxQueued = maxQueued;
+    this.timeoutMs = timeoutMs;
+    this.killGraceMs = killGraceMs;
+    this.serviceSeconds = null;
+    this.pythonExecutable = pythonExecutable;
+    this.scriptPath = scriptPath;
+    this.workers = new Set();
+    this.queue = [];
+    this.sessionWorkers = new Map();
+    this.nextJobId = 1;
+    this.closed = false;
+  }
+
+  start() {
+    while (this.workers.size < this.size) {
+      this.spawnWorker();
+    }
+    return this;
+  }
+
+  // Resolves with `{ code, result, errorOutput }`, where `code` follows the
+  // exit-code contract of `python model_tank_index.py`.
+  submit(
+    payload,
+    {
+      onProgress = null,
+      signal = null,
+      resultFormat = 'nested',
+      requestId = null,
+      priority = 0,
+      timeoutMs = this.timeoutMs,
+    } = {}
+  ) {
+    const frame = onProgress ? { payload, progress: true } : { payload };
+    if (resultFormat !== 'nested') {
+      frame.resultFormat = resultFormat;
+    }
+    if (requestId) {
+      frame.requestId = requestId;
+    }
+    return this.enqueue(frame, null, { onProgress, signal, priority, timeoutMs });
+  }
+
+  submitSweep(request, { signal = null, priority = 0, timeoutMs = this.timeoutMs } = {}) {
+    return this.enqueue({ sweep: request }, null, { signal, priority, timeoutMs });
+  }
+
+  // Session jobs take the same `{ signal, priority, timeoutMs }` options as
+  // submit(); a cancelled session solve keeps the session open.
+  openSession(payload, options = {}) {
+    return this.enqueue({ session: { action: 'open', payload } }, null, this.jobOptions(options));
+  }
+
+  updateSession(sessionId, changes, options = {}) {
+    return this.enqueueForSession(
+      sessionId,
+      { action: 'update', sessionId, changes },
+      options
+    );
+  }
+
+  closeSession(sessionId, options = {}) {
+    return this.enqueueForSession(sessionId, { action: 'close', sessionId }, options);
+  }
+
+  jobOptions({ signal = null, priority = 0, timeoutMs = this.timeoutMs } = {}) {
+    return { signal, priority, timeoutMs };
+  }
+
+  enqueue(
+    frame,
+    worker = null,
+    { onProgress = null, signal = null, priority = 0, timeoutMs = null } = {}
+  ) {
+    if (this.closed) {
+      return Promise.reject(new Error('Solver pool is closed'));
+    }
+    return new Promise((resolve) => {
+      const job = {
+        id: this.nextJobId++,
+        frame,
+        worker,
+        resolve,
+        onProgress,
+        priority,
+        enqueuedAt: process.hrtime.bigint(),
+        settled: false,
+        timers: [],
+      };
+      if (signal) {
+        if (signal.aborted) {
+          this.settle(job, cancelledBeforeDispatch());
+          return;
+        }
+        signal.addEventListener('abort', () => this.cancel(job), { once: true });
+      }
+      if (!this.admit(job)) {
+        this.settle(job, queueFull(this.retryAfterSeconds()));
+        return;
+      }
+      if (timeoutMs) {
+        job.timers.push(setTimeout(() => this.expire(job), timeoutMs));
+      }
+      this.dispatch();
+    });
+  }
+
+  // Insert `job` into the queue by priority, displacing the newest job of the
+  // lowest priority when the queue is full. Returns false if it has no room.
+  admit(job) {
+    if (this.queue.length >= this.maxQueued) {
+      let displaced = -1;
+      this.queue.forEach((queued, index) => {
+        if (queued.priority < job.priority
+          && (displaced === -1 || queued.priority <= this.queue[displaced].priority)) {
+          displaced = index;
+        }
+      });
+      if (displaced === -1) {
+        return false;
+      }
+      const [queued] = this.queue.splice(displaced, 1);
+      this.settle(queued, queueFull(this.retryAfterSeconds()));
+    }
+    const index = this.queue.findIndex((queued) => queued.priority < job.priority);
+    this.queue.splice(index === -1 ? this.queue.length : index, 0, job);
+    return true;
+  }
+
+  // A rough wait for a job submitted now: the queue ahead of it divided over
+  // the workers, at the average service time.
+  retryAfterSeconds() {
+    const rounds = Math.ceil((this.queue.length + 1) / this.size);
+    return Math.max(1, Math.ceil(rounds * (this.serviceSeconds || 1)));
+  }
+
+  cancel(job) {
+    const index = this.queue.indexOf(job);
+    if (index !== -1) {
+      this.queue.splice(index, 1);
+      this.settle(job, cancelledBeforeDispatch());
+      return;
+    }
+    this.stop(job);
+  }
+
+  expire(job) {
+    const index = this.queue.indexOf(job);
+    if (index !== -1) {
+      this.queue.splice(index, 1);
+      this.settle(job, deadlineExceeded(this.retryAfterSeconds()));
+      return;
+    }
+    job.deadlineExceeded = true;
+    this.stop(job);
+  }
+
+  // Ask the worker running `job` to stop; kill it if it does not answer.
+  stop(job) {
+    for (const worker of this.workers) {
+      if (worker.job === job) {
+        worker.child.stdin.write(`${JSON.stringify({ cancel: job.id })}\n`);
+        job.timers.push(setTimeout(() => {
+          if (worker.job === job) {
+            job.killed = true;
+            worker.child.kill('SIGKILL');
+          }
+        }, this.killGraceMs));
+        return;
+      }
+    }
+  }
+
+  settle(job, response) {
+    if (job.settled) {
+      return;
+    }
+    job.settled = true;
+    for (const timer of job.timers) {
+      clearTimeout(timer);
+    }
+    if (response.queueWaitSeconds === undefined) {
+      response.queueWaitSeconds = job.queueWaitSeconds !== undefined
+        ? job.queueWaitSeconds
+        : Number(process.hrtime.bigint() - job.enqueuedAt) / 1e9;
+    }
+    job.resolve(response);
+  }
+
+  enqueueForSession(sessionId, session, options = {}) {
+    const worker = this.sessionWorkers.get(sessionId);
+    if (!worker) {
+      return Promise.resolve(sessionNotFound(sessionId));
+    }
+    return this.enqueue({ session }, worker, this.jobOptions(options));
+  }
+
+  close() {
+    this.closed = true;
+    for (const worker of this.workers) {
+      worker.child.kill();
+    }
+    for (const job of this.queue.splice(0)) {
+      this.settle(job, { code: 1, errorOutput: 'Solver pool closed before dispatch' });
+    }
+  }
+
+  spawnWorker() {
+    const args = [this.scriptPath];
+    if (this.maxJobsPerWorker) {
+      args.push('--max-jobs', String(this.maxJobsPerWorker));
+    }
+    if (this.maxRssMb) {
+      args.push('--max-rss-mb', String(this.maxRssMb));
+    }
+    if (this.maxSessionsPerWorker) {
+      args.push('--max-sessions', String(this.maxSessionsPerWorker));
+    }
+    for (const [option, flag] of SOLVER_LIMIT_FLAGS) {
+      if (this.solverLimits && this.solverLimits[option]) {
+        args.push(flag, String(this.solverLimits[option]));
+      }
+    }
+    if (this.audit && this.audit.directory) {
+      args.push('--audit-dir', this.audit.directory);
+      for (const [option, flag] of AUDIT_FLAGS) {
+        if (this.audit[option] !== undefined && this.audit[option] !== null) {
+          args.push(flag, String(this.audit[option]));
+        }
+      }
+    }
+    const child = spawn(this.pythonExecutable, args, {
+      cwd: path.dirname(this.scriptPath),
+    });
+    const worker = { child, ready: false, job: null, stdout: '', stderr: '' };
+    this.workers.add(worker);
+
+    child.stdout.on('data', (chunk) => {
+      worker.stdout += chunk.toString();
+      let newline = worker.stdout.indexOf('\n');
+      while (newline !== -1) {
+        const line = worker.stdout.slice(0, newline);
+        worker.stdout = worker.stdout.slice(newline + 1);
+        if (line.trim()) {
+          this.handleFrame(worker, line);
+        }
+        newline = worker.stdout.indexOf('\n');
+      }
+    });
+
+    child.stderr.on('data', (chunk) => {
+      worker.stderr += chunk.toString();
+    });
+
+    child.on('error', (error) => {
+      worker.stderr += `${error.message}\n`;
+    });
+
+    child.on('close', (code) => {
+      this.workers.delete(worker);
+      for (const [sessionId, sessionWorker] of this.sessionWorkers) {
+        if (sessionWorker === worker) {
+          this.sessionWorkers.delete(sessionId);
+        }
+      }
+      this.queue = this.queue.filter((job) => {
+        if (job.worker !== worker) {
+          return true;
+        }
+        this.settle(job, sessionNotFound(job.frame.session.sessionId));
+        return false;
+      });
+      if (worker.job) {
+        const job = worker.job;
+        if (job.killed && job.deadlineExceeded) {
+          this.settle(job, deadlineExceeded(this.retryAfterSeconds()));
+        } else if (job.killed) {
+          this.settle(job, {
+            code: 2,
+            result: { error: 'cancelled', message: 'The solver did not stop in time and was killed' },
+          });
+        } else {
+          this.settle(job, {
+            code: code === 0 || code === null ? 1 : code,
+            errorOutput: worker.stderr || `Solver worker exited with code ${code}`,
+          });
+        }
+        worker.job = null;
+      }
+      if (this.closed) {
+        return;
+      }
+      if (!worker.ready && !worker.retired) {
+        // The worker died during startup (missing Python or OR-Tools). Fail
+        // queued requests instead of waiting forever, and back off before
+        // retrying so a broken environment does not spin.
+        for (const job of this.queue.splice(0)) {
+          this.settle(job, { code: 1, errorOutput: worker.stderr });
+        }
+        setTimeout(() => {
+          if (!this.closed) {
+            this.spawnWorker();
+          }
+        }, STARTUP_RETRY_DELAY_MS).unref();
+        return;
+      }
+      this.spawnWorker();
+    });
+  }
+
+  handleFrame(worker, line) {
+    let frame;
+    try {
+      frame = JSON.parse(line);
+    } catch {
+      worker.stderr += `Unparseable worker frame: ${line}\n`;
+      return;
+    }
+    if (frame.ready) {
+      worker.ready = true;
+      this.dispatch();
+      return;
+    }
+    const job = worker.job;
+    if (frame.progress) {
+      if (job && frame.id === job.id && job.onProgress) {
+        job.onProgress(frame.progress);
+      }
+      return;
+    }
+    worker.job = null;
+    if (job && frame.id === job.id) {
+      this.trackSession(worker, job, frame);
+      if (frame.result && frame.result.timings) {
+        // The worker times serialization after the result is encoded, so it
+        // travels next to the result.
+        frame.result.timings.serializeSeconds = frame.serializeSeconds;
+        frame.result.timings.queueWaitSeconds = job.queueWaitSeconds;
+      }
+      if (job.deadlineExceeded && frame.result) {
+        frame.result.deadlineExceeded = true;
+      }
+      const serviceSeconds = Number(process.hrtime.bigint() - job.dispatchedAt) / 1e9;
+      this.serviceSeconds = this.serviceSeconds === null
+        ? serviceSeconds
+        : this.serviceSeconds + SERVICE_TIME_SMOOTHING * (serviceSeconds - this.serviceSeconds);
+      this.settle(job, {
+        code: frame.code,
+        result: frame.result,
+        errorOutput: frame.errorOutput || worker.stderr,
+        queueWaitSeconds: job.queueWaitSeconds,
+      });
+    }
+    if (frame.retiring) {
+      // The worker exits on its own; `close` spawns the replacement.
+      worker.ready = false;
+      worker.retired = true;
+      return;
+    }
+    this.dispatch();
+  }
+
+  trackSession(worker, job, frame) {
+    const session = job.frame.session;
+    if (!session) {
+      return;
+    }
+    if (session.action === 'open' && frame.code === 0) {
+      this.sessionWorkers.set(frame.result.session.id, worker);
+    } else if (
+      session.action === 'close'
+      || (frame.result && frame.result.error === 'session_not_found')
+    ) {
+      this.sessionWorkers.delete(session.sessionId);
+    }
+  }
+
+  dispatch() {
+    for (const worker of this.workers) {
+      if (this.queue.length === 0) {
+        return;
+      }
+      if (!worker.ready || worker.job) {
+        continue;
+      }
+      const index = this.queue.findIndex((job) => !job.worker || job.worker === worker);
+      if (index === -1) {
+        continue;
+      }
+      const [job] = this.queue.splice(index, 1);
+      job.dispatchedAt = process.hrtime.bigint();
+      job.queueWaitSeconds = Number(job.dispatchedAt - job.enqueuedAt) / 1e9;
+      worker.job = job;
+      worker.stderr = '';
+      worker.child.stdin.write(`${JSON.stringify({ id: job.id, ...job.frame })}\n`);
+    }
+  }
+}
+
+function cancelledBeforeDispatch() {
+  return {
+    code: 2,
+    result: { error: 'cancelled', message: 'Cancelled before the solve started' },
+  };
+}
+
+function queueFull(retryAfterSeconds) {
+  return {
+    code: 2,
+    result: {
+      error: 'queue_full',
+      message: 'The solver queue is full',
+      retryAfterSeconds,
+    },
+  };
+}
+
+function deadlineExceeded(retryAfterSeconds) {
+  return {
+    code: 2,
+    result: {
+      error: 'deadline_exceeded',
+      message: 'The request did not finish before its deadline',
+      retryAfterSeconds,
+    },
+  };
+}
+
+function sessionNotFound(sessionId) {
+  return {
+    code: 2,
+    result: { error: 'session_not_found', message: `Unknown session ${sessionId}` },
+  };
+}
+
+module.exports = { SolverPool };
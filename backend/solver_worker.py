@@ -0,0 +1,355 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource is unavailable on Windows
+    resource = None
+
+from audit_journal import AuditJournal
+from model_tank_index import (
+    SOLVER_LIMIT_POLICY,
+    VALIDATION_ERRORS,
+    SolveControl,
+    solve_facility_location,
+)
+from result_format import check_result_format, format_result
+from sessions import SessionNotFoundError, SessionStore
+from sweep import run_sweep
+
+# A worker is a long-lived process that has already paid interpreter startup
+# and the OR-Tools import. It reads one JSON frame per line from stdin and
+# writes exactly one JSON frame per line to stdout:
+#
+#   request:  {"id": 7, "payload": {...model_tank_index input...}}
+#   response: {"id": 7, "code": 0, "result": {...}}
+#             {"id": 7, "code": 2, "result": {"error": "validation_error", ...}}
+#             {"id": 7, "code": 1, "errorOutput": "Traceback ..."}
+#
+# What-if sessions keep their model in this process (see sessions.py):
+#
+#   request:  {"id": 8, "session": {"action": "open", "payload": {...}}}
+#             {"id": 9, "session": {"action": "update", "sessionId": "...",
+#                                   "changes": {...}}}
+#             {"id": 10, "session": {"action": "close", "sessionId": "..."}}
+#   response: as above; an unknown session is code 2 with
+#             {"error": "session_not_found", ...}
+#
+# Parametric sweeps (see sweep.py) run in one worker:
+#
+#   request:  {"id": 11, "sweep": {"payload": {...}, "parameters": [...]}}
+#
+# A payload request with "progress": true also gets progress frames before
+# its response, and a running or queued payload request can be stopped; it
+# then responds with the best plan found so far and "cancelled": true:
+#
+#   request:  {"id": 12, "payload": {...}, "progress": true}
+#             {"cancel": 12}
+#   response: {"id": 12, "progress": {"event": "incumbent", ...}}
+#
+# Session open and update frames are stopped the same way; the session stays
+# open with the model of the cancelled solve.
+# A cancelled sweep returns the points it finished.
+#
+# A payload request with "resultFormat": "columnar" gets its result in the
+# compact format of result_format.py.
+#
+# With --audit-dir, payload requests and their responses are written to an
+# audit journal (see audit_journal.py) under the frame's "requestId", or
+# "<pid>-<id>" when it has none.
+#
+# Solve results carry per-phase wall-clock seconds in result.timings; the
+# worker adds the time it spent parsing the request frame, and each response
+# frame ends with "serializeSeconds", the time spent encoding it.
+#
+# The exit codes mirror the one-shot `python model_tank_index.py` contract so
+# server.js can handle both paths identically. Nothing else may be written to
+# stdout; diagnostics go to stderr.
+
+
+def _resident_set_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def handle_payload(payload, solve=solve_facility_location):
+    try:
+        return {'code': 0, 'result': solve(payload)}
+    except VALIDATION_ERRORS as error:
+        return {
+            'code': 2,
+            'result': {'error': 'validation_error', 'message': str(error)},
+        }
+    except Exception:
+        return {'code': 1, 'errorOutput': traceback.format_exc()}
+
+
+def handle_session(sessions, request, control=None):
+    try:
+        action = request['action']
+        if action == 'open':
+            result = sessions.open(request['payload'], control)
+        elif action == 'update':
+            result = sessions.update(request['sessionId'], request['changes'], control)
+        elif action == 'close':
+            result = sessions.close(request['sessionId'])
+        else:
+            raise ValueError(f'Unknown session action {action}')
+        return {'code': 0, 'result': result}
+    except SessionNotFoundError as error:
+        return {
+            'code': 2,
+            'result': {'error': 'session_not_found', 'message': str(error)},
+        }
+    except VALIDATION_ERRORS as error:
+        return {
+            'code': 2,
+            'result': {'error': 'validation_error', 'message': str(error)},
+        }
+    except Exception:
+        return {'code': 1, 'errorOutput': traceback.format_exc()}
+
+
+def _write_frame(stream, frame):
+    stream.write(json.dumps(frame))
+    stream.write('\n')
+    stream.flush()
+
+
+def _write_response(stream, response):
+    # A frame cannot contain the time it took to encode itself, so
+    # serializeSeconds is appended to the encoded object.
+    started = time.perf_counter()
+    text = json.dumps(response)
+    serialize_seconds = time.perf_counter() - started
+    stream.write(f'{text[:-1]}, "serializeSeconds": {serialize_seconds!r}}}\n')
+    stream.flush()
+
+
+def _read_frames(input_stream, lines, controls):
+    # Runs on its own thread so that cancel frames reach a solve that is
+    # still running on the main thread.
+    for line in input_stream:
+        if not line.strip():
+            continue
+        try:
+            frame = json.loads(line)
+        except json.JSONDecodeError:
+            frame = None
+        if isinstance(frame, dict):
+            if 'cancel' in frame:
+                control = controls.get(frame['cancel'])
+                if control is not None:
+                    control.cancel()
+                continue
+            controls[frame.get('id')] = SolveControl()
+        lines.put(line)
+    lines.put(None)
+
+
+def serve(
+    input_stream,
+    output_stream,
+    max_jobs=None,
+    max_rss_mb=None,
+    max_sessions=8,
+    journal=None,
+):
+    _write_frame(output_stream, {'ready': True})
+    sessions = SessionStore(max_sessions=max_sessions)
+    lines = queue.Queue()
+    controls = {}
+    threading.Thread(
+        target=_read_frames,
+        args=(input_stream, lines, controls),
+        daemon=True,
+    ).start()
+    completed_jobs = 0
+    while True:
+        line = lines.get()
+        if line is None:
+            break
+        frame_id = None
+        try:
+            started = time.perf_counter()
+            frame = json.loads(line)
+            parse_seconds = time.perf_counter() - started
+            if not isinstance(frame, dict):
+                raise ValueError('A request frame must be a JSON object')
+            frame_id = frame.get('id')
+            control = controls.get(frame_id) or SolveControl()
+            if frame.get('progress'):
+                # Progress is written from the solver's callback while the
+                # main thread waits in Solve, so frames never interleave.
+                control.progress = lambda event: _write_frame(
+                    output_stream,
+                    {'id': frame_id, 'progress': event},
+                )
+            if 'session' in frame:
+                response = handle_session(sessions, frame['session'], control)
+            elif 'sweep' in frame:
+                response = handle_payload(
+                    frame['sweep'],
+                    solve=lambda request: run_sweep(request, control),
+                )
+            else:
+                result_format = check_result_format(frame.get('resultFormat', 'nested'))
+                response = handle_payload(
+                    frame['payload'],
+                    solve=lambda payload: format_result(
+                        solve_facility_location(payload, control=control),
+                        payload,
+                        result_format,
+                    ),
+                )
+            if 'timings' in response.get('result', {}):
+                response['result']['timings']['parseSeconds'] = parse_seconds
+            if journal is not None and 'payload' in frame:
+                # The frame's fields are added to a copy of the response, so
+                # the journal's thread never sees it change.
+                journal.record(
+                    frame.get('requestId', f'{os.getpid()}-{frame_id}'),
+                    frame['payload'],
+                    dict(response),
+                )
+        except VALIDATION_ERRORS as error:
+            response = {
+                'code': 2,
+                'result': {'error': 'validation_error', 'message': str(error)},
+            }
+        controls.pop(frame_id, None)
+        completed_jobs += 1
+
+        resident_set_mb = _resident_set_mb()
+        # The job limit waits until open sessions are closed; the memory
+        # limit does not, and their models are lost with the process.
+        retiring = (
+            (
+                max_jobs is not None
+                and completed_jobs >= max_jobs
+                and not len(sessions)
+            )
+            or (
+                max_rss_mb is not None
+                and resident_set_mb is not None
+                and resident_set_mb >= max_rss_mb
+            )
+        )
+        response['id'] = frame_id
+        response['residentSetMB'] = resident_set_mb
+        if retiring:
+            response['retiring'] = True
+        _write_response(output_stream, response)
+        if retiring:
+            return completed_jobs
+    return completed_jobs
+
+
+def _parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        description='Serve optimization requests over newline-delimited JSON.',
+    )
+    parser.add_argument(
+        '--max-jobs',
+        type=int,
+        default=None,
+        help='exit after this many requests so the pool can recycle the worker',
+    )
+    parser.add_argument(
+        '--max-rss-mb',
+        type=float,
+        default=None,
+        help='exit after a request once peak resident memory reaches this size',
+    )
+    parser.add_argument(
+        '--max-sessions',
+        type=int,
+        default=8,
+        help='open what-if sessions kept before the least recently used is closed',
+    )
+    parser.add_argument(
+        '--max-time-limit-ms',
+        type=float,
+        default=None,
+        help='cut longer solverOptions.timeLimitMs requests to this limit',
+    )
+    parser.add_argument(
+        '--min-relative-gap',
+        type=float,
+        default=None,
+        help='raise smaller solverOptions.relativeGap requests to this gap',
+    )
+    parser.add_argument(
+        '--min-absolute-gap-usd',
+        type=float,
+        default=None,
+        help='raise smaller solverOptions.absoluteGapUSD requests to this gap',
+    )
+    parser.add_argument(
+        '--audit-dir',
+        default=None,
+        help='journal payload requests and responses to this directory',
+    )
+    parser.add_argument(
+        '--audit-sample-rate',
+        type=float,
+        default=1.0,
+        help='fraction of requests written to the audit journal',
+    )
+    parser.add_argument(
+        '--audit-max-mb',
+        type=float,
+        default=64.0,
+        help='start a new journal file once the current one reaches this size',
+    )
+    parser.add_argument(
+        '--audit-max-age-seconds',
+        type=float,
+        default=3600.0,
+        help='start a new journal file once the current one is this old',
+    )
+    parser.add_argument(
+        '--audit-max-files',
+        type=int,
+        default=None,
+        help='journal files kept in the directory; older ones are removed',
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    arguments = _parse_arguments(sys.argv[1:])
+    SOLVER_LIMIT_POLICY.update(
+        maxTimeLimitMs=arguments.max_time_limit_ms,
+        minRelativeGap=arguments.min_relative_gap,
+        minAbsoluteGapUSD=arguments.min_absolute_gap_usd,
+    )
+    journal = None
+    if arguments.audit_dir:
+        journal = AuditJournal(
+            arguments.audit_dir,
+            max_bytes=int(arguments.audit_max_mb * 1024 * 1024),
+            max_age_seconds=arguments.audit_max_age_seconds,
+            max_files=arguments.audit_max_files,
+            sample_rate=arguments.audit_sample_rate,
+        )
+    try:
+        serve(
+            sys.stdin,
+            sys.stdout,
+            max_jobs=arguments.max_jobs,
+            max_rss_mb=arguments.max_rss_mb,
+            max_sessions=arguments.max_sessions,
+            journal=journal,
+        )
+    finally:
+        if journal is not None:
+            journal.close()
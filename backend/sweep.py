@@ -0,0 +1,201 @@
+import math
+import time
+from collections import Counter
+
+from financial_parameters import FUEL_ANNUAL_RATE_FIELDS
+from model_tank_index import retarget_model, solve_model
+from sessions import build_session_model, merge_changes
+
+# Parametric sweeps over financial parameters. None of them changes the model
+# structure, so one model is built for the base payload and every grid point
+# only moves its objective coefficients (retarget_model), re-solving from the
+# plan of the previous point. Points are visited in snake order, so each one
+# differs from the previous in a single parameter by a single step.
+#
+#   request:  {"payload": {...model_tank_index input...},
+#              "parameters": [
+#                {"field": "discountRateAnnual", "values": [0.05, 0.07]},
+#                {"field": "technologyCostAdjustmentRateAnnual",
+#                 "fuel": "Ammonia", "start": -0.03, "stop": 0.0, "steps": 4}]}
+#   response: {"columns": [...], "rows": [[...], ...], "planChanges": [...]}
+#
+# A cancelled sweep (the job's deadline or the client going away) stops the
+# running point's solve and returns the points finished so far, with
+# "cancelled": true.
+
+SWEEP_SCALAR_FIELDS = ('discountRateAnnual', 'transitionCostRate')
+MAX_SWEEP_POINTS = 400
+COST_COLUMNS = (
+    'openingInvestmentCostUSD',
+    'maintenanceCostUSD',
+    'decommissioningCostUSD',
+    'transitionCostUSD',
+)
+SOLVED_STATUSES = (0, 1)
+
+
+def _parameter_label(parameter):
+    if 'fuel' in parameter:
+        return f"{parameter['field']}.{parameter['fuel']}"
+    return parameter['field']
+
+
+def _parameter_values(parameter, fuels):
+    field = parameter.get('field')
+    if field in FUEL_ANNUAL_RATE_FIELDS:
+        if parameter.get('fuel') not in fuels:
+            raise ValueError(f'Sweep parameter {field} requires a fuel from Fuels')
+    elif field in SWEEP_SCALAR_FIELDS:
+        if 'fuel' in parameter:
+            raise ValueError(f'Sweep parameter {field} does not take a fuel')
+    else:
+        raise ValueError(
+            'Sweep parameters must be one of '
+            f'{", ".join(SWEEP_SCALAR_FIELDS + FUEL_ANNUAL_RATE_FIELDS)}'
+        )
+
+    if 'values' in parameter:
+        values = parameter['values']
+    else:
+        steps = parameter['steps']
+        if isinstance(steps, bool) or not isinstance(steps, int) or steps < 1:
+            raise ValueError(f'{_parameter_label(parameter)}.steps must be a positive integer')
+        start = float(parameter['start'])
+        stop = float(parameter['stop'])
+        values = [
+            start if steps == 1 else start + (stop - start) * step / (steps - 1)
+            for step in range(steps)
+        ]
+    if not isinstance(values, list) or not values:
+        raise ValueError(f'{_parameter_label(parameter)} needs at least one value')
+    for value in values:
+        if (
+            isinstance(value, bool)
+            or not isinstance(value, (int, float))
+            or not math.isfinite(value)
+        ):
+            raise ValueError(f'{_parameter_label(parameter)} values must be finite numbers')
+    return [float(value) for value in values]
+
+
+def snake_order(sizes):
+    """Grid indices in boustrophedon order: consecutive indices differ by
+    one step along one axis."""
+    if not sizes:
+        yield ()
+        return
+    inner = list(snake_order(sizes[1:]))
+    for index in range(sizes[0]):
+        for rest in (inner if index % 2 == 0 else reversed(inner)):
+            yield (index,) + rest
+
+
+def _point_changes(parameters, values):
+    changes = {}
+    for parameter, value in zip(parameters, values):
+        if 'fuel' in parameter:
+            changes.setdefault(parameter['field'], {})[parameter['fuel']] = value
+        else:
+            changes[parameter['field']] = value
+    return changes
+
+
+def plan_signature(plan):
+    """Tank-row independent identity of a plan: how many tanks of each option
+    open, operate, close and convert in each period."""
+    counts = Counter()
+    for family, keys in plan.items():
+        for key in keys:
+            # Drop the tank row, the second element of every key.
+            counts[(family, key[0]) + tuple(key[2:])] += 1
+    return frozenset(counts.items())
+
+
+def run_sweep(request, control=None):
+    payload = request['payload']
+    parameters = request['parameters']
+    if not isinstance(parameters, list) or not parameters:
+        raise ValueError('A sweep needs at least one parameter')
+    labels = [_parameter_label(parameter) for parameter in parameters]
+    if len(set(labels)) != len(labels):
+        raise ValueError('Sweep parameters must be distinct')
+    grids = [_parameter_values(parameter, payload['Fuels']) for parameter in parameters]
+    sizes = [len(values) for values in grids]
+    if math.prod(sizes) > MAX_SWEEP_POINTS:
+        raise ValueError(f'A sweep may contain at most {MAX_SWEEP_POINTS} points')
+
+    started = time.perf_counter()
+    model = None
+    previous_data = None
+    previous_plan = None
+    updates = Counter()
+    points = {}
+    plan_ids = {}
+    for indices in snake_order(sizes):
+        if control is not None and control.cancelled:
+            break
+        values = [grid[index] for grid, index in zip(grids, indices)]
+        data = merge_changes(payload, _point_changes(parameters, values))
+        if model is None:
+            model = build_session_model(data)
+            updates['built'] += 1
+        elif retarget_model(model, previous_data, data):
+            updates['inPlace'] += 1
+        else:
+            model = build_session_model(data)
+            updates['rebuilt'] += 1
+        # The neighbour's plan is hinted even after a rebuild: the keys it
+        # shares with the new model still describe the same tanks.
+        result = solve_model(model, data, previous_plan=previous_plan, control=control)
+        previous_data = data
+
+        plan_id = None
+        solved = result['status'] in SOLVED_STATUSES
+        if solved:
+            previous_plan = model['plan']
+            plan_id = plan_ids.setdefault(plan_signature(previous_plan), len(plan_ids))
+        breakdown = result['costBreakdown']
+        points[indices] = {
+            'values': values,
+            'row': values + [
+                result['status'],
+                breakdown['totalObjectiveUSD'] if solved else None,
+            ] + [
+                breakdown[column] if solved else None for column in COST_COLUMNS
+            ] + [plan_id],
+            'planId': plan_id,
+        }
+
+    plan_changes = []
+    for indices, point in sorted(points.items()):
+        for axis, label in enumerate(labels):
+            neighbour = points.get(
+                indices[:axis] + (indices[axis] + 1,) + indices[axis + 1:]
+            )
+            if neighbour is None:
+                continue
+            if point['planId'] != neighbour['planId']:
+                plan_changes.append({
+                    'parameter': label,
+                    'from': dict(zip(labels, point['values'])),
+                    'to': dict(zip(labels, neighbour['values'])),
+                    'fromPlanId': point['planId'],
+                    'toPlanId': neighbour['planId'],
+                })
+
+    response = {
+        'parameters': [
+            {'parameter': label, 'values': values}
+            for label, values in zip(labels, grids)
+        ],
+        'columns': labels + ['status', 'objectiveUSD', *COST_COLUMNS, 'planId'],
+        'rows': [point['row'] for _, point in sorted(points.items())],
+        'planCount': len(plan_ids),
+        'planChanges': plan_changes,
+        'modelUpdates': dict(updates),
+        'sweepSeconds': time.perf_counter() - started,
+    }
+    if control is not None and control.cancelled:
+        response['cancelled'] = True
+    return response
+
@@ -0,0 +1,180 @@
+import math
+
+# Greedy feasible plans for one fuel of the per-tank model. A plan is a list of
+# tanks, each {'row', 'option', 'openedPeriod', 'closedPeriod'} with period
+# indices and closedPeriod None for tanks still open at the horizon end. Tanks
+# never convert, so a plan has no transitions.
+#
+# The cost of a greedy plan is an upper bound on the fuel's optimal cost, which
+# model_tank_index uses to bound the number of tank rows.
+
+# Relative slack on bound arithmetic so floating-point rounding can only make
+# a bound looser, never cut off an optimal plan.
+BOUND_TOLERANCE = 1e-9
+
+
+def forced_empty_periods(fuel_demand, periods):
+    """Period indices the permanent_zero_demand rows force empty: zero-demand
+    periods after some earlier period with positive demand."""
+    forced = set()
+    seen_positive = False
+    for period_index, period in enumerate(periods):
+        if fuel_demand[period] > 0:
+            seen_positive = True
+        elif seen_positive:
+            forced.add(period_index)
+    return forced
+
+
+def _opening_block_cost(coefficients, option_index, period_index, closing_period):
+    cost = 0.0
+    if period_index > 0:
+        cost += coefficients['openingCostCoefficientsUSD'][option_index][period_index]
+    cost += sum(
+        coefficients['maintenanceCostCoefficientsUSD'][option_index][
+            period_index:closing_period
+        ]
+    )
+    if closing_period < len(coefficients['discountFactorsByPeriod']):
+        cost += coefficients['decommissioningCostCoefficientsUSD'][option_index][
+            closing_period
+        ]
+    return cost
+
+
+def plan_cost(plan, coefficients):
+    """Objective value of a plan under the prepared cost coefficients."""
+    period_count = len(coefficients['discountFactorsByPeriod'])
+    return sum(
+        _opening_block_cost(
+            coefficients,
+            tank['option'],
+            tank['openedPeriod'],
+            period_count if tank['closedPeriod'] is None else tank['closedPeriod'],
+        )
+        for tank in plan
+    )
+
+
+def tank_plan_keys(fuel_index, plan, period_count):
+    """Per-tank model variables set to one by a plan, keyed like the model's
+    y/s/x/z dictionaries."""
+    keys = {'y': set(), 's': set(), 'x': set(), 'z': set()}
+    for tank in plan:
+        row = tank['row']
+        option_index = tank['option']
+        opened = tank['openedPeriod']
+        closed = tank['closedPeriod']
+        keys['y'].add((fuel_index, row, option_index, opened))
+        last_period = period_count if closed is None else closed
+        for period_index in range(opened + 1, last_period):
+            keys['s'].add((fuel_index, row, option_index, period_index))
+        if closed is not None:
+            keys['x'].add((fuel_index, row, option_index, closed))
+    return keys
+
+
+def greedy_fuel_plan(fuel_demand, periods, capacities, coefficients, initial_rows):
+    """Return a feasible plan that uses at most len(initial_rows) tanks, or
+    None when the greedy rule needs more rows than that.
+
+    Tanks pinned by InitialState open in period 0. Whenever active capacity
+    falls short of demand, the option with the cheapest cost of covering the
+    shortfall until the next forced closure is opened on free rows, in row
+    order. All tanks close in periods that must be empty.
+    """
+    forced = forced_empty_periods(fuel_demand, periods)
+    plan = []
+    active = []
+    free_rows = []
+    for row, values in enumerate(initial_rows):
+        if 1 in values:
+            tank = {
+                'row': row,
+                'option': values.index(1),
+                'openedPeriod': 0,
+                'closedPeriod': None,
+            }
+            plan.append(tank)
+            active.append(tank)
+        else:
+            free_rows.append(row)
+    free_rows.reverse()
+
+    for period_index in range(1, len(periods)):
+        if period_index in forced:
+            for tank in active:
+                tank['closedPeriod'] = period_index
+            active = []
+            continue
+        closing_period = min(
+            [forced_period for forced_period in forced if forced_period > period_index],
+            default=len(periods),
+        )
+        demand = fuel_demand[periods[period_index]]
+        capacity = sum(capacities[tank['option']] for tank in active)
+        if capacity >= demand:
+            continue
+
+        def covering_cost(option_index):
+            count = math.ceil((demand - capacity) / capacities[option_index])
+            return count * _opening_block_cost(
+                coefficients,
+                option_index,
+                period_index,
+                closing_period,
+            )
+
+        option_index = min(range(len(capacities)), key=covering_cost)
+        while capacity < demand:
+            if not free_rows:
+                return None
+            tank = {
+                'row': free_rows.pop(),
+                'option': option_index,
+                'openedPeriod': period_index,
+                'closedPeriod': None,
+            }
+            plan.append(tank)
+            active.append(tank)
+            capacity += capacities[option_index]
+    return plan
+
+
+def tank_row_bound(upper_bound_cost, fuel_demand, periods, coefficients, initial_rows):
+    """Number of leading InitialState rows that still contain an optimal plan.
+
+    Every coefficient is non-negative, so an optimal plan costs at least the
+    period-0 maintenance of the pinned tanks plus, for each tank it opens, the
+    cheapest opening-plus-maintenance coefficient over the periods a tank may
+    open in. A plan costing no more than `upper_bound_cost` therefore opens at
+    most (upper_bound_cost - pinned cost) / cheapest opening new tanks. Free
+    rows are interchangeable, so those tanks can use the first free rows; rows
+    are only cut after the last pinned row so tank names stay stable.
+    """
+    forced = forced_empty_periods(fuel_demand, periods)
+    pinned = [
+        (row, values.index(1))
+        for row, values in enumerate(initial_rows)
+        if 1 in values
+    ]
+    pinned_cost = sum(
+        coefficients['maintenanceCostCoefficientsUSD'][option_index][0]
+        for _, option_index in pinned
+    )
+    opening_costs = [
+        coefficients['openingCostCoefficientsUSD'][option_index][period_index]
+        + coefficients['maintenanceCostCoefficientsUSD'][option_index][period_index]
+        for option_index in range(len(coefficients['baseInvestmentCostsUSD']))
+        for period_index in range(1, len(periods))
+        if period_index not in forced
+    ]
+    if not opening_costs:
+        openings = 0
+    elif min(opening_costs) <= 0:
+        return len(initial_rows)
+    else:
+        slack = max(upper_bound_cost - pinned_cost, 0.0) * (1 + BOUND_TOLERANCE)
+        openings = math.floor(slack / min(opening_costs) + BOUND_TOLERANCE)
+    last_pinned_row = max((row for row, _ in pinned), default=-1)
+    return min(len(initial_rows), max(len(pinned) + openings, last_pinned_row + 1))
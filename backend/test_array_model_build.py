@@ -0,0 +1,99 @@
+import unittest
+
+try:
+    from ortools.linear_solver import linear_solver_pb2, pywraplp
+    from model_tank_index import build_facility_location_model, solve_facility_location
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def model_rows(model):
+    proto = linear_solver_pb2.MPModelProto()
+    model['solver'].ExportModelToProto(proto)
+    variables = [
+        (
+            variable.name,
+            variable.lower_bound,
+            variable.upper_bound,
+            variable.is_integer,
+            variable.objective_coefficient,
+        )
+        for variable in proto.variable
+    ]
+    constraints = [
+        (
+            constraint.name,
+            constraint.lower_bound,
+            constraint.upper_bound,
+            sorted(zip(constraint.var_index, constraint.coefficient)),
+        )
+        for constraint in proto.constraint
+    ]
+    return variables, constraints
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class ArrayModelBuildTest(unittest.TestCase):
+    def test_array_build_matches_the_expression_build(self):
+        for name, payload in existing_test_payloads().items():
+            for symmetry_breaking in (False, True):
+                with self.subTest(name, symmetryBreaking=symmetry_breaking):
+                    expressions = build_facility_location_model(
+                        with_solver_options(payload, symmetryBreaking=symmetry_breaking)
+                    )
+                    arrays = build_facility_location_model(with_solver_options(
+                        payload,
+                        symmetryBreaking=symmetry_breaking,
+                        modelBuild='arrays',
+                    ))
+                    self.assertEqual(model_rows(arrays), model_rows(expressions))
+                    self.assertEqual(
+                        arrays['variables'].keys(),
+                        expressions['variables'].keys(),
+                    )
+                    for family, variables in arrays['variables'].items():
+                        self.assertEqual(
+                            list(variables),
+                            list(expressions['variables'][family]),
+                        )
+
+    def test_anonymous_array_build_solves_to_the_same_result(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        reference = solve_facility_location(payload)
+        anonymous = solve_facility_location(
+            with_solver_options(payload, modelBuild='arrays', anonymousNames=True)
+        )
+        self.assertEqual(anonymous['solution'], reference['solution'])
+        self.assertEqual(anonymous['costBreakdown'], reference['costBreakdown'])
+
+    def test_anonymous_names_are_kept_for_export(self):
+        payload = with_solver_options(
+            model_payload([0, 100, 100, 100]),
+            modelBuild='arrays',
+            anonymousNames=True,
+        )
+        anonymous = build_facility_location_model(payload)
+        exported = build_facility_location_model(payload, keep_names=True)
+        self.assertIsNone(anonymous['solver'].LookupConstraint('demand[0,1]'))
+        self.assertIsNotNone(exported['solver'].LookupConstraint('demand[0,1]'))
+        self.assertEqual(exported['variables']['y'][0, 0, 0, 1].name(), 'y[0,0,0,1]')
+
+    def test_unsupported_combinations_are_rejected(self):
+        for options in (
+            {'modelBuild': 'matrix'},
+            {'modelBuild': 'arrays', 'engine': 'aggregated'},
+            {'modelBuild': 'arrays', 'solverBackend': 'cpsat'},
+            {'anonymousNames': True},
+        ):
+            with self.subTest(options):
+                with self.assertRaises(ValueError):
+                    build_facility_location_model(
+                        with_solver_options(model_payload([0, 100, 100, 100]), **options)
+                    )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import glob
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from audit_journal import AuditJournal, read_journal, sampled
+
+
+def journal_files(directory):
+    return sorted(glob.glob(os.path.join(directory, 'audit-*.jsonl.gz')))
+
+
+class AuditJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def records(self):
+        return [
+            record
+            for path in journal_files(self.directory)
+            for record in read_journal(path)
+        ]
+
+    def test_records_are_written_in_order_off_the_caller_thread(self):
+        journal = AuditJournal(self.directory)
+        for index in range(3):
+            self.assertTrue(journal.record(f'request-{index}', {'T': [index]}, {'code': 0}))
+        journal.close()
+        records = self.records()
+        self.assertEqual([record['requestId'] for record in records],
+                         ['request-0', 'request-1', 'request-2'])
+        self.assertEqual(records[2]['payload'], {'T': [2]})
+        self.assertEqual(records[2]['response'], {'code': 0})
+        self.assertGreater(records[0]['recordedAt'], 0)
+
+    def test_files_rotate_by_size_and_age(self):
+        journal = AuditJournal(self.directory, max_bytes=200)
+        for index in range(4):
+            journal.record(index, {'padding': 'x' * 200, 'index': index}, {})
+        journal.close()
+        self.assertEqual(len(journal_files(self.directory)), 4)
+        self.assertEqual([record['requestId'] for record in self.records()], [0, 1, 2, 3])
+
+        aged = tempfile.mkdtemp()
+        journal = AuditJournal(aged, max_age_seconds=0.05)
+        journal.record('first', {}, {})
+        journal.flush()
+        time.sleep(0.1)
+        journal.record('second', {}, {})
+        journal.close()
+        self.assertEqual(len(journal_files(aged)), 2)
+
+    def test_only_the_newest_files_are_kept(self):
+        journal = AuditJournal(self.directory, max_bytes=1, max_files=2)
+        for index in range(5):
+            journal.record(index, {}, {})
+        journal.close()
+        self.assertEqual([record['requestId'] for record in self.records()], [3, 4])
+
+    def test_sampling_is_decided_by_the_request_id(self):
+        chosen = [request_id for request_id in range(2000) if sampled(request_id, 0.25)]
+        self.assertAlmostEqual(len(chosen) / 2000, 0.25, delta=0.05)
+        self.assertEqual(chosen, [r for r in range(2000) if sampled(r, 0.25)])
+
+        journal = AuditJournal(self.directory, sample_rate=0.0)
+        self.assertFalse(journal.record('request', {}, {}))
+        journal.close()
+        self.assertEqual(self.records(), [])
+
+    def test_a_full_queue_drops_records(self):
+        journal = AuditJournal(self.directory, max_pending=2)
+        writing = threading.Event()
+        release = threading.Event()
+        write = journal._write
+
+        def blocked_write(*record):
+            writing.set()
+            release.wait()
+            write(*record)
+
+        journal._write = blocked_write
+        self.assertTrue(journal.record('writing', {}, {}))
+        writing.wait()
+        accepted = [journal.record(index, {}, {}) for index in range(4)]
+        release.set()
+        journal.close()
+        self.assertEqual(accepted, [True, True, False, False])
+        self.assertEqual(journal.dropped, 2)
+        self.assertEqual(
+            [record['requestId'] for record in self.records()],
+            ['writing', 0, 1],
+        )
+
+    def test_invalid_settings_are_rejected(self):
+        with self.assertRaises(ValueError):
+            AuditJournal(self.directory, sample_rate=1.5)
+        with self.assertRaises(ValueError):
+            AuditJournal(self.directory, max_files=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
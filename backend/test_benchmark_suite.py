@@ -0,0 +1,118 @@
+import copy
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from benchmarks.scenarios import generate_scenario
+    from benchmarks.suite import SUITES, compare_reports, run_scenario
+    from model_tank_index import build_facility_location_model
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def suite_result(name='tiny', **fields):
+    result = {
+        'name': name,
+        'buildSeconds': 0.5,
+        'solveSeconds': 2.0,
+        'variableCount': 100,
+        'constraintCount': 200,
+        'peakRssMB': 100.0,
+        'status': 0,
+        'objectiveUSD': 1_000_000.0,
+        'gap': 0.0,
+    }
+    result.update(fields)
+    return result
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class ScenarioGeneratorTest(unittest.TestCase):
+    def test_scenarios_are_deterministic_and_valid(self):
+        for seed in range(8):
+            with self.subTest(seed=seed):
+                payload = generate_scenario(
+                    seed,
+                    fuel_count=1 + seed % 3,
+                    option_count=2 + seed % 4,
+                    period_count=3 + seed % 4,
+                    demand_scale=(500, 2000, 20000)[seed % 3],
+                )
+                self.assertEqual(payload, generate_scenario(
+                    seed,
+                    fuel_count=1 + seed % 3,
+                    option_count=2 + seed % 4,
+                    period_count=3 + seed % 4,
+                    demand_scale=(500, 2000, 20000)[seed % 3],
+                ))
+                build_facility_location_model(payload)
+                for fuel in payload['Fuels']:
+                    capacities = payload['Capacities'][fuel]
+                    first_demand = payload['Demand'][fuel][payload['T'][0]]
+                    initial_capacity = sum(
+                        capacity * opened
+                        for row in payload['InitialState'][fuel]
+                        for capacity, opened in zip(capacities, row)
+                    )
+                    self.assertGreaterEqual(initial_capacity, first_demand)
+
+    def test_seeds_change_the_scenario(self):
+        self.assertNotEqual(generate_scenario(1), generate_scenario(2))
+
+    def test_suite_scenarios_solve(self):
+        result = run_scenario(SUITES['smoke'][0])
+        self.assertEqual(result['status'], pywraplp.Solver.OPTIMAL)
+        self.assertGreater(result['variableCount'], 0)
+        self.assertGreater(result['peakRssMB'], 0.0)
+        self.assertAlmostEqual(result['gap'], 0.0, places=6)
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class CompareReportsTest(unittest.TestCase):
+    def test_noise_below_the_tolerances_is_not_a_regression(self):
+        baseline = {'results': [suite_result()]}
+        current = {'results': [suite_result(
+            buildSeconds=0.54,
+            solveSeconds=2.3,
+            peakRssMB=110.0,
+            objectiveUSD=999_000.0,
+        )]}
+        self.assertEqual(compare_reports(baseline, current), [])
+
+    def test_slower_larger_and_worse_results_are_regressions(self):
+        baseline = {'results': [suite_result(), suite_result('gone')]}
+        current = {'results': [suite_result(
+            buildSeconds=0.9,
+            solveSeconds=2.1,
+            peakRssMB=200.0,
+            status=1,
+            objectiveUSD=1_100_000.0,
+            gap=0.05,
+        )]}
+        self.assertEqual(
+            sorted(
+                (regression['name'], regression['metric'])
+                for regression in compare_reports(baseline, current)
+            ),
+            [
+                ('gone', 'missing'),
+                ('tiny', 'buildSeconds'),
+                ('tiny', 'gap'),
+                ('tiny', 'objectiveUSD'),
+                ('tiny', 'peakRssMB'),
+                ('tiny', 'status'),
+            ],
+        )
+
+    def test_unsolved_scenarios_only_compare_status(self):
+        baseline = {'results': [suite_result()]}
+        current = copy.deepcopy(baseline)
+        current['results'][0].update(status=6, objectiveUSD=None, gap=None)
+        self.assertEqual(
+            [regression['metric'] for regression in compare_reports(baseline, current)],
+            ['status'],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from ortools.linear_solver import pywraplp
+    import model_tank_index
+    from model_tank_index import (
+        CpSatSolver,
+        SolveControl,
+        build_facility_location_model,
+        solve_facility_location,
+    )
+    from benchmarks.model_build import synthetic_payload
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class CpSatBackendTest(unittest.TestCase):
+    def test_cpsat_reaches_the_mpsolver_objective(self):
+        for name, payload in existing_test_payloads().items():
+            for engine in ('perTank', 'aggregated'):
+                with self.subTest(name, engine=engine):
+                    reference = solve_facility_location(
+                        with_solver_options(payload, engine=engine)
+                    )
+                    native = solve_facility_location(with_solver_options(
+                        payload,
+                        engine=engine,
+                        solverBackend='cpsat',
+                        searchWorkers=2,
+                        randomSeed=7,
+                    ))
+                    self.assertEqual(native['status'], pywraplp.Solver.OPTIMAL)
+                    self.assertAlmostEqual(
+                        native['costBreakdown']['totalObjectiveUSD'],
+                        reference['costBreakdown']['totalObjectiveUSD'],
+                        places=6,
+                    )
+
+    def test_scaled_objective_reports_the_unscaled_cost(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        reference = solve_facility_location(payload)
+        scaled = solve_facility_location(with_solver_options(
+            payload,
+            solverBackend='cpsat',
+            objectiveScale=100,
+            relativeGap=0,
+            absoluteGapUSD=0,
+        ))
+        self.assertEqual(scaled['solution'], reference['solution'])
+        self.assertAlmostEqual(
+            scaled['costBreakdown']['totalObjectiveUSD'],
+            reference['costBreakdown']['totalObjectiveUSD'],
+            places=6,
+        )
+
+    def test_fractional_capacities_keep_the_demand_row_exact(self):
+        payload = model_payload([0, 150, 150, 150])
+        payload['Capacities']['Test Fuel'] = [75.5]
+        payload['TankOptions']['Test Fuel'][0]['capacityMgoEquivalentTonnes'] = 75.5
+        payload['InitialState']['Test Fuel'] = [[0]] * 2
+        result = solve_facility_location(
+            with_solver_options(payload, solverBackend='cpsat')
+        )
+        self.assertEqual(result['status'], pywraplp.Solver.OPTIMAL)
+        self.assertEqual(len(result['solution']['Test Fuel']['2030']), 2)
+
+    def test_model_is_built_natively(self):
+        model = build_facility_location_model(with_solver_options(
+            model_payload([0, 100, 100, 100]),
+            solverBackend='cpsat',
+        ))
+        self.assertIsInstance(model['solver'], CpSatSolver)
+        self.assertGreater(model['solver'].NumConstraints(), 0)
+
+    def test_cancel_stops_the_search_with_the_best_incumbent(self):
+        # Takes several seconds to prove optimal on one core.
+        payload = with_solver_options(synthetic_payload(2, 4, 8, 4), solverBackend='cpsat')
+        incumbents = []
+        control = SolveControl(
+            lambda event: event['event'] == 'incumbent' and incumbents.append(event)
+        )
+        timer = threading.Timer(1.0, control.cancel)
+        timer.start()
+        try:
+            result = solve_facility_location(payload, control=control)
+        finally:
+            timer.cancel()
+        self.assertTrue(result['cancelled'])
+        self.assertLess(result['solveCpuTimeSeconds'], 5.0)
+        if result['status'] == pywraplp.Solver.FEASIBLE:
+            self.assertAlmostEqual(
+                incumbents[-1]['objectiveUSD'],
+                result['costBreakdown']['totalObjectiveUSD'],
+            )
+            for event in incumbents:
+                self.assertLessEqual(event['bestBoundUSD'], event['objectiveUSD'] + 1e-6)
+
+    def test_progress_is_reported_from_the_build_validation(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        for engine in ('perTank', 'aggregated'):
+            with self.subTest(engine):
+                events = []
+                with mock.patch.object(
+                    model_tank_index,
+                    '_validate_model_inputs',
+                    wraps=model_tank_index._validate_model_inputs,
+                ) as validate:
+                    solve_facility_location(
+                        with_solver_options(payload, engine=engine),
+                        control=SolveControl(lambda event: events.append(event['event'])),
+                    )
+                self.assertEqual(validate.call_count, 1)
+                self.assertEqual(events[:2], ['validated', 'model'])
+
+    def test_invalid_native_parameters_are_rejected(self):
+        for options in (
+            {'solverBackend': 'gurobi'},
+            {'searchWorkers': 0},
+            {'randomSeed': -1},
+            {'relativeGap': -0.1},
+            {'objectiveScale': 0},
+        ):
+            with self.subTest(options):
+                with self.assertRaises(ValueError):
+                    solve_facility_location(
+                        with_solver_options(model_payload([0, 100, 100, 100]), **options)
+                    )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    import model_tank_index
+    from model_tank_index import SolveControl, solve_facility_location
+    from benchmarks.model_build import synthetic_payload
+    from test_support import with_solver_options
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+PERIODS = ['2025', '2030', '2035', '2040']
+
+
+def tank_option(fuel, capacity, base_cost):
+    return {
+        'optimizerName': fuel,
+        'capacityMgoEquivalentTonnes': capacity,
+        'baseInvestmentCostUSD': base_cost,
+    }
+
+
+def two_fuel_payload():
+    return {
+        'T': PERIODS,
+        'Fuels': ['MGO', 'Ammonia'],
+        'Capacities': {'MGO': [100, 200], 'Ammonia': [100, 300]},
+        'TankOptions': {
+            'MGO': [
+                tank_option('MGO', 100, 1_000_000.5),
+                tank_option('MGO', 200, 1_700_000.25),
+            ],
+            'Ammonia': [
+                tank_option('Ammonia', 100, 2_000_000.75),
+                tank_option('Ammonia', 300, 4_200_000.125),
+            ],
+        },
+        'Demand': {
+            'MGO': dict(zip(PERIODS, [200, 150, 100, 0])),
+            'Ammonia': dict(zip(PERIODS, [0, 100, 250, 300])),
+        },
+        'InitialState': {
+            'MGO': [[0, 1], [0, 0]],
+            'Ammonia': [[0, 0], [0, 0], [0, 0]],
+        },
+        'planningPeriodYears': 5,
+        'discountRateAnnual': 0.071,
+        'transitionCostRate': 1.2,
+        'technologyCostAdjustmentRateAnnual': {'MGO': 0.0, 'Ammonia': -0.013},
+        'maintenanceRateAnnual': {'MGO': 0.03, 'Ammonia': 0.037},
+        'decommissioningRateAtClosure': {'MGO': 0.1, 'Ammonia': 0.123},
+    }
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class FuelDecompositionTest(unittest.TestCase):
+    def test_decomposed_solve_matches_monolithic_response(self):
+        monolithic = solve_facility_location(two_fuel_payload())
+        decomposed = solve_facility_location(
+            with_solver_options(two_fuel_payload(), decomposeByFuel=True)
+        )
+
+        self.assertEqual(decomposed['status'], pywraplp.Solver.OPTIMAL)
+        self.assertAlmostEqual(
+            decomposed['costBreakdown']['totalObjectiveUSD'],
+            monolithic['costBreakdown']['totalObjectiveUSD'],
+            places=6,
+        )
+        self.assertEqual(set(decomposed['solution']), set(monolithic['solution']))
+        self.assertEqual(decomposed['variableCount'], monolithic['variableCount'])
+        self.assertEqual(decomposed['constraintCount'], monolithic['constraintCount'])
+        self.assertEqual(decomposed['planningPeriods'], monolithic['planningPeriods'])
+        self.assertEqual(
+            decomposed['financialParameters'],
+            monolithic['financialParameters'],
+        )
+
+    def test_merged_total_is_sum_of_fuel_objectives(self):
+        result = solve_facility_location(
+            with_solver_options(
+                two_fuel_payload(),
+                decomposeByFuel=True,
+                decompositionWorkers=2,
+            )
+        )
+        fuel_objectives = [
+            fuel_result['objectiveUSD']
+            for fuel_result in result['decomposition']['fuels'].values()
+        ]
+        self.assertEqual(list(result['decomposition']['fuels']), ['MGO', 'Ammonia'])
+        self.assertAlmostEqual(
+            result['costBreakdown']['totalObjectiveUSD'],
+            sum(fuel_objectives),
+            places=6,
+        )
+
+    def test_decomposed_solves_reuse_one_process_pool(self):
+        payload = with_solver_options(
+            two_fuel_payload(),
+            decomposeByFuel=True,
+            decompositionWorkers=2,
+        )
+        solve_facility_location(payload)
+        executor = model_tank_index._DECOMPOSITION_POOL['executor']
+        result = solve_facility_location(payload)
+        self.assertIs(model_tank_index._DECOMPOSITION_POOL['executor'], executor)
+        self.assertEqual(result['status'], pywraplp.Solver.OPTIMAL)
+
+    def test_cancel_stops_every_fuel_subproblem(self):
+        # Each fuel takes seconds to prove optimal on one core.
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                payload = with_solver_options(
+                    synthetic_payload(2, 4, 8, 4),
+                    solverBackend='cpsat',
+                    searchWorkers=1,
+                    decomposeByFuel=True,
+                    decompositionWorkers=workers,
+                )
+                control = SolveControl()
+                timer = threading.Timer(1.0, control.cancel)
+                started = time.perf_counter()
+                timer.start()
+                try:
+                    result = solve_facility_location(payload, control=control)
+                finally:
+                    timer.cancel()
+                self.assertLess(time.perf_counter() - started, 4.0)
+                self.assertTrue(result['cancelled'])
+                self.assertEqual(result['terminationReason'], 'cancelled')
+                for fuel_result in result['decomposition']['fuels'].values():
+                    self.assertEqual(fuel_result['terminationReason'], 'cancelled')
+
+    def test_invalid_requests_fail_before_fan_out(self):
+        payload = with_solver_options(two_fuel_payload(), decomposeByFuel=True)
+        del payload['Demand']['Ammonia']
+        with self.assertRaisesRegex(ValueError, 'Demand.Ammonia is required'):
+            solve_facility_location(payload)
+
+    def test_unknown_solver_options_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'Unknown solverOptions'):
+            solve_facility_location(
+                with_solver_options(two_fuel_payload(), decompose=True)
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import copy
 import math
 import unittest
 
+import financial_parameters
 from financial_parameters import (
     calculate_decommissioning_cost_coefficient,
     calculate_discount_factor,
@@ -217,5 +218,55 @@ class FinancialParameterContractTest(unittest.TestCase):
             prepare_financial_costs_for_model(payload)
 
 
+def multi_option_payload():
+    payload = valid_payload()
+    payload['T'] = [str(2025 + 5 * index) for index in range(12)]
+    capacities = [1000, 3000, 4500, 7000]
+    base_costs = [4_321_987.123, BASE_COST, 15_998_001.5, 23_456_789.0001]
+    payload['Capacities']['Ammonia'] = capacities
+    payload['TankOptions']['Ammonia'] = [
+        {
+            'optimizerName': 'Ammonia',
+            'capacityMgoEquivalentTonnes': capacity,
+            'baseInvestmentCostUSD': base_cost,
+        }
+        for capacity, base_cost in zip(capacities, base_costs)
+    ]
+    return payload
+
+
+@unittest.skipIf(financial_parameters.np is None, 'NumPy is unavailable')
+class VectorizedCoefficientTest(unittest.TestCase):
+    def test_vectorized_coefficients_match_the_scalar_helpers_exactly(self):
+        for payload in (valid_payload(), multi_option_payload()):
+            with self.subTest(options=len(payload['Capacities']['Ammonia'])):
+                self.assertEqual(
+                    prepare_financial_costs_for_model(payload, vectorized=True),
+                    prepare_financial_costs_for_model(payload, vectorized=False),
+                )
+
+    def test_arrays_have_option_and_period_axes(self):
+        payload = multi_option_payload()
+        prepared = prepare_financial_costs_for_model(payload)['Ammonia']
+        opening, maintenance, decommissioning, transition = (
+            financial_parameters.cost_coefficient_arrays(
+                prepared['baseInvestmentCostsUSD'],
+                prepared,
+                prepared,
+                prepared['discountFactorsByPeriod'],
+            )
+        )
+        self.assertEqual(opening.shape, (4, 12))
+        self.assertEqual(maintenance.shape, (4, 12))
+        self.assertEqual(decommissioning.shape, (4, 12))
+        self.assertEqual(transition.shape, (4, 4, 12))
+        self.assertTrue(math.isnan(transition[1, 1, 5]))
+        self.assertTrue(math.isnan(transition[0, 1, 0]))
+        self.assertEqual(
+            transition[0, 3, 5],
+            prepared['transitionCostCoefficientsUSD'][0][3][5],
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,158 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    from ortools.linear_solver import linear_solver_pb2, pywraplp
+    from ortools.linear_solver.python import model_builder_helper
+    from model_export import main, model_proto, write_model
+    from model_tank_index import build_model, solve_facility_location
+    from test_support import with_solver_options
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def small_solver():
+    solver = pywraplp.Solver.CreateSolver('SAT')
+    on = solver.BoolVar('on[0,1]')
+    count = solver.IntVar(0, solver.infinity(), 'count[0]')
+    level = solver.NumVar(-solver.infinity(), solver.infinity(), 'level')
+    band = solver.Constraint(2, 6, 'band[0]')
+    band.SetCoefficient(count, 1)
+    band.SetCoefficient(level, 1)
+    solver.Add(count - 3 * on == 0, 'link')
+    solver.Add(level <= 1.5, 'cap')
+    solver.Maximize(2 * on + count + 0.5 * level + 7)
+    return solver
+
+
+def read_mps(path):
+    helper = model_builder_helper.ModelBuilderHelper()
+    with gzip.open(path, 'rt') as model_file:
+        assert helper.import_from_mps_string(model_file.read())
+    solver = pywraplp.Solver.CreateSolver('SAT')
+    solver.LoadModelFromProtoWithUniqueNamesOrDie(model_builder_helper.to_mpmodel_proto(helper))
+    return solver
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class ModelExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_lp_files_use_portable_names(self):
+        write_model(small_solver(), self.path('small.lp'))
+        with open(self.path('small.lp')) as model_file:
+            self.assertEqual(model_file.read(), '\n'.join([
+                'Maximize',
+                ' obj: +2 on_0_1 +1 count_0 +0.5 level +7 Constant',
+                'Subject To',
+                ' band_0_lhs: +1 count_0 +1 level >= 2',
+                ' band_0_rhs: +1 count_0 +1 level <= 6',
+                ' link: -3 on_0_1 +1 count_0 = 0',
+                ' cap: +1 level <= 1.5',
+                'Bounds',
+                ' Constant = 1',
+                ' level free',
+                'Binaries',
+                ' on_0_1',
+                'Generals',
+                ' count_0',
+                'End',
+                '',
+            ]))
+
+    def test_mps_files_solve_to_the_same_objective(self):
+        solver = small_solver()
+        write_model(solver, self.path('small.mps.gz'), export_format='mps')
+        exported = read_mps(self.path('small.mps.gz'))
+        self.assertEqual(solver.Solve(), pywraplp.Solver.OPTIMAL)
+        self.assertEqual(exported.Solve(), pywraplp.Solver.OPTIMAL)
+        self.assertAlmostEqual(exported.Objective().Value(), solver.Objective().Value())
+        self.assertIsNotNone(exported.LookupVariable('on_0_1'))
+
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        for options in ({}, {'presolve': True}, {'engine': 'aggregated'}):
+            with self.subTest(options):
+                data = with_solver_options(payload, **options)
+                solver = build_model(data, keep_names=True)['solver']
+                write_model(solver, self.path('model.mps.gz'), export_format='mps')
+                exported = read_mps(self.path('model.mps.gz'))
+                self.assertEqual(exported.NumVariables(), solver.NumVariables())
+                self.assertEqual(exported.NumConstraints(), solver.NumConstraints())
+                self.assertEqual(exported.Solve(), pywraplp.Solver.OPTIMAL)
+                self.assertAlmostEqual(
+                    exported.Objective().Value(),
+                    solve_facility_location(data)['costBreakdown']['totalObjectiveUSD'],
+                    delta=1e-6,
+                )
+
+    def test_proto_files_keep_the_model(self):
+        solver = build_model(
+            existing_test_payloads()['two_fuels_with_transitions'],
+            keep_names=True,
+        )['solver']
+        write_model(solver, self.path('model.pb.gz'), export_format='proto', names='native')
+        with gzip.open(self.path('model.pb.gz'), 'rb') as model_file:
+            exported = linear_solver_pb2.MPModelProto.FromString(model_file.read())
+        self.assertEqual(exported, model_proto(solver))
+
+        write_model(solver, self.path('model.pb'), export_format='proto')
+        with open(self.path('model.pb'), 'rb') as model_file:
+            exported = linear_solver_pb2.MPModelProto.FromString(model_file.read())
+        self.assertFalse([
+            variable.name for variable in exported.variable if '[' in variable.name
+        ])
+
+    def test_export_model_writes_a_portable_lp_file_and_solves(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        expected = solve_facility_location(payload)
+        working_directory = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            result = solve_facility_location(payload, export_model=True)
+            with open('facility_location_model.lp') as model_file:
+                text = model_file.read()
+        finally:
+            os.chdir(working_directory)
+        self.assertEqual(result['solution'], expected['solution'])
+        self.assertIn(' demand_0_1: ', text)
+        self.assertNotIn('[', text)
+        self.assertIn('exportSeconds', result['timings'])
+
+    def test_cli_exports_a_request_payload(self):
+        payload_path = self.path('payload.json')
+        with open(payload_path, 'w') as payload_file:
+            json.dump(existing_test_payloads()['two_options'], payload_file)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            code = main([payload_path, '--format', 'mps', '--output', self.path('model.mps.gz')])
+        self.assertEqual(code, 0)
+        summary = json.loads(output.getvalue())
+        self.assertEqual(summary['format'], 'mps')
+        self.assertEqual(read_mps(self.path('model.mps.gz')).NumVariables(), summary['variables'])
+
+    def test_invalid_exports_are_rejected(self):
+        cpsat = build_model(with_solver_options(
+            existing_test_payloads()['two_options'],
+            solverBackend='cpsat',
+        ))['solver']
+        with self.assertRaises(ValueError):
+            write_model(cpsat, self.path('model.lp'))
+        with self.assertRaises(ValueError):
+            write_model(small_solver(), self.path('model.xml'), export_format='xml')
+        with self.assertRaises(ValueError):
+            write_model(small_solver(), self.path('model.lp'), names='short')
+
+
+if __name__ == '__main__':
+    unittest.main()
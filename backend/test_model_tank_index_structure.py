@@ -108,6 +108,38 @@ class TankIndexModelStructureTest(unittest.TestCase):
         self.assertTrue(all(key[2] != key[3] for key in z))
         self.assertTrue(all(key[4] > 0 for key in z))
 
+    def test_symmetry_breaking_orders_only_interchangeable_tanks(self):
+        payload = model_payload([100, 200, 300, 300])
+        payload['InitialState']['Test Fuel'] = [[1], [0], [0]]
+        payload['solverOptions'] = {'symmetryBreaking': True}
+        model = build_facility_location_model(payload)
+        names = {
+            constraint.name() for constraint in model['solver'].constraints()
+        }
+        symmetry_names = {name for name in names if name.startswith('tank_symmetry')}
+        # Tank 0 is pinned by InitialState; only the two free tanks are ordered.
+        self.assertEqual(symmetry_names, {'tank_symmetry[0,1,2]'})
+
+    def test_symmetry_breaking_preserves_the_optimal_objective(self):
+        payload = model_payload([0, 150, 300, 250])
+        payload['Capacities']['Test Fuel'] = [100, 200]
+        payload['TankOptions']['Test Fuel'].append({
+            'optimizerName': 'Test Fuel',
+            'capacityMgoEquivalentTonnes': 200,
+            'baseInvestmentCostUSD': 15_000_000.7654321,
+        })
+        payload['InitialState']['Test Fuel'] = [[0, 0]] * 3
+        baseline = solve_facility_location(payload)
+        payload['solverOptions'] = {'symmetryBreaking': True}
+        ordered = solve_facility_location(payload)
+
+        self.assertEqual(ordered['status'], pywraplp.Solver.OPTIMAL)
+        self.assertAlmostEqual(
+            ordered['costBreakdown']['totalObjectiveUSD'],
+            baseline['costBreakdown']['totalObjectiveUSD'],
+            places=6,
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,132 @@
+import copy
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import (
+        _prune_dominated_options,
+        _validate_model_inputs,
+        build_model,
+        prepare_financial_costs_for_model,
+        retarget_model,
+        solve_facility_location,
+    )
+    from sessions import merge_changes
+    from test_array_model_build import model_rows
+    from test_support import with_solver_options
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def with_options(payload, options):
+    """Replace every fuel's tank options by (capacity, base cost) pairs."""
+    payload = copy.deepcopy(payload)
+    for fuel in payload['Fuels']:
+        template = payload['TankOptions'][fuel][0]
+        payload['Capacities'][fuel] = [capacity for capacity, _ in options]
+        payload['TankOptions'][fuel] = [
+            {
+                **template,
+                'capacityMgoEquivalentTonnes': capacity,
+                'baseInvestmentCostUSD': base_cost,
+            }
+            for capacity, base_cost in options
+        ]
+        # Initial tanks move to the last option.
+        payload['InitialState'][fuel] = [
+            [0] * (len(options) - 1) + [int(any(row))]
+            for row in payload['InitialState'][fuel]
+        ]
+    return payload
+
+
+def pruned_options(payload):
+    prepared_costs = prepare_financial_costs_for_model(payload)
+    _, initial_state, _ = _validate_model_inputs(payload, prepared_costs)
+    return _prune_dominated_options(payload, prepared_costs, initial_state)
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class OptionPruningTest(unittest.TestCase):
+    def test_pruned_models_solve_to_the_same_plan(self):
+        # 150 t costs more than 200 t, so it is never needed.
+        options = [(100, 10_000_000.0), (150, 16_000_000.0), (200, 15_000_000.0)]
+        for name in ('two_options', 'two_fuels_with_transitions'):
+            payload = with_options(existing_test_payloads()[name], options)
+            for solver_options in (
+                {'symmetryBreaking': True},
+                {'symmetryBreaking': True, 'modelBuild': 'arrays', 'presolve': True},
+                {'engine': 'aggregated'},
+            ):
+                with self.subTest(name, **solver_options):
+                    reference = solve_facility_location(
+                        with_solver_options(payload, **solver_options)
+                    )
+                    pruned = solve_facility_location(with_solver_options(
+                        payload,
+                        pruneDominatedOptions=True,
+                        **solver_options,
+                    ))
+                    self.assertEqual(pruned['solution'], reference['solution'])
+                    self.assertEqual(pruned['costs'], reference['costs'])
+                    self.assertAlmostEqual(
+                        pruned['costBreakdown']['totalObjectiveUSD'],
+                        reference['costBreakdown']['totalObjectiveUSD'],
+                        places=6,
+                    )
+                    self.assertLess(pruned['variableCount'], reference['variableCount'])
+                    self.assertEqual(
+                        pruned['prunedOptions'][payload['Fuels'][0]],
+                        [{'optionIndex': 1, 'capacity': 150, 'dominatedBy': 2}],
+                    )
+                    self.assertNotIn('prunedOptions', reference)
+
+    def test_transition_costs_and_pinned_options_keep_options(self):
+        payload = with_options(
+            existing_test_payloads()['two_options'],
+            [(100, 20_000_000.0), (150, 12_000_000.0), (200, 11_000_000.0)],
+        )
+        # 200 t is cheaper than 150 t, but converting from the expensive
+        # 100 t tank to it costs more. Once 100 t is pruned, 150 t goes too.
+        option_indices, pruned = pruned_options(payload)
+        self.assertEqual(option_indices['Test Fuel'], [2])
+        self.assertEqual(
+            [option['optionIndex'] for option in pruned['Test Fuel']],
+            [0, 1],
+        )
+
+        payload['InitialState']['Test Fuel'] = [[1, 0, 0]]
+        option_indices, pruned = pruned_options(payload)
+        self.assertEqual(option_indices['Test Fuel'], [0, 1, 2])
+        self.assertEqual(pruned, {})
+
+    def test_interchangeable_options_keep_the_first(self):
+        payload = with_options(
+            existing_test_payloads()['two_options'],
+            [(100, 10_000_000.0), (100, 10_000_000.0)],
+        )
+        option_indices, pruned = pruned_options(payload)
+        self.assertEqual(option_indices['Test Fuel'], [0])
+        self.assertEqual(pruned['Test Fuel'][0]['dominatedBy'], 0)
+
+    def test_pruned_models_are_retargeted_while_the_pruning_holds(self):
+        payload = with_solver_options(
+            with_options(
+                existing_test_payloads()['two_options'],
+                [(100, 10_000_000.0), (150, 16_000_000.0), (200, 15_000_000.0)],
+            ),
+            pruneDominatedOptions=True,
+        )
+        data = merge_changes(payload, {'discountRateAnnual': 0.05})
+        model = build_model(payload, keep_names=True)
+        self.assertTrue(retarget_model(model, payload, data))
+        self.assertEqual(model_rows(model), model_rows(build_model(data, keep_names=True)))
+
+        cheaper = copy.deepcopy(payload)
+        cheaper['TankOptions']['Test Fuel'][1]['baseInvestmentCostUSD'] = 12_000_000.0
+        self.assertFalse(retarget_model(build_model(payload), payload, cheaper))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    import numpy as np
+    from model_tank_index import (
+        _presolve_per_tank,
+        _validate_model_inputs,
+        build_facility_location_model,
+        prepare_financial_costs_for_model,
+        retarget_model,
+        solve_facility_location,
+    )
+    from sessions import merge_changes
+    from test_array_model_build import model_rows
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def presolved_values(payload):
+    prepared_costs = prepare_financial_costs_for_model(payload)
+    demand, initial_state, tank_counts = _validate_model_inputs(payload, prepared_costs)
+    return _presolve_per_tank(payload, demand, initial_state, tank_counts)
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class PresolveTest(unittest.TestCase):
+    def test_presolved_models_solve_to_the_same_plan(self):
+        for name, payload in existing_test_payloads().items():
+            for options in (
+                {},
+                {'modelBuild': 'arrays'},
+                {'stateFormulation': 'recursive'},
+                {'symmetryBreaking': True},
+                {'solverBackend': 'cpsat'},
+            ):
+                with self.subTest(name, **options):
+                    reference = solve_facility_location(
+                        with_solver_options(payload, **options)
+                    )
+                    presolved = solve_facility_location(
+                        with_solver_options(payload, presolve=True, **options)
+                    )
+                    self.assertAlmostEqual(
+                        presolved['costBreakdown']['totalObjectiveUSD'],
+                        reference['costBreakdown']['totalObjectiveUSD'],
+                        places=6,
+                    )
+                    if options.get('solverBackend') != 'cpsat':
+                        # CP-SAT may pick another of several optimal plans.
+                        self.assertEqual(presolved['solution'], reference['solution'])
+                        self.assertEqual(presolved['costs'], reference['costs'])
+                    removed = presolved['presolve']
+                    self.assertGreater(removed['removedVariables'], 0)
+                    self.assertEqual(
+                        presolved['variableCount'],
+                        reference['variableCount'] - removed['removedVariables'],
+                    )
+                    self.assertEqual(
+                        presolved['constraintCount'],
+                        reference['constraintCount'] - removed['removedConstraints'],
+                    )
+                    self.assertNotIn('presolve', reference)
+
+    def test_array_build_matches_the_expression_build(self):
+        for name, payload in existing_test_payloads().items():
+            with self.subTest(name):
+                expressions = build_facility_location_model(
+                    with_solver_options(payload, presolve=True)
+                )
+                arrays = build_facility_location_model(
+                    with_solver_options(payload, presolve=True, modelBuild='arrays')
+                )
+                self.assertEqual(model_rows(arrays), model_rows(expressions))
+                self.assertAlmostEqual(
+                    arrays['solver'].Objective().offset(),
+                    expressions['solver'].Objective().offset(),
+                )
+                self.assertEqual(arrays['presolve'], expressions['presolve'])
+                for family, variables in arrays['variables'].items():
+                    self.assertEqual(
+                        list(variables),
+                        list(expressions['variables'][family]),
+                    )
+
+    def test_initial_state_and_demand_fix_variables(self):
+        # Demand drops to zero in the last period.
+        payload = model_payload([100, 100, 100, 0])
+        payload['InitialState'] = {'Test Fuel': [[1]]}
+        y, s, x, z = presolved_values(payload)['Test Fuel']
+        # The initial tank is pinned open and can only operate or close.
+        np.testing.assert_array_equal(y[0, 0], [1, 0, 0, 0])
+        np.testing.assert_array_equal(s[0, 0], [0, -1, -1, 0])
+        np.testing.assert_array_equal(x[0, 0], [0, -1, -1, -1])
+        # No transitions exist with a single capacity option.
+        self.assertTrue((z == -1).all())
+
+        payload = model_payload([0, 0, 100, 100])
+        y, s, x, _ = presolved_values(payload)['Test Fuel']
+        # A tank that cannot open before 2030 neither operates nor closes
+        # until the period after it opens.
+        np.testing.assert_array_equal(y[0, 0], [0, -1, -1, -1])
+        np.testing.assert_array_equal(s[0, 0], [0, 0, -1, -1])
+        np.testing.assert_array_equal(x[0, 0], [0, 0, -1, -1])
+
+    def test_presolved_models_are_retargeted(self):
+        payload = with_solver_options(
+            existing_test_payloads()['two_fuels_with_transitions'],
+            presolve=True,
+        )
+        data = merge_changes(payload, {'discountRateAnnual': 0.05})
+        model = build_facility_location_model(payload, keep_names=True)
+        self.assertTrue(retarget_model(model, payload, data))
+        fresh = build_facility_location_model(data, keep_names=True)
+        self.assertEqual(model_rows(model), model_rows(fresh))
+        self.assertAlmostEqual(
+            model['solver'].Objective().offset(),
+            fresh['solver'].Objective().offset(),
+        )
+
+    def test_decomposed_solves_add_up_the_reduction(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        monolithic = solve_facility_location(with_solver_options(payload, presolve=True))
+        decomposed = solve_facility_location(with_solver_options(
+            payload,
+            presolve=True,
+            decomposeByFuel=True,
+            decompositionWorkers=1,
+        ))
+        self.assertEqual(decomposed['presolve'], monolithic['presolve'])
+
+
+if __name__ == '__main__':
+    unittest.main()
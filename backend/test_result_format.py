@@ -0,0 +1,109 @@
+import gzip
+import json
+import unittest
+
+from result_format import (
+    brotli,
+    encode_result,
+    format_result,
+    to_columnar,
+    to_nested,
+)
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import solve_facility_location
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class ResultFormatTest(unittest.TestCase):
+    def test_columnar_round_trips_to_the_nested_result(self):
+        for name, payload in existing_test_payloads().items():
+            with self.subTest(name):
+                result = solve_facility_location(payload)
+                columnar = json.loads(json.dumps(format_result(result, payload, 'columnar')))
+                self.assertEqual(columnar['format'], 'columnar')
+                self.assertNotIn('solution', columnar)
+                restored = to_nested(columnar)
+                self.assertEqual(restored, result)
+                self.assertEqual(list(restored), list(result))
+
+    def test_float_capacities_key_the_nested_result_like_javascript(self):
+        payload = existing_test_payloads()['two_options']
+        payload['Capacities']['Test Fuel'] = [100.0, 200.5]
+        payload['TankOptions']['Test Fuel'][0]['capacityMgoEquivalentTonnes'] = 100.0
+        payload['TankOptions']['Test Fuel'][1]['capacityMgoEquivalentTonnes'] = 200.5
+        result = solve_facility_location(payload)
+        nested = json.loads(json.dumps(result))
+        keys = {
+            capacity
+            for period in nested['solution']['Test Fuel'].values()
+            for tank in period.values()
+            for capacity in tank
+        }
+        # String(100.0) and String(200.5) in JavaScript.
+        self.assertLessEqual(keys, {'100', '200.5'})
+        self.assertIn('100', keys)
+        columnar = json.loads(json.dumps(format_result(result, payload, 'columnar')))
+        self.assertEqual(json.loads(json.dumps(to_nested(columnar))), nested)
+
+    def test_events_are_sparse_and_typed(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        result = solve_facility_location(payload)
+        columnar = to_columnar(result, payload)
+        events = columnar['events']
+        event_types = columnar['dictionaries']['events']
+        transition_rows = [
+            row for row, event in enumerate(events['event'])
+            if event_types[event] == 'transition'
+        ]
+        self.assertEqual(
+            len(transition_rows),
+            sum(
+                len(transitions)
+                for fuel_transitions in result['transitions'].values()
+                for period_transitions in fuel_transitions.values()
+                for transitions in period_transitions.values()
+            ),
+        )
+        for row, event in enumerate(events['event']):
+            self.assertEqual(
+                events['fromOption'][row] is None,
+                event_types[event] != 'transition',
+            )
+        self.assertEqual({len(column) for column in events.values()}, {len(events['event'])})
+
+    def test_nested_stays_the_default(self):
+        payload = existing_test_payloads()['initial_tank']
+        result = solve_facility_location(payload)
+        self.assertIs(format_result(result, payload), result)
+
+
+class EncodeResultTest(unittest.TestCase):
+    def test_gzip_decodes_to_the_json_body(self):
+        result = {'status': 0, 'solution': {}}
+        self.assertEqual(encode_result(result), json.dumps(result).encode('utf-8'))
+        self.assertEqual(json.loads(gzip.decompress(encode_result(result, 'gzip'))), result)
+
+    @unittest.skipIf(brotli is None, 'brotli is unavailable')
+    def test_brotli_decodes_to_the_json_body(self):
+        result = {'status': 0, 'solution': {}}
+        self.assertEqual(json.loads(brotli.decompress(encode_result(result, 'br'))), result)
+
+    @unittest.skipIf(brotli is not None, 'brotli is installed')
+    def test_brotli_without_the_package_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'brotli package'):
+            encode_result({}, 'br')
+
+    def test_unknown_formats_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'resultFormat'):
+            format_result({}, {}, 'csv')
+        with self.assertRaisesRegex(ValueError, 'compression'):
+            encode_result({}, 'zip')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import (
+        SolveControl,
+        build_model,
+        retarget_model,
+        solve_facility_location,
+    )
+    from sessions import SessionNotFoundError, SessionStore, merge_changes
+    from test_array_model_build import model_rows
+    from test_support import with_solver_options
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def what_if_changes(payload):
+    fuel = payload['Fuels'][0]
+    last_period = payload['T'][-1]
+    return {
+        'discountRateAnnual': 0.05,
+        'maintenanceRateAnnual': {fuel: 0.05},
+        'Demand': {fuel: {last_period: payload['Demand'][fuel][last_period] * 0.9}},
+    }
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class RetargetModelTest(unittest.TestCase):
+    def test_retargeted_model_matches_a_fresh_build(self):
+        for name, payload in existing_test_payloads().items():
+            for options in (
+                {},
+                {'modelBuild': 'arrays'},
+                {'engine': 'aggregated'},
+                {'presolve': True},
+            ):
+                with self.subTest(name, **options):
+                    previous = with_solver_options(payload, **options)
+                    data = merge_changes(previous, what_if_changes(previous))
+                    model = build_model(previous, keep_names=True)
+                    self.assertTrue(retarget_model(model, previous, data))
+                    self.assertEqual(
+                        model_rows(model),
+                        model_rows(build_model(data, keep_names=True)),
+                    )
+
+    def test_structural_edits_need_a_rebuild(self):
+        payload = existing_test_payloads()['two_options']
+        fuel = payload['Fuels'][0]
+        # A zero after positive demand adds a permanent_zero_demand row.
+        last_period = payload['T'][-1]
+        for changes in (
+            {'solverOptions': {'symmetryBreaking': True}},
+            {'Demand': {fuel: {last_period: 0}}},
+            {'Capacities': {fuel: [capacity * 2 for capacity in payload['Capacities'][fuel]]}},
+        ):
+            with self.subTest(changes):
+                model = build_model(payload, keep_names=True)
+                rows = model_rows(model)
+                self.assertFalse(
+                    retarget_model(model, payload, merge_changes(payload, changes))
+                )
+                self.assertEqual(model_rows(model), rows)
+
+    def test_cpsat_models_are_not_retargeted(self):
+        payload = with_solver_options(
+            existing_test_payloads()['two_options'],
+            solverBackend='cpsat',
+        )
+        model = build_model(payload)
+        self.assertFalse(
+            retarget_model(model, payload, merge_changes(payload, {'discountRateAnnual': 0.05}))
+        )
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SessionStoreTest(unittest.TestCase):
+    def test_updates_match_cold_solves(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        sessions = SessionStore()
+        opened = sessions.open(payload)
+        self.assertEqual(opened['session']['update'], 'built')
+        session_id = opened['session']['id']
+
+        changes = what_if_changes(payload)
+        updated = sessions.update(session_id, changes)
+        cold = solve_facility_location(merge_changes(payload, changes))
+
+        self.assertEqual(updated['session']['update'], 'inPlace')
+        self.assertEqual(updated['session']['solves'], 2)
+        self.assertEqual(updated['warmStart']['source'], 'previous')
+        # The in-place update is reported as this solve's build.
+        self.assertIn('buildSeconds', updated['timings'])
+        self.assertIn('warmStartSeconds', updated['timings'])
+        self.assertAlmostEqual(
+            updated['costBreakdown']['totalObjectiveUSD'],
+            cold['costBreakdown']['totalObjectiveUSD'],
+            delta=1e-6 * cold['costBreakdown']['totalObjectiveUSD'],
+        )
+
+        rebuilt = sessions.update(session_id, {'solverOptions': {'symmetryBreaking': True}})
+        self.assertEqual(rebuilt['session']['update'], 'rebuilt')
+        self.assertAlmostEqual(
+            rebuilt['costBreakdown']['totalObjectiveUSD'],
+            cold['costBreakdown']['totalObjectiveUSD'],
+            delta=1e-6 * cold['costBreakdown']['totalObjectiveUSD'],
+        )
+
+    def test_cancelled_updates_keep_the_session_open(self):
+        payload = existing_test_payloads()['two_options']
+        sessions = SessionStore()
+        session_id = sessions.open(payload)['session']['id']
+        control = SolveControl()
+        control.cancel()
+        cancelled = sessions.update(session_id, {'discountRateAnnual': 0.05}, control)
+        self.assertTrue(cancelled['cancelled'])
+        updated = sessions.update(session_id, {})
+        self.assertEqual(updated['session']['solves'], 3)
+        self.assertNotIn('cancelled', updated)
+
+    def test_invalid_updates_keep_the_session_scenario(self):
+        payload = existing_test_payloads()['two_options']
+        sessions = SessionStore()
+        session_id = sessions.open(payload)['session']['id']
+        with self.assertRaises(ValueError):
+            sessions.update(session_id, {'discountRateAnnual': -2})
+        self.assertEqual(sessions.sessions[session_id].data, payload)
+
+    def test_closed_and_evicted_sessions_are_not_found(self):
+        payload = existing_test_payloads()['opening_and_maintenance']
+        sessions = SessionStore(max_sessions=1)
+        first = sessions.open(payload)['session']['id']
+        second = sessions.open(payload)['session']['id']
+        with self.assertRaises(SessionNotFoundError):
+            sessions.update(first, {})
+        sessions.close(second)
+        with self.assertRaises(SessionNotFoundError):
+            sessions.close(second)
+
+    def test_decomposed_sessions_are_rejected(self):
+        with self.assertRaises(ValueError):
+            SessionStore().open(with_solver_options(
+                existing_test_payloads()['two_options'],
+                decomposeByFuel=True,
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
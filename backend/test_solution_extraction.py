@@ -0,0 +1,76 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import (
+        CpSatSolver,
+        _extract_tank_plan,
+        _nonzero_values,
+        build_model,
+        solve_model,
+    )
+    from test_support import with_solver_options
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def variable_value(solver, variable):
+    if isinstance(solver, CpSatSolver):
+        return solver.solution_value(variable)
+    return variable.solution_value()
+
+
+PER_TANK_OPTIONS = {
+    'expressions': {},
+    'arrays': {'modelBuild': 'arrays', 'stateFormulation': 'recursive'},
+    'cpsat': {'solverBackend': 'cpsat', 'symmetryBreaking': True},
+}
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SolutionExtractionTest(unittest.TestCase):
+    def test_per_tank_columns_match_the_solver_variables(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        for name, options in PER_TANK_OPTIONS.items():
+            with self.subTest(name):
+                model = build_model(with_solver_options(payload, **options))
+                for family, (keys, columns) in model['columns'].items():
+                    variables = model['variables'][family]
+                    self.assertEqual(keys, list(variables))
+                    self.assertEqual(
+                        columns.tolist(),
+                        [
+                            variable.Index() if name == 'cpsat' else variable.index()
+                            for variable in variables.values()
+                        ],
+                    )
+
+    def test_bulk_extraction_matches_per_variable_values(self):
+        options = dict(PER_TANK_OPTIONS, aggregated={'engine': 'aggregated'})
+        for payload_name, payload in existing_test_payloads().items():
+            for name, solver_options in options.items():
+                with self.subTest(payload_name, options=name):
+                    data = with_solver_options(payload, **solver_options)
+                    model = build_model(data)
+                    result = solve_model(model, data)
+                    self.assertEqual(result['status'], pywraplp.Solver.OPTIMAL)
+
+                    solver = model['solver']
+                    self.assertEqual(
+                        _nonzero_values(model),
+                        {
+                            family: {
+                                key: value
+                                for key, variable in variables.items()
+                                if (value := variable_value(solver, variable))
+                            }
+                            for family, variables in model['variables'].items()
+                        },
+                    )
+                    if model['engine'] == 'perTank':
+                        self.assertEqual(model['plan'], _extract_tank_plan(model))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    import model_tank_index
+    from model_tank_index import (
+        _solver_limits,
+        _termination_reason,
+        _validate_solver_options,
+        solve_facility_location,
+    )
+    from benchmarks.model_build import synthetic_payload
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SolverLimitsTest(unittest.TestCase):
+    def test_requested_limits_are_clamped_by_the_policy(self):
+        policy = {'maxTimeLimitMs': 5000, 'minRelativeGap': 0.01, 'minAbsoluteGapUSD': 100}
+        options = _validate_solver_options({'solverOptions': {
+            'timeLimitMs': 60000,
+            'relativeGap': 0.001,
+            'absoluteGapUSD': 10,
+        }})
+        self.assertEqual(_solver_limits(options, policy), {
+            'timeLimitMs': 5000,
+            'relativeGap': 0.01,
+            'absoluteGapUSD': 100,
+            'clamped': ['timeLimitMs', 'relativeGap', 'absoluteGapUSD'],
+        })
+        # Unrequested defaults follow the policy without being reported.
+        defaults = _solver_limits(_validate_solver_options({}), policy)
+        self.assertEqual(defaults['timeLimitMs'], 5000)
+        self.assertEqual(defaults['relativeGap'], 0.01)
+        self.assertEqual(defaults['absoluteGapUSD'], 100)
+        self.assertEqual(defaults['clamped'], [])
+
+    def test_optimal_solves_report_a_closed_gap(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        for options in ({}, {'solverBackend': 'cpsat'}, {'engine': 'aggregated'}):
+            with self.subTest(options):
+                result = solve_facility_location(with_solver_options(payload, **options))
+                self.assertEqual(result['terminationReason'], 'optimal')
+                self.assertEqual(result['gap'], 0.0)
+                self.assertAlmostEqual(
+                    result['bestBoundUSD'],
+                    result['costBreakdown']['totalObjectiveUSD'],
+                )
+                self.assertEqual(
+                    result['solverLimits']['timeLimitMs'],
+                    model_tank_index.SOLVER_TIME_LIMIT_MS,
+                )
+
+    def test_a_relative_gap_stops_the_search_early(self):
+        payload = existing_test_payloads()['two_options']
+        for backend in ('mpsolver', 'cpsat'):
+            with self.subTest(backend):
+                result = solve_facility_location(
+                    with_solver_options(payload, solverBackend=backend, relativeGap=0.5)
+                )
+                self.assertIn(result['terminationReason'], ('optimal', 'gapLimit'))
+                self.assertLessEqual(result['gap'], 0.5)
+                self.assertLessEqual(
+                    result['bestBoundUSD'],
+                    result['costBreakdown']['totalObjectiveUSD'],
+                )
+
+    def test_the_time_limit_is_reported_when_it_ends_the_search(self):
+        # Takes several seconds to prove optimal on one core.
+        payload = with_solver_options(
+            synthetic_payload(2, 4, 8, 4),
+            solverBackend='cpsat',
+            searchWorkers=1,
+            timeLimitMs=200,
+        )
+        result = solve_facility_location(payload)
+        self.assertLess(result['solveCpuTimeSeconds'], 5.0)
+        if result['status'] == pywraplp.Solver.FEASIBLE:
+            self.assertEqual(result['terminationReason'], 'timeLimit')
+            self.assertGreater(result['gap'], 0.0)
+
+    def test_decomposed_solves_add_up_the_fuel_bounds(self):
+        payload = with_solver_options(
+            existing_test_payloads()['two_fuels_with_transitions'],
+            decomposeByFuel=True,
+            decompositionWorkers=1,
+            absoluteGapUSD=100,
+        )
+        result = solve_facility_location(payload)
+        fuels = result['decomposition']['fuels'].values()
+        self.assertAlmostEqual(
+            result['bestBoundUSD'],
+            sum(fuel['bestBoundUSD'] for fuel in fuels),
+        )
+        self.assertEqual(result['solverLimits']['absoluteGapUSD'], 100)
+        self.assertEqual(result['terminationReason'], 'optimal')
+
+    def test_termination_reasons(self):
+        self.assertEqual(_termination_reason(pywraplp.Solver.OPTIMAL, 10.0, 9.0), 'gapLimit')
+        self.assertEqual(_termination_reason(pywraplp.Solver.FEASIBLE, 10.0, 9.0), 'timeLimit')
+        self.assertEqual(
+            _termination_reason(pywraplp.Solver.FEASIBLE, 10.0, 9.0, cancelled=True),
+            'cancelled',
+        )
+        self.assertEqual(_termination_reason(pywraplp.Solver.NOT_SOLVED), 'timeLimit')
+        self.assertEqual(_termination_reason(pywraplp.Solver.INFEASIBLE), 'infeasible')
+
+    def test_invalid_time_limits_are_rejected(self):
+        for time_limit in (0, -5, 'fast'):
+            with self.subTest(time_limit):
+                with self.assertRaises(ValueError):
+                    solve_facility_location(
+                        with_solver_options(model_payload([0, 100, 100, 100]), timeLimitMs=time_limit)
+                    )
+
+
+if __name__ == '__main__':
+    unittest.main()
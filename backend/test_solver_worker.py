@@ -0,0 +1,181 @@
+import glob
+import io
+import json
+import os
+import tempfile
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from audit_journal import AuditJournal, read_journal
+    from solver_worker import _parse_arguments, serve
+    from benchmarks.model_build import synthetic_payload
+    from test_model_tank_index_structure import model_payload
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def run_frames(frames, **options):
+    input_stream = io.StringIO(''.join(json.dumps(frame) + '\n' for frame in frames))
+    output_stream = io.StringIO()
+    completed = serve(input_stream, output_stream, **options)
+    responses = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+    return completed, responses
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SolverWorkerProtocolTest(unittest.TestCase):
+    def test_ready_frame_precedes_one_response_per_request(self):
+        payload = model_payload([0, 100, 100, 100])
+        completed, responses = run_frames([
+            {'id': 1, 'payload': payload},
+            {'id': 2, 'payload': payload},
+        ])
+        self.assertEqual(completed, 2)
+        self.assertEqual(responses[0], {'ready': True})
+        self.assertEqual([response['id'] for response in responses[1:]], [1, 2])
+        for response in responses[1:]:
+            self.assertEqual(response['code'], 0)
+            self.assertEqual(response['result']['status'], pywraplp.Solver.OPTIMAL)
+
+    def test_validation_errors_use_exit_code_two(self):
+        payload = model_payload([0, 100, 100, 100])
+        del payload['Demand']
+        _, responses = run_frames([{'id': 'a', 'payload': payload}])
+        self.assertEqual(responses[1]['code'], 2)
+        self.assertEqual(responses[1]['result']['error'], 'validation_error')
+
+    def test_frames_that_are_not_objects_get_a_validation_error(self):
+        payload = model_payload([0, 100, 100, 100])
+        completed, responses = run_frames([[], 1, {'id': 3, 'payload': payload}])
+        self.assertEqual(completed, 3)
+        for response in responses[1:3]:
+            self.assertIsNone(response['id'])
+            self.assertEqual(response['code'], 2)
+            self.assertEqual(response['result']['error'], 'validation_error')
+        self.assertEqual(responses[3]['id'], 3)
+        self.assertEqual(responses[3]['code'], 0)
+
+    def test_responses_report_parse_and_serialization_time(self):
+        payload = model_payload([0, 100, 100, 100])
+        _, responses = run_frames([{'id': 1, 'payload': payload}])
+        response = responses[1]
+        self.assertGreaterEqual(response['serializeSeconds'], 0.0)
+        timings = response['result']['timings']
+        for phase in ('parse', 'validation', 'preparation', 'build', 'solve', 'extraction'):
+            self.assertGreaterEqual(timings[f'{phase}Seconds'], 0.0, phase)
+
+    def test_result_format_frames_select_the_columnar_format(self):
+        payload = model_payload([0, 100, 100, 100])
+        _, responses = run_frames([
+            {'id': 1, 'payload': payload, 'resultFormat': 'columnar'},
+            {'id': 2, 'payload': payload, 'resultFormat': 'csv'},
+        ])
+        self.assertEqual(responses[1]['code'], 0)
+        self.assertEqual(responses[1]['result']['format'], 'columnar')
+        self.assertIn('parseSeconds', responses[1]['result']['timings'])
+        self.assertEqual(responses[2]['code'], 2)
+        self.assertIn('resultFormat', responses[2]['result']['message'])
+
+    def test_payload_requests_are_journaled_by_request_id(self):
+        payload = model_payload([0, 100, 100, 100])
+        directory = tempfile.mkdtemp()
+        journal = AuditJournal(directory)
+        run_frames(
+            [
+                {'id': 1, 'payload': payload, 'requestId': 'abc'},
+                {'id': 2, 'payload': payload},
+            ],
+            journal=journal,
+        )
+        journal.close()
+        (path,) = glob.glob(os.path.join(directory, '*.jsonl.gz'))
+        records = list(read_journal(path))
+        self.assertEqual(
+            [record['requestId'] for record in records],
+            ['abc', f'{os.getpid()}-2'],
+        )
+        self.assertEqual(records[0]['payload'], payload)
+        self.assertEqual(records[0]['response']['code'], 0)
+        self.assertNotIn('id', records[0]['response'])
+
+    def test_worker_retires_after_max_jobs(self):
+        payload = model_payload([0, 100, 100, 100])
+        completed, responses = run_frames(
+            [{'id': index, 'payload': payload} for index in range(3)],
+            max_jobs=2,
+        )
+        self.assertEqual(completed, 2)
+        self.assertEqual(len(responses), 3)
+        self.assertTrue(responses[-1]['retiring'])
+
+    def test_session_frames_open_update_and_close(self):
+        payload = model_payload([0, 100, 100, 100])
+        _, responses = run_frames([
+            {'id': 1, 'session': {'action': 'open', 'payload': payload}},
+        ])
+        session_id = responses[1]['result']['session']['id']
+        _, responses = run_frames([
+            {'id': 2, 'session': {'action': 'update', 'sessionId': session_id, 'changes': {}}},
+        ])
+        # A fresh worker process does not know the session.
+        self.assertEqual(responses[1]['code'], 2)
+        self.assertEqual(responses[1]['result']['error'], 'session_not_found')
+
+    def test_worker_keeps_sessions_past_max_jobs(self):
+        payload = model_payload([0, 100, 100, 100])
+        input_stream = io.StringIO(
+            json.dumps({'id': 1, 'session': {'action': 'open', 'payload': payload}}) + '\n'
+        )
+        output_stream = io.StringIO()
+        serve(input_stream, output_stream, max_jobs=1)
+        opened = json.loads(output_stream.getvalue().splitlines()[1])
+        self.assertEqual(opened['code'], 0)
+        self.assertNotIn('retiring', opened)
+
+    def test_progress_frames_precede_the_response(self):
+        payload = model_payload([0, 100, 100, 100])
+        payload['solverOptions'] = {'solverBackend': 'cpsat'}
+        _, responses = run_frames([{'id': 5, 'payload': payload, 'progress': True}])
+        progress = [response['progress'] for response in responses[1:-1]]
+        self.assertEqual([event['event'] for event in progress[:2]], ['validated', 'model'])
+        incumbents = progress[2:]
+        self.assertTrue(incumbents)
+        self.assertTrue(all(event['event'] == 'incumbent' for event in incumbents))
+        self.assertTrue(all(response['id'] == 5 for response in responses[1:]))
+
+        result = responses[-1]['result']
+        self.assertEqual(progress[1]['variableCount'], result['variableCount'])
+        self.assertAlmostEqual(
+            incumbents[-1]['objectiveUSD'],
+            result['costBreakdown']['totalObjectiveUSD'],
+        )
+        self.assertEqual(incumbents[-1]['solution'], result['solution'])
+        self.assertNotIn('cancelled', result)
+
+    def test_cancel_frames_stop_a_queued_or_running_solve(self):
+        # Takes several seconds to prove optimal on one core.
+        payload = synthetic_payload(2, 4, 8, 4)
+        payload['solverOptions'] = {'solverBackend': 'cpsat'}
+        _, responses = run_frames([
+            {'id': 6, 'payload': payload},
+            {'cancel': 6},
+        ])
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(responses[1]['code'], 0)
+        self.assertTrue(responses[1]['result']['cancelled'])
+        self.assertLess(responses[1]['result']['solveCpuTimeSeconds'], 5.0)
+
+    def test_solver_limit_flags_set_the_policy_fields(self):
+        arguments = _parse_arguments([
+            '--max-time-limit-ms', '5000',
+            '--min-relative-gap', '0.01',
+            '--min-absolute-gap-usd', '250',
+        ])
+        self.assertEqual(arguments.max_time_limit_ms, 5000)
+        self.assertEqual(arguments.min_relative_gap, 0.01)
+        self.assertEqual(arguments.min_absolute_gap_usd, 250)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import copy
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import build_facility_location_model, solve_facility_location
+    from test_array_model_build import model_rows
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def annual_payload(period_count):
+    payload = model_payload([0, 100, 100, 100])
+    periods = [str(2025 + index) for index in range(period_count)]
+    payload['T'] = periods
+    payload['planningPeriodYears'] = 1
+    payload['Demand']['Test Fuel'] = {
+        period: 0 if index == 0 else 100 for index, period in enumerate(periods)
+    }
+    return payload
+
+
+def operational_nonzeros(model):
+    _, constraints = model_rows(model)
+    return sum(
+        len(terms)
+        for name, _, _, terms in constraints
+        if name.startswith('operational[')
+    )
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class StateFormulationTest(unittest.TestCase):
+    def test_recursive_formulation_reaches_the_cumulative_optimum(self):
+        payloads = existing_test_payloads()
+        payloads['permanent_drop'] = model_payload([0, 100, 0, 0])
+        for name, payload in payloads.items():
+            cumulative = solve_facility_location(payload)
+            for options in (
+                {},
+                {'modelBuild': 'arrays'},
+                {'engine': 'aggregated'},
+            ):
+                with self.subTest(name, **options):
+                    recursive = solve_facility_location(with_solver_options(
+                        payload,
+                        stateFormulation='recursive',
+                        **options,
+                    ))
+                    self.assertEqual(recursive['status'], pywraplp.Solver.OPTIMAL)
+                    self.assertAlmostEqual(
+                        recursive['costBreakdown']['totalObjectiveUSD'],
+                        cumulative['costBreakdown']['totalObjectiveUSD'],
+                        places=6,
+                    )
+
+    def test_array_build_matches_the_recursive_expression_build(self):
+        payload = with_solver_options(
+            existing_test_payloads()['two_fuels_with_transitions'],
+            stateFormulation='recursive',
+        )
+        arrays = copy.deepcopy(payload)
+        arrays['solverOptions']['modelBuild'] = 'arrays'
+        self.assertEqual(
+            model_rows(build_facility_location_model(arrays)),
+            model_rows(build_facility_location_model(payload)),
+        )
+
+    def test_operational_rows_grow_linearly_with_the_horizon(self):
+        nonzeros = {}
+        for state_formulation in ('cumulative', 'recursive'):
+            nonzeros[state_formulation] = [
+                operational_nonzeros(build_facility_location_model(
+                    with_solver_options(
+                        annual_payload(period_count),
+                        stateFormulation=state_formulation,
+                    )
+                ))
+                for period_count in (10, 20)
+            ]
+        # Each recursive row has four terms per option; cumulative rows grow
+        # with the number of earlier periods.
+        self.assertEqual(nonzeros['recursive'], [4 * 9, 4 * 19])
+        self.assertEqual(nonzeros['cumulative'], [9 + 2 * 45, 19 + 2 * 190])
+
+    def test_each_zero_demand_period_gets_one_row(self):
+        model = build_facility_location_model(with_solver_options(
+            model_payload([0, 100, 0, 0]),
+            stateFormulation='recursive',
+        ))
+        names = [name for name, _, _, _ in model_rows(model)[1]]
+        self.assertEqual(
+            [name for name in names if name.startswith('permanent_zero_demand[')],
+            ['permanent_zero_demand[0,2]', 'permanent_zero_demand[0,3]'],
+        )
+
+    def test_unknown_formulation_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_facility_location_model(with_solver_options(
+                model_payload([0, 100, 100, 100]),
+                stateFormulation='flow',
+            ))
+
+
+if __name__ == '__main__':
+    unittest.main()
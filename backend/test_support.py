@@ -0,0 +1,9 @@
+import copy
+
+# Helpers shared by the test modules.
+
+
+def with_solver_options(payload, **options):
+    payload = copy.deepcopy(payload)
+    payload['solverOptions'] = options
+    return payload
@@ -0,0 +1,130 @@
+import copy
+import unittest
+from unittest import mock
+
+try:
+    from ortools.linear_solver import pywraplp
+    import sweep
+    from model_tank_index import SolveControl, solve_facility_location
+    from sessions import merge_changes
+    from sweep import run_sweep, snake_order
+    from test_solver_worker import run_frames
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def transition_sweep(payload):
+    fuel = payload['Fuels'][0]
+    return {
+        'payload': payload,
+        'parameters': [
+            {'field': 'transitionCostRate', 'start': 0.0, 'stop': 3.0, 'steps': 4},
+            {
+                'field': 'technologyCostAdjustmentRateAnnual',
+                'fuel': fuel,
+                'values': [-0.02, 0.02],
+            },
+        ],
+    }
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SweepTest(unittest.TestCase):
+    def test_snake_order_visits_every_point_by_single_steps(self):
+        order = list(snake_order([3, 2, 2]))
+        self.assertEqual(sorted(order), sorted(set(order)))
+        self.assertEqual(len(order), 12)
+        for first, second in zip(order, order[1:]):
+            self.assertEqual(sum(abs(a - b) for a, b in zip(first, second)), 1)
+
+    def test_sweep_matches_independent_solves(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        fuel = payload['Fuels'][0]
+        sweep = run_sweep(transition_sweep(payload))
+
+        self.assertEqual(len(sweep['rows']), 8)
+        self.assertEqual(sweep['modelUpdates']['built'], 1)
+        objective_column = sweep['columns'].index('objectiveUSD')
+        for row in sweep['rows']:
+            rate, adjustment = row[:2]
+            cold = solve_facility_location(merge_changes(payload, {
+                'transitionCostRate': rate,
+                'technologyCostAdjustmentRateAnnual': {fuel: adjustment},
+            }))
+            self.assertEqual(row[sweep['columns'].index('status')], pywraplp.Solver.OPTIMAL)
+            self.assertAlmostEqual(
+                row[objective_column],
+                cold['costBreakdown']['totalObjectiveUSD'],
+                delta=1e-6 * cold['costBreakdown']['totalObjectiveUSD'],
+            )
+
+    def test_plan_changes_are_reported_between_grid_neighbours(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        sweep = run_sweep({
+            'payload': payload,
+            'parameters': [
+                {'field': 'transitionCostRate', 'start': 0.0, 'stop': 3.0, 'steps': 7},
+            ],
+        })
+        plan_ids = [row[-1] for row in sweep['rows']]
+        self.assertGreater(sweep['planCount'], 1)
+        self.assertEqual(len(sweep['planChanges']), sum(
+            first != second for first, second in zip(plan_ids, plan_ids[1:])
+        ))
+        for change in sweep['planChanges']:
+            self.assertEqual(change['parameter'], 'transitionCostRate')
+            self.assertNotEqual(change['fromPlanId'], change['toPlanId'])
+
+    def test_invalid_sweeps_are_rejected(self):
+        payload = existing_test_payloads()['two_options']
+        for parameters in (
+            [],
+            [{'field': 'Demand', 'values': [1.0]}],
+            [{'field': 'maintenanceRateAnnual', 'values': [0.01]}],
+            [{'field': 'discountRateAnnual', 'values': []}],
+            [{'field': 'discountRateAnnual', 'start': 0, 'stop': 1, 'steps': 0}],
+            [{'field': 'discountRateAnnual', 'values': [0.01]}] * 2,
+            [{'field': 'discountRateAnnual', 'start': 0, 'stop': 1, 'steps': 401}],
+        ):
+            with self.subTest(parameters):
+                with self.assertRaises(ValueError):
+                    run_sweep({'payload': payload, 'parameters': parameters})
+
+    def test_cancelled_sweeps_return_the_finished_points(self):
+        request = transition_sweep(existing_test_payloads()['two_options'])
+        control = SolveControl()
+        solve_model = sweep.solve_model
+        solves = []
+
+        def cancel_after_three(*args, **kwargs):
+            solves.append(args)
+            result = solve_model(*args, **kwargs)
+            if len(solves) == 3:
+                control.cancel()
+            return result
+
+        with mock.patch('sweep.solve_model', side_effect=cancel_after_three):
+            cancelled = run_sweep(request, control)
+        self.assertTrue(cancelled['cancelled'])
+        self.assertEqual(len(cancelled['rows']), 3)
+        self.assertEqual(len(solves), 3)
+        complete = run_sweep(request)
+        self.assertNotIn('cancelled', complete)
+        # Rows are in grid order; the snake visits (0, 0), (0, 1) and (1, 1).
+        self.assertEqual(cancelled['rows'], [complete['rows'][i] for i in (0, 1, 3)])
+
+    def test_worker_serves_sweep_frames(self):
+        request = transition_sweep(existing_test_payloads()['two_options'])
+        _, responses = run_frames([{'id': 1, 'sweep': request}])
+        self.assertEqual(responses[1]['code'], 0)
+        self.assertEqual(len(responses[1]['result']['rows']), 8)
+
+        invalid = copy.deepcopy(request)
+        invalid['parameters'][0]['field'] = 'Demand'
+        _, responses = run_frames([{'id': 2, 'sweep': invalid}])
+        self.assertEqual(responses[1]['code'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
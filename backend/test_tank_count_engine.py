@@ -0,0 +1,74 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import build_tank_count_model, solve_facility_location
+    from test_fuel_decomposition import two_fuel_payload
+    from test_model_tank_index_structure import model_payload
+    from test_support import with_solver_options
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def existing_test_payloads():
+    initial_tank = model_payload([100, 100, 100, 100])
+    initial_tank['InitialState']['Test Fuel'] = [[1]]
+
+    two_options = model_payload([0, 150, 300, 250])
+    two_options['Capacities']['Test Fuel'] = [100, 200]
+    two_options['TankOptions']['Test Fuel'].append({
+        'optimizerName': 'Test Fuel',
+        'capacityMgoEquivalentTonnes': 200,
+        'baseInvestmentCostUSD': 15_000_000.7654321,
+    })
+    two_options['InitialState']['Test Fuel'] = [[0, 0]] * 3
+
+    return {
+        'opening_and_maintenance': model_payload([0, 100, 100, 100]),
+        'initial_tank': initial_tank,
+        'decommissioning': model_payload([0, 100, 100, 0]),
+        'two_options': two_options,
+        'two_fuels_with_transitions': two_fuel_payload(),
+    }
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class TankCountEngineEquivalenceTest(unittest.TestCase):
+    def test_aggregated_engine_reaches_the_per_tank_objective(self):
+        for name, payload in existing_test_payloads().items():
+            with self.subTest(name):
+                per_tank = solve_facility_location(with_solver_options(payload, engine='perTank'))
+                aggregated = solve_facility_location(with_solver_options(payload, engine='aggregated'))
+                self.assertEqual(per_tank['status'], pywraplp.Solver.OPTIMAL)
+                self.assertEqual(aggregated['status'], pywraplp.Solver.OPTIMAL)
+                self.assertAlmostEqual(
+                    aggregated['costBreakdown']['totalObjectiveUSD'],
+                    per_tank['costBreakdown']['totalObjectiveUSD'],
+                    places=6,
+                )
+
+    def test_counts_map_back_to_the_per_tank_response_shape(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        per_tank = solve_facility_location(with_solver_options(payload, engine='perTank'))
+        aggregated = solve_facility_location(with_solver_options(payload, engine='aggregated'))
+
+        self.assertEqual(aggregated['solution'], per_tank['solution'])
+        self.assertEqual(aggregated['transitions'], per_tank['transitions'])
+        self.assertLess(aggregated['variableCount'], per_tank['variableCount'])
+
+    def test_initial_tanks_keep_their_rows(self):
+        payload = model_payload([100, 200, 200, 200])
+        payload['InitialState']['Test Fuel'] = [[0], [1]]
+        result = solve_facility_location(with_solver_options(payload, engine='aggregated'))
+        initial_period = result['solution']['Test Fuel']['2025']
+        self.assertEqual(list(initial_period), ['Tank_2'])
+        self.assertEqual(initial_period['Tank_2'][100]['opened'], 1)
+
+    def test_opening_count_is_limited_by_the_tank_rows(self):
+        model = build_tank_count_model(model_payload([0, 100, 100, 100]))
+        constraint = model['solver'].LookupConstraint('tank_count[0]')
+        self.assertEqual(constraint.ub(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
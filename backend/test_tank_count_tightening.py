@@ -0,0 +1,125 @@
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from financial_parameters import prepare_financial_costs_for_model
+    from model_tank_index import (
+        build_facility_location_model,
+        solve_facility_location,
+    )
+    from tank_heuristics import greedy_fuel_plan, plan_cost
+    from test_support import with_solver_options
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def many_row_payload():
+    # 20 demand-bound rows of the 100 t option, but large tanks are far
+    # cheaper per tonne, so an optimal plan needs only a few of them.
+    payload = model_payload([0, 1000, 1500, 2000])
+    capacities = [100, 500, 1000]
+    payload['Capacities']['Test Fuel'] = capacities
+    payload['TankOptions']['Test Fuel'] = [
+        {
+            'optimizerName': 'Test Fuel',
+            'capacityMgoEquivalentTonnes': capacity,
+            'baseInvestmentCostUSD': base_cost,
+        }
+        for capacity, base_cost in zip(
+            capacities,
+            [900_000.0, 2_100_000.0, 3_300_000.0],
+        )
+    ]
+    payload['InitialState']['Test Fuel'] = [[0, 0, 0]] * 20
+    return payload
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class TankCountTighteningTest(unittest.TestCase):
+    def test_tightening_keeps_the_optimum(self):
+        cases = [
+            (name, payload, engine)
+            for name, payload in existing_test_payloads().items()
+            for engine in ('perTank', 'aggregated')
+        ]
+        # The untightened per-tank model of this scenario is slow to prove.
+        cases.append(('many_rows', many_row_payload(), 'aggregated'))
+        for name, payload, engine in cases:
+            with self.subTest(name, engine=engine):
+                loose = solve_facility_location(with_solver_options(
+                    payload,
+                    engine=engine,
+                    tightenTankCounts=False,
+                ))
+                tight = solve_facility_location(
+                    with_solver_options(payload, engine=engine)
+                )
+                self.assertEqual(tight['status'], pywraplp.Solver.OPTIMAL)
+                self.assertAlmostEqual(
+                    tight['costBreakdown']['totalObjectiveUSD'],
+                    loose['costBreakdown']['totalObjectiveUSD'],
+                    places=6,
+                )
+
+    def test_many_rows_are_cut(self):
+        tight = build_facility_location_model(many_row_payload())
+        bounds = tight['tankCountBounds']['Test Fuel']
+        self.assertEqual(bounds['demandBound'], 20)
+        self.assertLess(bounds['tankRows'], 20)
+        self.assertEqual(tight['tankCounts']['Test Fuel'], bounds['tankRows'])
+        loose = build_facility_location_model(
+            with_solver_options(many_row_payload(), tightenTankCounts=False)
+        )
+        self.assertLess(
+            tight['solver'].NumVariables(),
+            loose['solver'].NumVariables(),
+        )
+        self.assertIsNone(loose['tankCountBounds'])
+
+    def test_greedy_plan_cost_bounds_the_optimum(self):
+        payload = many_row_payload()
+        prepared = prepare_financial_costs_for_model(payload)['Test Fuel']
+        plan = greedy_fuel_plan(
+            payload['Demand']['Test Fuel'],
+            payload['T'],
+            payload['Capacities']['Test Fuel'],
+            prepared,
+            payload['InitialState']['Test Fuel'],
+        )
+        self.assertEqual([tank['row'] for tank in plan], list(range(len(plan))))
+        result = solve_facility_location(payload)
+        self.assertGreaterEqual(
+            plan_cost(plan, prepared),
+            result['costBreakdown']['totalObjectiveUSD'],
+        )
+
+    def test_pinned_rows_keep_their_tank_names(self):
+        payload = many_row_payload()
+        payload['Demand']['Test Fuel']['2025'] = 100
+        payload['InitialState']['Test Fuel'] = (
+            [[0, 0, 0]] * 18 + [[1, 0, 0]] + [[0, 0, 0]]
+        )
+        model = build_facility_location_model(payload)
+        self.assertEqual(model['tankCounts']['Test Fuel'], 19)
+        result = solve_facility_location(
+            with_solver_options(payload, engine='aggregated')
+        )
+        self.assertIn('Tank_19', result['solution']['Test Fuel']['2025'])
+
+    def test_short_initial_state_is_padded(self):
+        payload = many_row_payload()
+        payload['InitialState']['Test Fuel'] = []
+        model = build_facility_location_model(
+            with_solver_options(payload, tightenTankCounts=False)
+        )
+        self.assertEqual(model['initialState']['Test Fuel'], [[0, 0, 0]] * 20)
+
+        payload['InitialState']['Test Fuel'] = [[0, 0, 0]] * 21
+        with self.assertRaisesRegex(ValueError, 'at most 20 tank rows'):
+            build_facility_location_model(payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
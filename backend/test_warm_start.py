@@ -0,0 +1,154 @@
+import copy
+import unittest
+
+try:
+    from ortools.linear_solver import pywraplp
+    from model_tank_index import build_facility_location_model, solve_facility_location
+    from tank_heuristics import tank_plan_keys
+    from test_model_tank_index_structure import model_payload
+    from test_tank_count_engine import existing_test_payloads
+    from warm_start import DEFAULT_PLAN_STORE, SolvedPlanStore
+    from test_support import with_solver_options
+except ImportError:  # pragma: no cover - exercised only without solver dependency
+    pywraplp = None
+
+
+def with_demand(payload, demand):
+    payload = copy.deepcopy(payload)
+    fuel = payload['Fuels'][0]
+    payload['Demand'][fuel] = dict(zip(payload['T'], demand))
+    return payload
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class SolvedPlanStoreTest(unittest.TestCase):
+    def test_nearest_plan_has_the_same_structure_and_closest_demand(self):
+        store = SolvedPlanStore()
+        payload = model_payload([0, 100, 100, 100])
+        store.remember(with_demand(payload, [0, 100, 100, 100]), {'y': {'near'}})
+        store.remember(with_demand(payload, [0, 900, 900, 900]), {'y': {'far'}})
+        other_structure = copy.deepcopy(payload)
+        other_structure['T'] = other_structure['T'][:3]
+        store.remember(other_structure, {'y': {'other'}})
+
+        plan, distance = store.nearest(with_demand(payload, [0, 120, 100, 100]))
+
+        self.assertEqual(plan, {'y': frozenset({'near'})})
+        self.assertGreater(distance, 0.0)
+        self.assertIsNone(SolvedPlanStore().nearest(payload))
+
+    def test_least_recently_used_plans_are_evicted(self):
+        store = SolvedPlanStore(max_entries=2)
+        payload = model_payload([0, 100, 100, 100])
+        for demand in (100, 200, 300):
+            store.remember(with_demand(payload, [0, demand, demand, demand]), {})
+        self.assertEqual(
+            [features[3] for _, features, _ in store.entries.values()],
+            [200.0, 300.0],
+        )
+
+
+@unittest.skipIf(pywraplp is None, 'OR-Tools is unavailable')
+class WarmStartTest(unittest.TestCase):
+    def setUp(self):
+        DEFAULT_PLAN_STORE.clear()
+
+    def test_tank_plan_keys_follow_the_tank_lifetime(self):
+        plan = [
+            {'row': 0, 'option': 1, 'openedPeriod': 0, 'closedPeriod': 2},
+            {'row': 1, 'option': 0, 'openedPeriod': 1, 'closedPeriod': None},
+        ]
+        self.assertEqual(
+            tank_plan_keys(3, plan, 4),
+            {
+                'y': {(3, 0, 1, 0), (3, 1, 0, 1)},
+                's': {(3, 0, 1, 1), (3, 1, 0, 2), (3, 1, 0, 3)},
+                'x': {(3, 0, 1, 2)},
+                'z': set(),
+            },
+        )
+
+    def test_warm_started_solves_match_cold_solves(self):
+        for name, payload in existing_test_payloads().items():
+            cold = solve_facility_location(payload)
+            self.assertNotIn('warmStart', cold)
+            for engine in ('perTank', 'aggregated'):
+                for backend in ('mpsolver', 'cpsat'):
+                    for source in ('greedy', 'nearest'):
+                        with self.subTest(name, engine=engine, backend=backend, source=source):
+                            warm = solve_facility_location(with_solver_options(
+                                payload,
+                                engine=engine,
+                                solverBackend=backend,
+                                warmStart=source,
+                            ))
+                            self.assertEqual(warm['status'], pywraplp.Solver.OPTIMAL)
+                            self.assertAlmostEqual(
+                                warm['costBreakdown']['totalObjectiveUSD'],
+                                cold['costBreakdown']['totalObjectiveUSD'],
+                                delta=1e-6 * cold['costBreakdown']['totalObjectiveUSD'],
+                            )
+                            report = warm['warmStart']
+                            self.assertEqual(report['source'], source)
+                            self.assertEqual(report['hintedVariables'], warm['variableCount'])
+                            self.assertGreaterEqual(
+                                report['hintObjectiveUSD'] * (1 + 1e-9),
+                                warm['costBreakdown']['totalObjectiveUSD'],
+                            )
+                            self.assertAlmostEqual(
+                                report['improvementUSD'],
+                                report['hintObjectiveUSD']
+                                - warm['costBreakdown']['totalObjectiveUSD'],
+                            )
+                            if backend == 'cpsat':
+                                self.assertGreaterEqual(report['firstSolutionSeconds'], 0.0)
+                            else:
+                                self.assertIsNone(report['firstSolutionSeconds'])
+
+    def test_nearest_reuses_the_previous_plan_and_falls_back_to_greedy(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        first = solve_facility_location(with_solver_options(payload, warmStart='nearest'))
+        self.assertEqual(first['warmStart']['source'], 'greedy')
+        self.assertIsNone(first['warmStart']['scenarioDistance'])
+
+        second = solve_facility_location(with_solver_options(payload, warmStart='nearest'))
+        self.assertEqual(second['warmStart']['source'], 'nearest')
+        self.assertEqual(second['warmStart']['scenarioDistance'], 0.0)
+        self.assertAlmostEqual(
+            second['warmStart']['hintObjectiveUSD'],
+            first['costBreakdown']['totalObjectiveUSD'],
+            delta=1e-6 * first['costBreakdown']['totalObjectiveUSD'],
+        )
+        self.assertAlmostEqual(
+            second['warmStart']['improvementUSD'],
+            0.0,
+            delta=1e-6 * first['costBreakdown']['totalObjectiveUSD'],
+        )
+
+    def test_cold_solves_do_not_feed_the_plan_store(self):
+        solve_facility_location(existing_test_payloads()['two_fuels_with_transitions'])
+        self.assertEqual(len(DEFAULT_PLAN_STORE.entries), 0)
+
+    def test_decomposed_solves_report_warm_starts_per_fuel(self):
+        payload = existing_test_payloads()['two_fuels_with_transitions']
+        result = solve_facility_location(with_solver_options(
+            payload,
+            decomposeByFuel=True,
+            decompositionWorkers=1,
+            warmStart='greedy',
+        ))
+        for fuel in payload['Fuels']:
+            self.assertEqual(
+                result['decomposition']['fuels'][fuel]['warmStart']['source'],
+                'greedy',
+            )
+
+    def test_unknown_warm_start_source_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_facility_location_model(
+                with_solver_options(model_payload([0, 100, 100, 100]), warmStart='last')
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
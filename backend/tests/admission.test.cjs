@@ -0,0 +1,130 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+const path = require("node:path");
+
+const { SolverPool } = require("../solverPool.js");
+
+// Resolves once the worker has answered a first job, so later jobs are
+// dispatched as soon as they are submitted.
+async function fakePool(options = {}) {
+  const pool = new SolverPool({
+    size: 1,
+    pythonExecutable: process.execPath,
+    scriptPath: path.join(__dirname, "fixtures", "fake_worker.cjs"),
+    killGraceMs: 50,
+    ...options,
+  }).start();
+  await pool.submit({ label: "warm-up" });
+  return pool;
+}
+
+test("a full queue rejects new jobs unless a lower-priority job can be displaced", async () => {
+  const pool = await fakePool({ maxQueued: 1 });
+  try {
+    const running = pool.submit({ delayMs: 200, label: "running" });
+    const low = pool.submit({ label: "low" });
+    const rejected = await pool.submit({ label: "rejected" });
+    assert.equal(rejected.code, 2);
+    assert.equal(rejected.result.error, "queue_full");
+    assert.ok(rejected.result.retryAfterSeconds >= 1);
+    assert.ok(rejected.queueWaitSeconds >= 0);
+
+    const high = pool.submit({ label: "high" }, { priority: 1 });
+    assert.equal((await low).result.error, "queue_full");
+    assert.equal((await running).result.label, "running");
+    assert.equal((await high).result.label, "high");
+  } finally {
+    pool.close();
+  }
+});
+
+test("queued jobs run by priority, first come first served within one", async () => {
+  const pool = await fakePool();
+  try {
+    const finished = [];
+    const submit = (label, priority, delayMs = 0) => pool
+      .submit({ label, delayMs }, { priority })
+      .then((response) => finished.push(response.result.label));
+    await Promise.all([
+      submit("running", 0, 100),
+      submit("low-1", 0),
+      submit("high", 1),
+      submit("low-2", 0),
+    ]);
+    assert.deepEqual(finished, ["running", "high", "low-1", "low-2"]);
+  } finally {
+    pool.close();
+  }
+});
+
+test("jobs past their deadline leave the queue or stop with their best plan", async () => {
+  const pool = await fakePool();
+  try {
+    const running = pool.submit({ delayMs: 5000, label: "running" }, { timeoutMs: 100 });
+    const queued = await pool.submit({ label: "queued" }, { timeoutMs: 30 });
+    assert.equal(queued.code, 2);
+    assert.equal(queued.result.error, "deadline_exceeded");
+    assert.ok(queued.queueWaitSeconds >= 0.02);
+
+    const stopped = await running;
+    assert.equal(stopped.code, 0);
+    assert.equal(stopped.result.cancelled, true);
+    assert.equal(stopped.result.deadlineExceeded, true);
+  } finally {
+    pool.close();
+  }
+});
+
+test("a worker that ignores cancellation is killed and replaced", async () => {
+  const pool = await fakePool();
+  try {
+    const expired = await pool.submit({ delayMs: 5000, ignoreCancel: true }, { timeoutMs: 30 });
+    assert.equal(expired.result.error, "deadline_exceeded");
+
+    const controller = new AbortController();
+    const abandoned = pool.submit(
+      { delayMs: 5000, ignoreCancel: true },
+      { signal: controller.signal }
+    );
+    setTimeout(() => controller.abort(), 30);
+    assert.equal((await abandoned).result.error, "cancelled");
+
+    const next = await pool.submit({ label: "next" });
+    assert.equal(next.result.label, "next");
+  } finally {
+    pool.close();
+  }
+});
+
+test("session jobs have the pool deadline, a priority and a cancel signal", async () => {
+  const pool = await fakePool({ timeoutMs: 100 });
+  try {
+    const opened = await pool.openSession({ label: "open" });
+    const sessionId = opened.result.session.id;
+
+    const expired = await pool.updateSession(sessionId, { delayMs: 5000, label: "slow" });
+    assert.equal(expired.result.cancelled, true);
+    assert.equal(expired.result.deadlineExceeded, true);
+
+    const controller = new AbortController();
+    const abandoned = pool.updateSession(
+      sessionId,
+      { delayMs: 5000, label: "abandoned" },
+      { signal: controller.signal }
+    );
+    setTimeout(() => controller.abort(), 30);
+    assert.equal((await abandoned).result.cancelled, true);
+
+    const finished = [];
+    const running = pool.submit({ delayMs: 50, label: "running" });
+    const bulk = pool.submit({ label: "bulk" }).then(() => finished.push("bulk"));
+    const update = pool
+      .updateSession(sessionId, { label: "update" }, { priority: 1 })
+      .then(() => finished.push("update"));
+    await Promise.all([running, bulk, update]);
+    assert.deepEqual(finished, ["update", "bulk"]);
+    assert.equal((await pool.closeSession(sessionId)).code, 0);
+  } finally {
+    pool.close();
+  }
+});
@@ -0,0 +1,43 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+
+const { batchError, streamBatch } = require("../batch.js");
+
+function delayed(value, milliseconds) {
+  return new Promise((resolve) => setTimeout(() => resolve(value), milliseconds));
+}
+
+test("batch bodies must be non-empty arrays within the size limit", () => {
+  assert.match(batchError({ T: [] }, 10), /JSON array/);
+  assert.match(batchError([], 10), /at least one/);
+  assert.match(batchError([{}, {}, {}], 2), /at most 2/);
+  assert.equal(batchError([{}, {}], 2), null);
+});
+
+test("lines are written as scenarios finish and carry their input index", async () => {
+  const lines = [];
+  await streamBatch(
+    [{ delay: 30 }, { delay: 0 }, { delay: 10 }],
+    (payload, index) => delayed({ status: "ok", result: { index } }, payload.delay),
+    (line) => lines.push(line)
+  );
+
+  assert.ok(lines.every((line) => line.endsWith("\n")));
+  const parsed = lines.map((line) => JSON.parse(line));
+  assert.deepEqual(parsed.map((line) => line.index), [1, 2, 0]);
+  for (const line of parsed) {
+    assert.equal(line.status, "ok");
+    assert.equal(line.result.index, line.index);
+  }
+});
+
+test("nothing is written after the client disconnects", async () => {
+  const lines = [];
+  await streamBatch(
+    [{ delay: 0 }, { delay: 20 }],
+    (payload) => delayed({ status: "ok" }, payload.delay),
+    (line) => lines.push(line),
+    () => lines.length > 0
+  );
+  assert.equal(lines.length, 1);
+});
@@ -0,0 +1,38 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+const zlib = require("node:zlib");
+
+const { MIN_COMPRESSED_BYTES, encodeJson, negotiateEncoding } = require("../compression.js");
+
+test("brotli is preferred over gzip and q=0 refuses a coding", () => {
+  assert.equal(negotiateEncoding("gzip, deflate, br"), "br");
+  assert.equal(negotiateEncoding("gzip, br;q=0"), "gzip");
+  assert.equal(negotiateEncoding("*"), "br");
+  assert.equal(negotiateEncoding("*, br;q=0"), "gzip");
+  assert.equal(negotiateEncoding("identity"), null);
+  assert.equal(negotiateEncoding(undefined), null);
+});
+
+test("large bodies are compressed and decode to the same JSON", async () => {
+  const value = { events: Array.from({ length: 1000 }, (_, index) => index % 7) };
+  assert.ok(JSON.stringify(value).length >= MIN_COMPRESSED_BYTES);
+
+  const brotli = await encodeJson(value, "br, gzip");
+  assert.equal(brotli.encoding, "br");
+  assert.deepEqual(JSON.parse(zlib.brotliDecompressSync(brotli.body)), value);
+
+  const gzip = await encodeJson(value, "gzip");
+  assert.equal(gzip.encoding, "gzip");
+  assert.deepEqual(JSON.parse(zlib.gunzipSync(gzip.body)), value);
+});
+
+test("small bodies and clients without compression get plain JSON", async () => {
+  const small = await encodeJson({ status: 0 }, "br, gzip");
+  assert.equal(small.encoding, null);
+  assert.equal(small.body.toString(), '{"status":0}');
+
+  const value = { events: Array.from({ length: 500 }, (_, index) => index) };
+  const identity = await encodeJson(value, "");
+  assert.equal(identity.encoding, null);
+  assert.deepEqual(JSON.parse(identity.body), value);
+});
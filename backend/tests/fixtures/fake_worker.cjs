@@ -0,0 +1,40 @@
+// A stand-in for solver_worker.py that speaks the same frame protocol. A
+// payload `{ delayMs, ignoreCancel }` answers after `delayMs`, or as soon as
+// it is cancelled unless `ignoreCancel` is set. Session frames take the same
+// fields from their `payload` or `changes` and answer with the session id.
+const readline = require("node:readline");
+
+const running = new Map();
+
+function respond(id, result) {
+  const job = running.get(id);
+  if (!job) {
+    return;
+  }
+  clearTimeout(job.timer);
+  running.delete(id);
+  process.stdout.write(`${JSON.stringify({ id, code: 0, result })}\n`);
+}
+
+process.stdout.write(`${JSON.stringify({ ready: true })}\n`);
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  const frame = JSON.parse(line);
+  if ("cancel" in frame) {
+    const job = running.get(frame.cancel);
+    if (job && !job.payload.ignoreCancel) {
+      respond(frame.cancel, { status: 1, cancelled: true, label: job.payload.label, ...job.fields });
+    }
+    return;
+  }
+  const session = frame.session;
+  const payload = session ? session.payload || session.changes || {} : frame.payload;
+  const fields = session ? { session: { id: session.sessionId || `session-${frame.id}` } } : {};
+  running.set(frame.id, {
+    payload,
+    fields,
+    timer: setTimeout(
+      () => respond(frame.id, { status: 0, label: payload.label, ...fields }),
+      payload.delayMs || 0
+    ),
+  });
+});
@@ -0,0 +1,50 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+
+const { Histogram, SolverMetrics } = require("../metrics.js");
+
+test("histogram buckets are cumulative and end with +Inf", () => {
+  const histogram = new Histogram("latency_seconds", "Latency.", ["route"], [0.1, 1]);
+  histogram.observe({ route: "/submit" }, 0.05);
+  histogram.observe({ route: "/submit" }, 0.5);
+  histogram.observe({ route: "/submit" }, 5);
+
+  assert.deepEqual(histogram.render().split("\n"), [
+    "# HELP latency_seconds Latency.",
+    "# TYPE latency_seconds histogram",
+    'latency_seconds_bucket{route="/submit",le="0.1"} 1',
+    'latency_seconds_bucket{route="/submit",le="1"} 2',
+    'latency_seconds_bucket{route="/submit",le="+Inf"} 3',
+    'latency_seconds_sum{route="/submit"} 5.55',
+    'latency_seconds_count{route="/submit"} 3',
+  ]);
+});
+
+test("solves are counted by status and their phases observed", () => {
+  const metrics = new SolverMetrics();
+  metrics.observeSolve({
+    code: 0,
+    queueWaitSeconds: 0.2,
+    result: {
+      status: 0,
+      timings: { buildSeconds: 0.02, solveSeconds: 3, queueWaitSeconds: 0.2 },
+    },
+  });
+  metrics.observeSolve({ code: 2, result: { error: "validation_error" }, queueWaitSeconds: 0 });
+  metrics.observeSolve({ code: 1, errorOutput: "Traceback", queueWaitSeconds: 0 });
+  metrics.observeRequest("POST", "/submit", "200", 3.3);
+
+  const text = metrics.render();
+  assert.ok(text.endsWith("\n"));
+  assert.match(text, /^solver_results_total\{status="OPTIMAL"\} 1$/m);
+  assert.match(text, /^solver_results_total\{status="validation_error"\} 1$/m);
+  assert.match(text, /^solver_results_total\{status="error"\} 1$/m);
+  assert.match(text, /^solver_phase_duration_seconds_count\{phase="build"\} 1$/m);
+  assert.match(text, /^solver_phase_duration_seconds_sum\{phase="solve"\} 3$/m);
+  assert.doesNotMatch(text, /phase="queueWait"/);
+  assert.match(text, /^solver_queue_wait_seconds_count 3$/m);
+  assert.match(
+    text,
+    /^http_request_duration_seconds_bucket\{method="POST",route="\/submit",status="200",le="5"\} 1$/m
+  );
+});
@@ -0,0 +1,159 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+const fs = require("node:fs");
+const os = require("node:os");
+const path = require("node:path");
+
+const { ResultCache, canonicalScenarioKey } = require("../resultCache.js");
+
+function scenario() {
+  return {
+    T: ["2025", "2030"],
+    Fuels: ["Ammonia"],
+    Capacities: { Ammonia: [1000] },
+    TankOptions: {
+      Ammonia: [{
+        optimizerName: "Ammonia",
+        capacityMgoEquivalentTonnes: 1000,
+        baseInvestmentCostUSD: 2_500_000,
+        storageVolumeM3: 1470.6,
+      }],
+    },
+    Demand: { Ammonia: { 2025: 0, 2030: 1000 } },
+    InitialState: { Ammonia: [[0]] },
+    discountRateAnnual: 0.07,
+  };
+}
+
+test("scenario key ignores key order and estimator-only tank option fields", () => {
+  const base = canonicalScenarioKey(scenario(), "salt");
+  const reordered = scenario();
+  reordered.Demand = { Ammonia: { 2030: 1000, 2025: 0 } };
+  const annotated = scenario();
+  annotated.TankOptions.Ammonia[0].storageVolumeM3 = 9999;
+
+  assert.equal(canonicalScenarioKey(reordered, "salt"), base);
+  assert.equal(canonicalScenarioKey(annotated, "salt"), base);
+});
+
+test("scenario key changes with model inputs, extra fields and the solver salt", () => {
+  const base = canonicalScenarioKey(scenario(), "salt");
+  const demand = scenario();
+  demand.Demand.Ammonia["2030"] = 1001;
+  const forbidden = { ...scenario(), Costs: {} };
+
+  assert.notEqual(canonicalScenarioKey(demand, "salt"), base);
+  assert.notEqual(canonicalScenarioKey(forbidden, "salt"), base);
+  assert.notEqual(canonicalScenarioKey(scenario(), "other"), base);
+});
+
+test("concurrent identical requests share one in-flight computation", async () => {
+  const cache = new ResultCache();
+  let computations = 0;
+  let release;
+  const gate = new Promise((resolve) => { release = resolve; });
+  const compute = async () => {
+    computations += 1;
+    await gate;
+    return { code: 0, result: { status: 0 } };
+  };
+
+  const pending = [1, 2, 3].map(() => cache.getOrCompute("key", compute));
+  release();
+  const statuses = (await Promise.all(pending)).map((entry) => entry.cacheStatus);
+
+  assert.equal(computations, 1);
+  assert.deepEqual(statuses.sort(), ["miss", "shared", "shared"]);
+  assert.equal((await cache.getOrCompute("key", compute)).cacheStatus, "hit");
+});
+
+test("failed computations are not stored", async () => {
+  const cache = new ResultCache();
+  const failing = async () => ({ code: 2 });
+  await cache.getOrCompute("key", failing, (value) => value.code === 0);
+  assert.equal((await cache.getOrCompute("key", failing, (value) => value.code === 0)).cacheStatus, "miss");
+});
+
+test("memory tier evicts least recently used entries", async () => {
+  const cache = new ResultCache({ maxEntries: 2 });
+  await cache.set("a", 1);
+  await cache.set("b", 2);
+  await cache.get("a");
+  await cache.set("c", 3);
+
+  assert.equal(await cache.get("b"), undefined);
+  assert.equal(await cache.get("a"), 1);
+  assert.equal(await cache.get("c"), 3);
+});
+
+test("disk tier survives restarts and evicts by total size", async () => {
+  const directory = fs.mkdtempSync(path.join(os.tmpdir(), "result-cache-"));
+  try {
+    const value = { payload: "x".repeat(100) };
+    const entryBytes = Buffer.byteLength(JSON.stringify(value));
+    const cache = new ResultCache({ maxEntries: 1, directory, maxDiskBytes: entryBytes * 2 });
+    await cache.set("a", value);
+    await cache.set("b", value);
+    await cache.set("c", value);
+
+    const restarted = new ResultCache({ maxEntries: 1, directory, maxDiskBytes: entryBytes * 2 });
+    assert.equal(await restarted.get("a"), undefined);
+    assert.deepEqual(await restarted.get("b"), value);
+    assert.deepEqual(await restarted.get("c"), value);
+  } finally {
+    fs.rmSync(directory, { recursive: true, force: true });
+  }
+});
+
+test("a shared computation is aborted only when every caller has aborted", async () => {
+  const cache = new ResultCache();
+  let computeSignal;
+  let release;
+  const compute = (signal) => {
+    computeSignal = signal;
+    return new Promise((resolve) => { release = resolve; });
+  };
+  const first = new AbortController();
+  const second = new AbortController();
+  const pending = [
+    cache.getOrCompute("key", compute, () => true, first.signal),
+    cache.getOrCompute("key", compute, () => true, second.signal),
+  ];
+  await new Promise((resolve) => setImmediate(resolve));
+
+  first.abort();
+  assert.equal(computeSignal.aborted, false);
+  second.abort();
+  assert.equal(computeSignal.aborted, true);
+  release({ code: 0 });
+  await Promise.all(pending);
+});
+
+test("a request arriving after every caller aborted starts a fresh computation", async () => {
+  const cache = new ResultCache();
+  const releases = [];
+  let computeCalls = 0;
+  const compute = (signal) => {
+    computeCalls += 1;
+    // Like a worker that answers its cancel frame late.
+    return new Promise((resolve) => {
+      releases.push(() => resolve({ code: 0, result: signal.aborted ? { cancelled: true } : {} }));
+    });
+  };
+  const shouldStore = (value) => !value.result.cancelled;
+  const client = new AbortController();
+  const aborted = cache.getOrCompute("key", compute, shouldStore, client.signal);
+  await new Promise((resolve) => setImmediate(resolve));
+  client.abort();
+
+  const retry = cache.getOrCompute("key", compute, shouldStore, new AbortController().signal);
+  await new Promise((resolve) => setImmediate(resolve));
+  assert.equal(computeCalls, 2);
+  releases[0]();
+  releases[1]();
+  assert.deepEqual((await aborted).value.result, { cancelled: true });
+  const retried = await retry;
+  assert.equal(retried.cacheStatus, "miss");
+  assert.deepEqual(retried.value.result, {});
+  assert.equal((await cache.getOrCompute("key", compute)).cacheStatus, "hit");
+});
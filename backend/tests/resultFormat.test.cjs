@@ -0,0 +1,68 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+
+const { columnarToNested } = require("../resultFormat.js");
+
+function columnarResult() {
+  return {
+    status: 0,
+    format: "columnar",
+    dictionaries: {
+      fuels: ["Ammonia"],
+      periods: ["2025", "2030"],
+      capacities: { Ammonia: [1000, 2000] },
+      events: ["opened", "operating", "closed", "maintenance", "transition"],
+    },
+    events: {
+      fuel: [0, 0, 0, 0],
+      tank: [0, 0, 0, 0],
+      option: [0, 0, 1, 1],
+      fromOption: [null, null, null, 0],
+      period: [0, 0, 1, 1],
+      event: [0, 3, 1, 4],
+      costUSD: [2500000, 75000, 150000, 1200000],
+    },
+    financialParameters: { discountRateAnnual: 0.07 },
+  };
+}
+
+test("columnar results convert back to the nested format", () => {
+  assert.deepEqual(columnarToNested(columnarResult()), {
+    status: 0,
+    solution: {
+      Ammonia: {
+        2025: { Tank_1: { 1000: { opened: 1, operating: 0, closed: 0 } } },
+        2030: { Tank_1: { 2000: { opened: 0, operating: 1, closed: 0 } } },
+      },
+    },
+    costs: {
+      Ammonia: {
+        2025: { Tank_1: { 1000: { opened: 2500000, operating: 75000, closed: 0 } } },
+        2030: { Tank_1: { 2000: { opened: 0, operating: 150000, closed: 0 } } },
+      },
+    },
+    transitions: {
+      Ammonia: {
+        2030: { Tank_1: [{ fromCapacity: 1000, toCapacity: 2000, costUSD: 1200000 }] },
+      },
+    },
+    financialParameters: { discountRateAnnual: 0.07 },
+  });
+});
+
+test("float capacities are keyed as result_format.py keys them", () => {
+  // Python's json writes [1000.0, 2000.5] as 1000.0 and 2000.5; the nested
+  // result it writes is keyed "1000" and "2000.5".
+  const result = JSON.parse(
+    JSON.stringify(columnarResult()).replace("[1000,2000]", "[1000.0,2000.5]")
+  );
+  const nested = columnarToNested(result);
+  assert.deepEqual(Object.keys(nested.solution.Ammonia[2025].Tank_1), ["1000"]);
+  assert.deepEqual(Object.keys(nested.costs.Ammonia[2030].Tank_1), ["2000.5"]);
+  assert.equal(nested.transitions.Ammonia[2030].Tank_1[0].toCapacity, 2000.5);
+});
+
+test("nested results are returned unchanged", () => {
+  const nested = { status: 0, solution: {} };
+  assert.equal(columnarToNested(nested), nested);
+});
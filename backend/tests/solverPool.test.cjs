@@ -0,0 +1,203 @@
+const test = require("node:test");
+const assert = require("node:assert/strict");
+const { spawnSync } = require("node:child_process");
+
+const { SolverPool } = require("../solverPool.js");
+const { columnarToNested } = require("../resultFormat.js");
+
+const pythonExecutable = process.env.PYTHON || "python";
+const ortoolsProbe = spawnSync(pythonExecutable, ["-c", "import ortools"], {
+  encoding: "utf8",
+});
+const optimizerAvailable = !ortoolsProbe.error && ortoolsProbe.status === 0;
+
+function tinyPayload() {
+  const periods = ["2025", "2030", "2035", "2040"];
+  return {
+    T: periods,
+    Fuels: ["Ammonia"],
+    Capacities: { Ammonia: [1000] },
+    TankOptions: {
+      Ammonia: [{
+        optimizerName: "Ammonia",
+        capacityMgoEquivalentTonnes: 1000,
+        baseInvestmentCostUSD: 2_500_000,
+      }],
+    },
+    Demand: { Ammonia: { 2025: 0, 2030: 1000, 2035: 1000, 2040: 1000 } },
+    InitialState: { Ammonia: [[0]] },
+    planningPeriodYears: 5,
+    discountRateAnnual: 0.07,
+    transitionCostRate: 1.2,
+    technologyCostAdjustmentRateAnnual: { Ammonia: -0.01 },
+    maintenanceRateAnnual: { Ammonia: 0.03 },
+    decommissioningRateAtClosure: { Ammonia: 0.1 },
+  };
+}
+
+test(
+  "pool serves concurrent requests and recycles workers after max jobs",
+  { skip: optimizerAvailable ? false : "OR-Tools is unavailable" },
+  async () => {
+    const pool = new SolverPool({ size: 2, maxJobsPerWorker: 1, pythonExecutable }).start();
+    try {
+      const responses = await Promise.all(
+        Array.from({ length: 5 }, () => pool.submit(tinyPayload()))
+      );
+      for (const response of responses) {
+        assert.equal(response.code, 0, response.errorOutput);
+        assert.equal(response.result.status, 0);
+        assert.ok(response.queueWaitSeconds >= 0);
+        const { timings } = response.result;
+        for (const phase of ["parse", "validation", "preparation", "build", "solve", "extraction", "serialize"]) {
+          assert.ok(timings[`${phase}Seconds`] >= 0, phase);
+        }
+        assert.equal(timings.queueWaitSeconds, response.queueWaitSeconds);
+      }
+    } finally {
+      pool.close();
+    }
+  }
+);
+
+test(
+  "validation errors keep the model_tank_index exit-code contract",
+  { skip: optimizerAvailable ? false : "OR-Tools is unavailable" },
+  async () => {
+    const pool = new SolverPool({ size: 1, pythonExecutable }).start();
+    try {
+      const payload = tinyPayload();
+      delete payload.Demand;
+      const response = await pool.submit(payload);
+      assert.equal(response.code, 2);
+      assert.equal(response.result.error, "validation_error");
+    } finally {
+      pool.close();
+    }
+  }
+);
+
+test(
+  "session requests are routed to the worker that holds the session",
+  { skip: optimizerAvailable ? false : "OR-Tools is unavailable" },
+  async () => {
+    const pool = new SolverPool({ size: 2, maxJobsPerWorker: 1, pythonExecutable }).start();
+    try {
+      const opened = await pool.openSession(tinyPayload());
+      assert.equal(opened.code, 0, opened.errorOutput);
+      const sessionId = opened.result.session.id;
+
+      const [updated, , updatedAgain] = await Promise.all([
+        pool.updateSession(sessionId, { discountRateAnnual: 0.05 }),
+        pool.submit(tinyPayload()),
+        pool.updateSession(sessionId, { Demand: { Ammonia: { 2040: 900 } } }),
+      ]);
+      assert.equal(updated.code, 0, updated.errorOutput);
+      assert.equal(updated.result.session.update, "inPlace");
+      assert.equal(updatedAgain.code, 0, updatedAgain.errorOutput);
+      assert.equal(updatedAgain.result.session.solves, 3);
+
+      const closed = await pool.closeSession(sessionId);
+      assert.equal(closed.code, 0, closed.errorOutput);
+      const missing = await pool.updateSession(sessionId, {});
+      assert.equal(missing.code, 2);
+      assert.equal(missing.result.error, "session_not_found");
+    } finally {
+      pool.close();
+    }
+  }
+);
+
+function slowPayload() {
+  // Several seconds to prove optimal on one core.
+  const periods = ["2025", "2030", "2035", "2040", "2045", "2050", "2055", "2060"];
+  const fuels = ["Ammonia", "Methanol"];
+  const capacities = [500, 1000, 1500, 2000];
+  const payload = {
+    T: periods,
+    Fuels: fuels,
+    Capacities: {},
+    TankOptions: {},
+    Demand: {},
+    InitialState: {},
+    planningPeriodYears: 5,
+    discountRateAnnual: 0.07,
+    transitionCostRate: 1.2,
+    technologyCostAdjustmentRateAnnual: {},
+    maintenanceRateAnnual: {},
+    decommissioningRateAtClosure: {},
+    solverOptions: { solverBackend: "cpsat" },
+  };
+  fuels.forEach((fuel, fuelIndex) => {
+    payload.Capacities[fuel] = capacities;
+    payload.TankOptions[fuel] = capacities.map((capacity) => ({
+      optimizerName: fuel,
+      capacityMgoEquivalentTonnes: capacity,
+      baseInvestmentCostUSD: 1_000_000 + 1_700 * capacity + 10_000 * fuelIndex,
+    }));
+    payload.Demand[fuel] = Object.fromEntries(periods.map((period, index) => [
+      period,
+      Math.round(2000 * Math.min(1, (1.5 * index) / (periods.length - 1))),
+    ]));
+    payload.InitialState[fuel] = Array.from({ length: 4 }, () => [0, 0, 0, 0]);
+    payload.technologyCostAdjustmentRateAnnual[fuel] = -0.01;
+    payload.maintenanceRateAnnual[fuel] = 0.03;
+    payload.decommissioningRateAtClosure[fuel] = 0.1;
+  });
+  return payload;
+}
+
+test(
+  "progress events stream before the result and abort stops the solve",
+  { skip: optimizerAvailable ? false : "OR-Tools is unavailable" },
+  async () => {
+    const pool = new SolverPool({ size: 1, pythonExecutable }).start();
+    try {
+      const events = [];
+      const controller = new AbortController();
+      const response = await pool.submit(slowPayload(), {
+        onProgress: (event) => {
+          events.push(event.event);
+          if (event.event === "incumbent") {
+            controller.abort();
+          }
+        },
+        signal: controller.signal,
+      });
+      assert.equal(response.code, 0, response.errorOutput);
+      assert.deepEqual(events.slice(0, 3), ["validated", "model", "incumbent"]);
+      assert.equal(response.result.cancelled, true);
+      assert.equal(response.result.status, 1);
+
+      const queued = new AbortController();
+      queued.abort();
+      const dropped = await pool.submit(tinyPayload(), { signal: queued.signal });
+      assert.equal(dropped.code, 2);
+      assert.equal(dropped.result.error, "cancelled");
+    } finally {
+      pool.close();
+    }
+  }
+);
+
+test(
+  "columnar results convert back to the nested result",
+  { skip: optimizerAvailable ? false : "OR-Tools is unavailable" },
+  async () => {
+    const pool = new SolverPool({ size: 1, pythonExecutable }).start();
+    try {
+      const nested = await pool.submit(tinyPayload());
+      const columnar = await pool.submit(tinyPayload(), { resultFormat: "columnar" });
+      assert.equal(columnar.code, 0, columnar.errorOutput);
+      assert.equal(columnar.result.format, "columnar");
+
+      const converted = columnarToNested(columnar.result);
+      for (const section of ["solution", "costs", "transitions"]) {
+        assert.deepEqual(converted[section], nested.result[section], section);
+      }
+      assert.deepEqual(Object.keys(converted), Object.keys(nested.result));
+    } finally {
+      pool.close();
+    }
+  }
+);
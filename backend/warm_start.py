@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+from financial_parameters import FUEL_ANNUAL_RATE_FIELDS
+
+# Recently solved plans, kept in the solver process so the next request can
+# start from the nearest one. Plans are per-tank key sets
+# {'y': {(fuel, tank, option, period), ...}, 's': ..., 'x': ...,
+#  'z': {(fuel, tank, from, to, period), ...}} and are only reused for
+# scenarios with the same periods, fuels and capacity options, where those
+# keys mean the same thing.
+
+
+def structure_key(data):
+    return (
+        tuple(data['T']),
+        tuple(data['Fuels']),
+        tuple(tuple(data['Capacities'][fuel]) for fuel in data['Fuels']),
+    )
+
+
+def scenario_features(data):
+    """Numeric fields that differ between scenarios of one structure."""
+    features = [
+        float(data['discountRateAnnual']),
+        float(data['transitionCostRate']),
+    ]
+    for fuel in data['Fuels']:
+        features.extend(
+            float(data['Demand'][fuel][period]) for period in data['T']
+        )
+        features.extend(
+            float(option['baseInvestmentCostUSD'])
+            for option in data['TankOptions'][fuel]
+        )
+        features.extend(float(data[field][fuel]) for field in FUEL_ANNUAL_RATE_FIELDS)
+    return features
+
+
+def scenario_distance(first, second):
+    # Relative L1 distance, so demand in tonnes and costs in USD weigh alike.
+    return sum(
+        abs(a - b) / max(abs(a), abs(b), 1.0)
+        for a, b in zip(first, second)
+    )
+
+
+class SolvedPlanStore:
+    """Least-recently-used store of solved plans, searched by distance."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.next_id = 0
+
+    def remember(self, data, plan):
+        self.entries[self.next_id] = (
+            structure_key(data),
+            scenario_features(data),
+            {family: frozenset(keys) for family, keys in plan.items()},
+        )
+        self.next_id += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def nearest(self, data):
+        """Return (plan, distance) for the closest stored scenario with the
+        same structure, or None."""
+        key = structure_key(data)
+        features = scenario_features(data)
+        best = None
+        for entry_id, (entry_key, entry_features, plan) in self.entries.items():
+            if entry_key != key:
+                continue
+            distance = scenario_distance(features, entry_features)
+            if best is None or distance < best[2]:
+                best = (entry_id, plan, distance)
+        if best is None:
+            return None
+        self.entries.move_to_end(best[0])
+        return best[1], best[2]
+
+    def clear(self):
+        self.entries.clear()
+
+
+DEFAULT_PLAN_STORE = SolvedPlanStore()